@@ -0,0 +1,165 @@
+# Aggregates a year of service events (about a million) with the analytics module
+# The year is logged a day at a time the way service logs it, so the events are packed into days as they're written.
+# Packing a year that was never packed (a database from before the packed days) is timed too.
+# A small hand-made service is checked against plain Python first
+# Run from the repository root: python -m benchmarks.bench_analytics
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from core import analytics
+from core.database import Database
+from core.events import EventLog
+
+DAYS = 365
+TABLES = 120
+SERVERS = 8
+# Turns per table each day
+TURNS = 7
+
+
+def insert(db, rows):
+    with db.transaction():
+        db.executemany("INSERT INTO events (kind, mono, wall, table_id, title, server, party, detail) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+# Logs the rows the way the EventLog writes a batch (with no snapshot slot)
+def log(db, rows):
+    EventLog.write(db, [row + (None,) for row in rows])
+
+
+def same_stats(a: dict, b: dict) -> bool:
+    keys = ("table_turns", "table_mean", "table_median", "party_turns", "party_median", "covers", "server_covers")
+
+    return (a["events"] == b["events"] and a["tables"] == b["tables"] and a["servers"] == b["servers"] and
+            all((a[key] == b[key]).all() for key in keys))
+
+
+# A service at each table: seat, clear and bus, with a transfer now and then
+def service_rows(rng, start, days, tables, servers, turns):
+    rows = []
+
+    for day in range(days):
+        for table in range(tables):
+            now = start + day * 86400 + rng.randint(0, 1800)
+            server = "Server " + str(table % servers + 1)
+
+            for turn in range(turns):
+                party = rng.randint(1, 8)
+                rows.append(("seat", 0, now, table, str(table + 1), server, party, None))
+
+                if turn % 5 == 4:
+                    rows.append(("transfer", 0, now + 60, table, str(table + 1), "Server 0", party, server))
+                    turn_server = "Server 0"
+                else:
+                    turn_server = server
+
+                now += rng.randint(1800, 6000)
+                rows.append(("clear", 0, now, table, str(table + 1), turn_server, party, None))
+                now += rng.randint(60, 600)
+                rows.append(("bus", 0, now, table, str(table + 1), turn_server, None, None))
+
+    return rows
+
+
+def check(db, start):
+    rng = random.Random(7)
+    rows = service_rows(rng, start, 3, 4, 2, 3)
+    insert(db, rows)
+
+    stats = analytics.analyze(db, start, start + 3 * 86400)
+
+    turns = {}
+    covers = {}
+    for i, row in enumerate(rows):
+        if row[0] == "seat":
+            clear = next(r for r in rows[i + 1:] if r[0] == "clear" and r[3] == row[3])
+            turns.setdefault(row[4], []).append(clear[2] - row[2])
+            covers[row[5]] = covers.get(row[5], 0) + row[6]
+        elif row[0] == "transfer":
+            covers[row[5]] = covers.get(row[5], 0) + row[6]
+            covers[row[7]] -= row[6]
+
+    for i, title in enumerate(stats["tables"]):
+        assert stats["table_turns"][i] == len(turns[title]), "wrong turn count"
+        assert abs(stats["table_median"][i] - statistics.median(turns[title])) < 1e-6, "wrong median turn time"
+        assert abs(stats["table_mean"][i] - statistics.mean(turns[title])) < 1e-6, "wrong mean turn time"
+
+    for i, name in enumerate(stats["servers"]):
+        if name:
+            assert stats["server_covers"][i] == covers.get(name, 0), "wrong covers for " + name
+
+    assert stats["covers"].sum() == sum(r[6] for r in rows if r[0] == "seat"), "covers went missing"
+
+
+# Tables that share a title (a "1" in two sections, or tables left untitled) are still separate tables
+def check_shared_titles(db, start):
+    rows = []
+    for title in ("1", ""):
+        # Two overlapping hour long turns, at the tables in slots 1 and 2 (neither saved, so no table_id)
+        rows += [("seat", 0, start, None, title, "Server", 2, None, 1),
+                 ("seat", 0, start + 600, None, title, "Server", 4, None, 2),
+                 ("clear", 0, start + 3600, None, title, "Server", 2, None, 1),
+                 ("clear", 0, start + 4200, None, title, "Server", 4, None, 2)]
+        start += 86400
+
+    with db.transaction():
+        db.executemany("INSERT INTO events (kind, mono, wall, table_id, title, server, party, detail, slot) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    stats = analytics.analyze(db, rows[0][2], start)
+
+    for i, title in enumerate(stats["tables"]):
+        assert stats["table_turns"][i] == 2, "turns at tables sharing a title were mixed up"
+        assert stats["table_mean"][i] == 3600, "turns at tables sharing a title were mixed up"
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="hosty-bench-")
+    db = Database(os.path.join(tmp, "hosty.db"))
+    db.create_tables()
+
+    start = time.mktime((2025, 1, 1, 11, 0, 0, 0, 0, -1))
+
+    # Checked on its own range, well before the year
+    check(db, start - 30 * 86400)
+    check_shared_titles(db, start - 60 * 86400)
+
+    rng = random.Random(1)
+    began = time.perf_counter()
+    for day in range(DAYS):
+        log(db, service_rows(rng, start + day * 86400, 1, TABLES, SERVERS, TURNS))
+    logged = time.perf_counter() - began
+
+    stats = analytics.analyze(db, start, start + DAYS * 86400)
+    total = db.fetchone("SELECT COUNT(*) FROM events")[0]
+
+    print(f"{total} events stored, {stats['events']} seats, clears and transfers over {stats['days']} days")
+    print(f"log a day   {logged / DAYS * 1000:8.1f} ms, packing it included")
+    print(f"load        {stats['load_time'] * 1000:8.1f} ms")
+    print(f"aggregate   {stats['aggregate_time'] * 1000:8.1f} ms")
+
+    # Another day of service, the refresh only packs what's new
+    log(db, service_rows(rng, start + (DAYS - 1) * 86400 + 43200, 1, TABLES, SERVERS, 2))
+    again = analytics.analyze(db, start, start + DAYS * 86400)
+
+    print(f"refresh     {again['load_time'] * 1000:8.1f} ms load, {again['aggregate_time'] * 1000:8.1f} ms aggregate")
+
+    # Every event packed again from scratch, as a database from before the packed days would be
+    with db.transaction():
+        db.execute("DELETE FROM event_days")
+        db.execute("DELETE FROM event_names")
+    fresh = analytics.analyze(db, start, start + DAYS * 86400)
+
+    print(f"pack a year {fresh['load_time'] * 1000:8.1f} ms, only the first time after upgrading")
+
+    assert same_stats(again, fresh), "packing as the events were logged differs from packing them all at once"
+
+    assert stats["load_time"] + stats["aggregate_time"] < 1.0, "analyzing a year took a second or more"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Compares the old open/commit/close per query pattern with the shared Database connection
+# Run from the repository root: python -m benchmarks.bench_database
+import os
+import sqlite3 as sql
+import tempfile
+import time
+
+from core.database import Database
+
+EDITS = 500
+
+
+def seed(path):
+    db = Database(path)
+    db.create_tables()
+    with db.transaction():
+        db.executemany("INSERT INTO reservations (date, time, name, size, phone, note) VALUES (?, ?, ?, ?, ?, ?)",
+                       [("2024-01-01", "18:00:00", "Guest", 2, "1231231234", "") for _ in range(EDITS)])
+    db.close()
+
+
+# The pattern every query used before: connect, execute, commit, close
+def per_call(path):
+    for res_id in range(1, EDITS + 1):
+        con = sql.connect(path)
+        cur = con.cursor()
+        cur.execute("UPDATE reservations SET size = ? WHERE res_id = ?", (res_id % 10 + 1, res_id))
+        con.commit()
+        con.close()
+
+
+# One long-lived connection, one transaction per edit (what ResDelegate does now)
+def shared(path):
+    db = Database(path)
+    for res_id in range(1, EDITS + 1):
+        with db.transaction():
+            db.execute("UPDATE reservations SET size = ? WHERE res_id = ?", (res_id % 10 + 1, res_id))
+    db.close()
+
+
+# One long-lived connection, every edit in one transaction
+def shared_batched(path):
+    db = Database(path)
+    with db.transaction():
+        for res_id in range(1, EDITS + 1):
+            db.execute("UPDATE reservations SET size = ? WHERE res_id = ?", (res_id % 10 + 1, res_id))
+    db.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path)
+
+        for name, fn in (("open/close per query", per_call),
+                         ("shared connection", shared),
+                         ("shared connection, one transaction", shared_batched)):
+            start = time.perf_counter()
+            fn(path)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<36} {EDITS} edits  {elapsed * 1000:8.1f} ms  {elapsed / EDITS * 1e6:8.1f} us/edit")
+
+
+if __name__ == "__main__":
+    main()
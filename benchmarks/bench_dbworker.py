@@ -0,0 +1,94 @@
+# Checks that the GUI's event loop keeps running while the database is slow
+# Every query on the worker's connection is delayed, a 10 ms timer records how long the event loop goes without
+# ticking while a floorplan and a month of reservations are read. The same reads on the GUI thread are timed for
+# comparison. Run from the repository root: python -m benchmarks.bench_dbworker
+import time
+
+from benchmarks.harness import setup, settle, grid_rect
+from core.database import Database
+
+# Seconds added to every query
+DELAY = 0.4
+TABLES = 500
+RESERVATIONS = 2000
+
+
+# A database on a slow disk (or held locked by another program)
+class DelayedDatabase(Database):
+    def execute(self, query: str, params=()):
+        time.sleep(DELAY)
+        return super(DelayedDatabase, self).execute(query, params)
+
+    def fetchall(self, query: str, params=()) -> list:
+        time.sleep(DELAY)
+        return super(DelayedDatabase, self).fetchall(query, params)
+
+    def fetchone(self, query: str, params=()):
+        time.sleep(DELAY)
+        return super(DelayedDatabase, self).fetchone(query, params)
+
+
+# Longest gap between timer ticks while fn runs and the worker finishes what it was given
+def longest_stall(fn):
+    import core.globals as g
+    from qtpy.QtCore import QTimer
+
+    ticks = [time.perf_counter()]
+    timer = QTimer()
+    timer.timeout.connect(lambda: ticks.append(time.perf_counter()))
+    timer.start(10)
+
+    fn()
+    settle()
+    ticks.append(time.perf_counter())
+
+    timer.stop()
+    g.APP.processEvents()
+
+    return max(b - a for a, b in zip(ticks, ticks[1:]))
+
+
+def main():
+    hp = setup(factory=DelayedDatabase)
+    import core.globals as g
+    from qtpy.QtCore import QDate, Qt
+    from core.objects import POS_Table
+
+    # A floorplan and a month of reservations, written straight to the database
+    with g.DB.transaction():
+        plan_id = g.DB.execute("INSERT INTO floorplans (name, server_count) VALUES ('Bench', 4)").lastrowid
+        g.DB.executemany("INSERT INTO plan_tables (plan_id, " + POS_Table.COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         [(plan_id, grid_rect(i).x(), grid_rect(i).y(), 80, 80, i % 4, str(i + 1), False, 0, 4)
+                          for i in range(TABLES)])
+
+        month = QDate.currentDate().addMonths(2)
+        g.DB.executemany("INSERT INTO reservations (date, time, name, size, phone, note) VALUES (?, ?, ?, ?, ?, ?)",
+                         [(QDate(month.year(), month.month(), 1 + i % 28).toString(Qt.ISODate),
+                           "%02d:%02d:00" % (17 + i % 5, i % 60), "Guest", 2 + i % 6, "1231231234", "")
+                          for i in range(RESERVATIONS)])
+
+    res_list = g.RES_LIST.widget().resList
+
+    def load_everything():
+        g.VIEW.load_floorplan(plan_id)
+        res_list.populate_reservations(QDate(month.year(), month.month(), 1))
+
+    worker = longest_stall(load_everything)
+    assert len(g.SCENE.tables) == TABLES, "floorplan wasn't loaded"
+    assert res_list.model().rowCount() > 0, "reservations weren't loaded"
+
+    # The same reads done on the GUI thread, as they were before the worker
+    slow = DelayedDatabase(g.DB.path)
+    blocking = longest_stall(lambda: (hp.GraphicsView.read_plan(slow, plan_id),
+                                      res_list.cache.read_month(slow, month.toString("yyyy-MM"))))
+    slow.close()
+
+    print(f"query delay                 {DELAY * 1000:7.1f} ms")
+    print(f"longest stall, worker       {worker * 1000:7.1f} ms")
+    print(f"longest stall, GUI thread   {blocking * 1000:7.1f} ms")
+
+    assert worker < DELAY / 2, "the event loop stalled while the worker was reading"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Times what logging a service event costs the GUI thread, and writing events in batches against one at a time
+# Run from the repository root: python -m benchmarks.bench_events
+import time
+
+from benchmarks.harness import setup, settle
+
+EVENTS = 20000
+
+
+def main():
+    setup()
+    import core.globals as g
+    from qtpy.QtCore import QRectF
+    from core.events import EventLog
+    from core.objects import POS_Server, POS_Table
+
+    server = POS_Server("Server 1")
+    tbl = POS_Table(QRectF(0, 0, 80, 80), 0, "1")
+
+    # What seat() / clear_seating() / cycleState() pay for each event
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        g.EVENTS.log(EventLog.SEAT, tbl, server, 2 + i % 4)
+    logged = time.perf_counter() - start
+
+    # The batches were handed to the worker as the buffer filled up, wait for them to be written
+    g.EVENTS.flush()
+    start = time.perf_counter()
+    settle()
+    batched = time.perf_counter() - start
+
+    # The same events written with a transaction each, as they would be without the buffer
+    row = ("seat", time.monotonic(), time.time(), None, "1", "Server 1", 2, None, 1)
+    start = time.perf_counter()
+    for _ in range(EVENTS // 10):
+        EventLog.write(g.DB, [row])
+    single = (time.perf_counter() - start) * 10
+
+    written = g.DB.fetchone("SELECT COUNT(*) FROM events")[0]
+    assert written == EVENTS + EVENTS // 10, "events went missing"
+
+    print(f"{EVENTS} events")
+    print(f"log() on the GUI thread       {logged / EVENTS * 1e6:8.2f} us per event")
+    print(f"batched writes (worker)       {batched / EVENTS * 1e6:8.2f} us per event, after the last log()")
+    print(f"one transaction per event     {single / EVENTS * 1e6:8.2f} us per event (estimated from {EVENTS // 10})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Finds the best table for parties on a busy event floor while tables are sat, cleared and bussed
+# Every answer is checked against a scan of the whole floor, and the scan is timed too
+# Run from the repository root: python -m benchmarks.bench_finder
+import random
+import time
+
+from benchmarks.harness import setup
+from benchmarks.suite import SEATS
+
+FLOORS = (400, 5000)
+SERVERS = 12
+QUERIES = 2000
+
+
+# The tightest number of seats a clean table has for the party (None if no clean table seats it)
+def scan(tables, party):
+    best = None
+
+    for tbl in tables:
+        if tbl.state == 0 and tbl.seats >= party and (best is None or tbl.seats < best):
+            best = tbl.seats
+
+    return best
+
+
+def main():
+    setup()
+    import core.globals as g
+    from qtpy.QtCore import QRectF
+    from core.objects import CapacityIndex, POS_Server, POS_Table
+
+    for i in range(SERVERS):
+        POS_Server("Server " + str(i + 1))
+    pred = g.SERVER_LIST.widget().pred
+
+    for count in FLOORS:
+        for tbl in g.SCENE.tables.tables():
+            g.SCENE.removeItem(tbl)
+
+        tables = []
+        for i in range(count):
+            tbl = POS_Table(QRectF((i % 50) * 100, (i // 50) * 100, 80, 80), i % SERVERS, str(i + 1),
+                            seats=SEATS[i % len(SEATS)])
+            g.SCENE.addItem(tbl)
+            tables.append(tbl)
+
+        rng = random.Random(count)
+        found = 0.0
+        scanned = 0.0
+        cycled = 0.0
+
+        for _ in range(QUERIES):
+            # Something happens at a few tables between each party (sat, cleared or bussed)
+            start = time.perf_counter()
+            for tbl in rng.sample(tables, 3):
+                tbl.state = (tbl.state + 1) % 3
+            cycled += time.perf_counter() - start
+
+            party = rng.randint(1, 9)
+            choice = pred.choice if pred.choice != "" else None
+
+            start = time.perf_counter()
+            picked = g.SCENE.find_tables(party, choice)
+            found += time.perf_counter() - start
+
+            start = time.perf_counter()
+            best = scan(tables, party)
+            scanned += time.perf_counter() - start
+
+            if best is None:
+                assert not picked, "picked a table for a party nothing seats"
+                continue
+
+            assert picked and all(tbl.state == 0 and tbl.seats >= party for tbl in picked), "picked a wrong table"
+            assert picked[0].seats - best <= CapacityIndex.SLACK, "the first pick isn't a tight fit"
+            if picked[0].server is not choice:
+                assert picked[0].seats == best, "the tightest fit wasn't picked first"
+
+        g.SCENE.clear_highlight()
+
+        print(f"{count:>5} tables  find {found / QUERIES * 1e6:7.1f} us   scan {scanned / QUERIES * 1e6:8.1f} us   "
+              f"state change {cycled / QUERIES / 3 * 1e6:6.1f} us")
+
+        assert found / QUERIES < 0.001, "finding a table took a millisecond or more"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Save/load cost of large floorplans, old "x,y,w,h;server;title;circ;rot" strings against the typed columns
+# Run from the repository root: python -m benchmarks.bench_floorplan_storage
+import time
+
+from benchmarks.harness import setup, grid_rect
+
+SIZES = (1000, 5000)
+
+
+def old_string(tbl):
+    server_num = tbl.server.num if tbl.server else -1
+    return f"{tbl.rect.left()},{tbl.rect.top()},{tbl.rect.width()},{tbl.rect.height()};" \
+           f"{server_num};{tbl.title};{tbl.circ};{tbl.rotation()}"
+
+
+def old_parse(db_string):
+    from qtpy.QtCore import QRectF
+    from core.objects import POS_Table
+
+    parts = db_string.split(';')
+    rect = parts[0].split(',')
+    return POS_Table(QRectF(float(rect[0]), float(rect[1]), float(rect[2]), float(rect[3])),
+                     int(parts[1]), parts[2], parts[3] == "True", float(parts[4]))
+
+
+def main():
+    setup()
+    import core.globals as g
+    from core.objects import POS_Server, POS_Table
+
+    POS_Server("Server 1")
+    g.DB.execute("CREATE TABLE old_plan_tables (table_id INTEGER PRIMARY KEY, data BLOB NOT NULL, "
+                 "plan_id INTEGER NOT NULL)")
+
+    for size in SIZES:
+        tables = [POS_Table(grid_rect(i), 0, str(i + 1), i % 3 == 0, 0) for i in range(size)]
+
+        # Old save path, one INSERT per table
+        start = time.perf_counter()
+        g.DB.execute("BEGIN")
+        for tbl in tables:
+            g.DB.execute("INSERT INTO old_plan_tables (data, plan_id) VALUES (?, ?)", (old_string(tbl), size))
+        g.DB.execute("COMMIT")
+        old_save = time.perf_counter() - start
+
+        # New save path, one executemany inside one transaction
+        start = time.perf_counter()
+        with g.DB.transaction():
+            g.DB.executemany("INSERT INTO plan_tables (plan_id, " + POS_Table.COLUMNS + ") "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             [(size,) + tbl.to_row() for tbl in tables])
+        new_save = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = g.DB.fetchall("SELECT data FROM old_plan_tables WHERE plan_id = ?", (size,))
+        loaded = [old_parse(row[0]) for row in rows]
+        old_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = g.DB.fetchall("SELECT table_id, " + POS_Table.COLUMNS + " FROM plan_tables "
+                             "WHERE plan_id = ? ORDER BY table_id", (size,))
+        loaded = [POS_Table.from_row(row) for row in rows]
+        new_load = time.perf_counter() - start
+
+        print(f"{size:>5} tables  save: strings {old_save * 1000:7.1f} ms  typed {new_save * 1000:7.1f} ms   "
+              f"load: strings {old_load * 1000:7.1f} ms  typed {new_load * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
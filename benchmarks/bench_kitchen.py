@@ -0,0 +1,106 @@
+# Fits the kitchen model to four weeks of service and times the overflow score with and without it
+# Turn times are drawn evenly from 0 to a known length per party size band, so the share of tables still sat falls
+# in a straight line and the fit should find those lengths again
+# Run from the repository root: python -m benchmarks.bench_kitchen
+import os
+import random
+import tempfile
+import time
+
+from core.database import Database
+from core.predict import KitchenModel, OverflowTracker
+
+TABLES = 80
+# Turns per table each day
+TURNS = 6
+# Longest turn of each band (minutes)
+LENGTHS = (40, 60, 75, 90)
+# Recent seatings on the floor while the score is timed
+RECENTS = 200
+TICKS = 10000
+
+
+def service_rows(rng, start, days):
+    rows = []
+
+    for day in range(days):
+        for table in range(TABLES):
+            now = start + day * 86400 + rng.randint(0, 1800)
+
+            for _ in range(TURNS):
+                party = rng.randint(1, 10)
+                length = LENGTHS[KitchenModel.band(party)] * 60
+                seconds = rng.uniform(1, length)
+                rows.append(("seat", 0, now, table, str(table + 1), "Server", party, None))
+                rows.append(("clear", 0, now + seconds, table, str(table + 1), "Server", party, None))
+                rows.append(("bus", 0, now + seconds + 120, table, str(table + 1), "Server", None, None))
+                now += seconds + rng.randint(180, 900)
+
+    return rows
+
+
+# Overlapping turns at two tables titled "1" (in slots 1 and 2) are read as two turns
+def check_shared_titles(db, start):
+    with db.transaction():
+        db.executemany("INSERT INTO events (kind, mono, wall, table_id, title, server, party, detail, slot) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       [("seat", 0, start, None, "1", "Server", 2, None, 1),
+                        ("seat", 0, start + 600, None, "1", "Server", 4, None, 2),
+                        ("clear", 0, start + 3600, None, "1", "Server", 2, None, 1),
+                        ("clear", 0, start + 4200, None, "1", "Server", 4, None, 2)])
+
+    turns = sorted(KitchenModel.read_turns(db, start, start + 86400))
+    assert turns == [(2, 3600), (4, 3600)], "turns at tables sharing a title were mixed up"
+
+
+def time_score(tracker, now) -> float:
+    began = time.perf_counter()
+    for tick in range(TICKS):
+        tracker.score(now + tick * 0.001)
+
+    return (time.perf_counter() - began) / TICKS
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="hosty-bench-")
+    db = Database(os.path.join(tmp, "hosty.db"))
+    db.create_tables()
+
+    now = time.time()
+    # Well before the fitted weeks
+    check_shared_titles(db, now - 2 * KitchenModel.DAYS * 86400)
+
+    rng = random.Random(1)
+    rows = service_rows(rng, now - KitchenModel.DAYS * 86400, KitchenModel.DAYS)
+    with db.transaction():
+        db.executemany("INSERT INTO events (kind, mono, wall, table_id, title, server, party, detail) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    began = time.perf_counter()
+    model = KitchenModel.refit(db, now)
+    took = time.perf_counter() - began
+
+    print(f"refit       {took * 1000:8.1f} ms for {sum(model.turns)} turns")
+    for band, length in enumerate(LENGTHS):
+        print(f"band {band}      {model.minutes(band):8.1f} minutes (generated {length})")
+        assert abs(model.minutes(band) - length) < length * 0.05, "band " + str(band) + " fit is off"
+
+    # Only the turns cleared inside the window are fitted
+    assert sum(model.turns) <= TABLES * TURNS * KitchenModel.DAYS
+
+    flat = OverflowTracker([], 1 / 60)
+    fitted = OverflowTracker([], 1 / 60, model)
+    mono = time.monotonic()
+    for i in range(RECENTS):
+        num = rng.randint(1, 10)
+        flat.add(num, mono - i * 20)
+        fitted.add(num, mono - i * 20)
+
+    print(f"score flat  {time_score(flat, mono) * 1e6:8.2f} us")
+    print(f"score fit   {time_score(fitted, mono) * 1e6:8.2f} us")
+
+    assert took < 1.0, "refitting four weeks took a second or more"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# Painting a 1000 table floor
+# Compares the old POS_Table.paint (fonts resized and the title laid out on every paint, no item cache)
+# with the cached body, and times hovering across tables and the seat clock ticking over sat tables
+# Run from the repository root: python -m benchmarks.bench_paint
+import time
+
+from benchmarks.harness import setup
+
+TABLES = 1000
+FRAMES = 20
+COLUMNS = 40
+
+
+def make_old_table():
+    from qtpy.QtCore import Qt
+    from qtpy.QtGui import QPen, QBrush
+    from qtpy.QtWidgets import QGraphicsItem
+    import core.globals as g
+    from core.objects import POS_Table, formatElapsed
+
+    # POS_Table.paint as it was before the render cache
+    class OldTable(POS_Table):
+        def __init__(self, *args):
+            super(OldTable, self).__init__(*args)
+            self.setCacheMode(QGraphicsItem.NoCache)
+            # The timer text is drawn by paint() below, as it was before the SeatTimer child
+            self.timer.setParentItem(None)
+
+        def prepareGeometryChange(self):
+            QGraphicsItem.prepareGeometryChange(self)
+
+        def cycleState(self, advance, mouseover, override=-1):
+            self.prepareGeometryChange()
+            self.color = g.COLORS["tbl_msoready"] if mouseover else g.COLORS["tbl_ready"]
+
+        def paint(self, painter, option, widget):
+            painter.setPen(QPen(self.serverColor, 5, Qt.SolidLine))
+            painter.setBrush(QBrush(self.color, Qt.SolidPattern))
+
+            if self.circ:
+                painter.drawEllipse(self.gfxRect())
+            else:
+                painter.drawRoundedRect(self.gfxRect(), 8, 8)
+
+            painter.setPen(QPen(Qt.black))
+            s1 = min(self.gfxRect().width(), self.gfxRect().height())
+            s2 = s1 / 2.5
+            g.FONT_TABLE.setPointSize(int(s2))
+            painter.setFont(g.FONT_TABLE)
+            painter.drawText(self.gfxRect(), Qt.AlignCenter, self.title)
+
+            if self.state == 1:
+                if self.circ:
+                    s2 *= 0.8
+
+                g.FONT.setPointSize(int(s2 / 2.2))
+                painter.setFont(g.FONT)
+                painter.drawText(self.timerRect(), Qt.AlignCenter, formatElapsed(self.elapsed()))
+
+    return OldTable
+
+
+def build_floor(table_class):
+    from qtpy.QtCore import QRectF
+    import core.globals as g
+
+    for item in g.SCENE.tables.tables():
+        g.SCENE.removeItem(item)
+
+    tables = []
+    for i in range(TABLES):
+        tbl = table_class(QRectF((i % COLUMNS) * 100, (i // COLUMNS) * 100, 80, 80), 0, str(i + 1), i % 4 == 0)
+        g.SCENE.addItem(tbl)
+        tables.append(tbl)
+
+    # A third of the floor is sat
+    now = time.monotonic()
+    for tbl in tables[::3]:
+        tbl.state = 1
+        tbl.seatTime = now - 600
+
+    g.VIEW.fitInView(g.SCENE.itemsBoundingRect(), 1)
+    g.VIEW.viewport().repaint()
+
+    return tables
+
+
+def full_frames():
+    import core.globals as g
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        g.VIEW.viewport().repaint()
+
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+
+# Moves the mouse over 200 tables, painting after each enter and leave
+def hover_sweep(tables):
+    import core.globals as g
+
+    start = time.perf_counter()
+    for tbl in tables[:200]:
+        tbl.cycleState(False, True)
+        g.APP.processEvents()
+        tbl.cycleState(False, False)
+        g.APP.processEvents()
+
+    return (time.perf_counter() - start) / 400 * 1000
+
+
+# A second of the seat clock: the sat tables' timers are marked for repainting, then painted
+def clock_ticks(tables, tick):
+    import core.globals as g
+
+    for tbl in tables[::3]:
+        g.SCENE.start_seat_timer(tbl)
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        tick(tables[::3])
+        g.APP.processEvents()
+    elapsed = (time.perf_counter() - start) / FRAMES * 1000
+
+    for tbl in tables[::3]:
+        g.SCENE.stop_seat_timer(tbl)
+
+    return elapsed
+
+
+# Before the SeatTimer child, every sat table repainted all of itself to redraw its timer
+def old_tick(sat):
+    for tbl in sat:
+        tbl.update()
+
+
+def cached_tick(sat):
+    import core.globals as g
+
+    # The scene's clock marks every SeatTimer child
+    g.SCENE.tick_seat_clock()
+
+
+def main():
+    setup()
+    from core.objects import POS_Server, POS_Table
+
+    POS_Server("Server 1")
+
+    print(f"{TABLES} tables, all in view")
+    for name, table_class, ticker in (("old paint", make_old_table(), old_tick),
+                                      ("cached paint", POS_Table, cached_tick)):
+        tables = build_floor(table_class)
+        frame = full_frames()
+        hover = hover_sweep(tables)
+        tick = clock_ticks(tables, ticker)
+        print(f"{name:14} full frame {frame:8.2f} ms   hover {hover:6.2f} ms   seat clock tick {tick:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
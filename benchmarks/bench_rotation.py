@@ -0,0 +1,92 @@
+# "Who's next" with hundreds of servers and thousands of seat events
+# Compares the RotationEngine's per-server updates with the old full recompute on every event
+# Run from the repository root: python -m benchmarks.bench_rotation
+import random
+import time
+
+from core.predict import RotationEngine
+
+SERVERS = (20, 200, 500)
+EVENTS = 5000
+
+
+class Server:
+    def __init__(self, num):
+        self.num = num
+        self.headActive = 0
+        self.headTotal = 0
+
+
+# The old ServerPredictor.calculate_choice scoring
+def recompute(servers):
+    highestTotal = 0
+    for server in servers:
+        if server.headTotal > highestTotal:
+            highestTotal = server.headTotal
+
+    scores = {}
+    for server in servers:
+        active = server.headActive
+        if server.headActive == 0:
+            active = -20
+        scores[server] = highestTotal - server.headTotal - active
+
+    return max(scores, key=lambda i: scores[i])
+
+
+# Seat and clear events against random servers, the same sequence for both runs
+def events(count, server_count):
+    rng = random.Random(count * server_count)
+    seated = []
+    out = []
+
+    for _ in range(count):
+        if seated and rng.random() < 0.45:
+            out.append(("clear",) + seated.pop(rng.randrange(len(seated))))
+        else:
+            seat = (rng.randrange(server_count), rng.randint(1, 8))
+            seated.append(seat)
+            out.append(("seat",) + seat)
+
+    return out
+
+
+def apply(server, kind, heads):
+    if kind == "seat":
+        server.headActive += heads
+        server.headTotal += heads
+    else:
+        server.headActive -= heads
+
+
+def main():
+    for server_count in SERVERS:
+        seq = events(EVENTS, server_count)
+
+        servers = [Server(i) for i in range(server_count)]
+        start = time.perf_counter()
+        old_choices = []
+        for kind, num, heads in seq:
+            apply(servers[num], kind, heads)
+            old_choices.append(recompute(servers).num)
+        old = time.perf_counter() - start
+
+        servers = [Server(i) for i in range(server_count)]
+        engine = RotationEngine()
+        engine.rebuild(servers)
+        start = time.perf_counter()
+        new_choices = []
+        for kind, num, heads in seq:
+            apply(servers[num], kind, heads)
+            engine.update(servers[num])
+            new_choices.append(engine.best().num)
+        new = time.perf_counter() - start
+
+        assert old_choices == new_choices, "rotation engine disagrees with the old recompute"
+
+        print(f"{server_count:>4} servers, {EVENTS} events  recompute {old * 1000:8.1f} ms  "
+              f"engine {new * 1000:7.1f} ms  ({old / new:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
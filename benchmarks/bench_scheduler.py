@@ -0,0 +1,81 @@
+# Plans generated nights of reservations onto a floor's tables, then edits them and plans again
+# The plans themselves are checked by tests/test_scheduler.py
+# Run from the repository root: python -m benchmarks.bench_scheduler
+import random
+import time
+
+from benchmarks.suite import SEATS
+from core.scheduler import RESET, Booking, TableScheduler, expected_turn, make_bookings
+
+NIGHTS = 20
+RESERVATIONS = 300
+TABLES = 100
+EDITS = 200
+
+
+# Reservation times of a night, every 15 minutes from opening (minutes past midnight) for hours
+def night_times(opens: int, hours: int) -> list:
+    return ["{:02d}:{:02d}".format((m // 60) % 24, m % 60) for m in range(opens, opens + hours * 60, 15)]
+
+
+def make_booking(rng, res_id, times, opens):
+    # Mostly small parties, now and then one bigger than any table (tables aren't pushed together)
+    size = rng.choice((1, 2, 2, 2, 3, 4, 4, 4, 5, 6, 6, 7, 8, 10))
+
+    return make_bookings([(res_id, rng.choice(times), size)], None, opens % 1440)[0]
+
+
+def main():
+    rng = random.Random(24)
+    tables = {slot: SEATS[slot % len(SEATS)] for slot in range(TABLES)}
+
+    planned = []
+    synced = []
+    replanned = 0
+    unassigned = 0
+
+    for night in range(NIGHTS):
+        # Every other night runs past midnight
+        opens = 17 * 60 if night % 2 == 0 else 20 * 60
+        times = night_times(opens, 6)
+        bookings = {res_id: make_booking(rng, res_id, times, opens) for res_id in range(1, RESERVATIONS + 1)}
+        next_id = RESERVATIONS + 1
+
+        schedule = TableScheduler()
+        start = time.perf_counter()
+        schedule.plan(str(night), list(bookings.values()), tables)
+        planned.append(time.perf_counter() - start)
+
+        unassigned += len(schedule.unassigned())
+
+        # Added, re-timed, resized and canceled reservations, as the dialog and the list would make them
+        for _ in range(EDITS):
+            action = rng.random()
+            if action < 0.3:
+                bookings[next_id] = make_booking(rng, next_id, times, opens)
+                next_id += 1
+            elif action < 0.8:
+                old = bookings[rng.choice(list(bookings))]
+                size = rng.randint(1, 10) if action < 0.55 else old.size
+                arrives = old.start if action < 0.55 else old.start + rng.choice((-30, -15, 15, 30))
+                bookings[old.res_id] = Booking(old.res_id, arrives, size, arrives + expected_turn(size) + RESET)
+            else:
+                del bookings[rng.choice(list(bookings))]
+
+            start = time.perf_counter()
+            replanned += schedule.sync(str(night), list(bookings.values()), tables)
+            synced.append(time.perf_counter() - start)
+
+    plan_time = sum(planned) / len(planned)
+    sync_time = sum(synced) / len(synced)
+
+    print(f"plan         {plan_time * 1000:7.2f} ms for {RESERVATIONS} reservations on {TABLES} tables "
+          f"(worst {max(planned) * 1000:.2f} ms)")
+    print(f"edit + sync  {sync_time * 1000:7.2f} ms, {replanned / len(synced):.0f} bookings planned again on average")
+    print(f"no table     {unassigned / NIGHTS:7.1f} reservations a night")
+
+    assert max(planned) < 0.1, "planning a night took a tenth of a second or more"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# Searches years of reservations the way the search box does, a page of matches at a time as each letter is typed
+# The search index is built by the migration from reservations that were already there, then kept up to date by the
+# triggers. Every search is checked against a scan of all the rows.
+# Run from the repository root: python -m benchmarks.bench_search
+import os
+import random
+import re
+import statistics
+import tempfile
+import time
+
+import core.ressearch as ressearch
+from core.database import MIGRATIONS, Database, create_reservation_search
+
+RESERVATIONS = 300000
+# Searches typed a letter at a time
+SEARCHES = 40
+# Searches checked against a scan of every row
+CHECKED = 12
+PAGE_SIZE = 64
+
+FIRST = ("Ann", "Bob", "Carla", "Dmitri", "Elena", "Frank", "Grace", "Hiro", "Ines", "José", "Kai", "Lena", "Maya",
+         "Nils", "Omar", "Priya", "Quinn", "Rosa", "Sam", "Tariq", "Uma", "Victor", "Wen", "Yusuf", "Zoë")
+LAST = ("Smith", "Smythe", "Johnson", "Nguyen", "Garcia", "Müller", "Kowalski", "O'Brien", "Rossi", "Tanaka", "Dubois",
+        "Haddad", "Larsen", "Novak", "Silva", "Khan", "Murphy", "Schmidt", "Andersson", "Costa")
+NOTES = ("", "", "", "birthday", "anniversary", "window seat", "high chair", "wheelchair", "nut allergy", "patio",
+         "booth please", "vegan", "gluten free", "business dinner")
+
+
+def make_rows(rng, count: int) -> list:
+    rows = []
+
+    for i in range(count):
+        # About five years of bookings
+        day = i * 1826 // count
+        rows.append(("{:04d}-{:02d}-{:02d}".format(2020 + day // 365, 1 + day % 365 // 31 % 12, 1 + day % 28),
+                     "{:02d}:{:02d}:00".format(rng.randint(17, 22), rng.choice((0, 15, 30, 45))),
+                     rng.choice(FIRST) + " " + rng.choice(LAST), rng.randint(1, 10),
+                     "{:03d}{:07d}".format(rng.randint(200, 999), rng.randint(0, 9999999)),
+                     rng.choice(NOTES), rng.choice((0, 1, 1, 2))))
+
+    return rows
+
+
+# Words the way FTS5's unicode61 tokenizer splits them (case and accents folded)
+def words(text) -> list:
+    import unicodedata
+
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+
+    return re.findall(r"[^\W_]+", text)
+
+
+# Every reservation's res_id, the words of its name, phone number and note, and its phone number, newest first
+def read_words(db) -> list:
+    return [(res_id, words(name) + words(phone) + words(note), str(phone or ""))
+            for res_id, name, phone, note in db.fetchall_tuples("SELECT res_id, name, phone, note FROM reservations "
+                                                                "ORDER BY res_id DESC")]
+
+
+# The res_ids of every reservation that has a word starting with each typed word, newest first, by looking at every row
+# A typed phone number also matches the numbers it's the last digits of
+def scan(table: list, text: str) -> list:
+    if ressearch.PHONE.fullmatch(text.strip()):
+        digits = "".join(ch for ch in text if ch.isdigit())
+
+        return [res_id for res_id, have, phone in table
+                if any(word.startswith(digits) for word in have) or phone.endswith(digits)]
+
+    typed = [words(word)[0] for word in ressearch.WORD.findall(text) if words(word)]
+
+    return [res_id for res_id, have, phone in table
+            if all(any(word.startswith(prefix) for word in have) for prefix in typed)]
+
+
+# Every match of a search, read a page at a time like the search list does
+def search_all(db, text: str) -> list:
+    query = ressearch.match_query(text)
+    found = []
+    after = None
+
+    while True:
+        page = ressearch.search_page(db, query, after, PAGE_SIZE)
+        found.extend(row[0] for row in page)
+
+        if len(page) < PAGE_SIZE:
+            return found
+
+        after = page[-1][0]
+
+
+def typed_text(rng) -> str:
+    kind = rng.random()
+
+    if kind < 0.5:
+        return rng.choice(FIRST) + " " + rng.choice(LAST) if kind < 0.2 else rng.choice(LAST)
+    elif kind < 0.7:
+        phone = "{:03d}{:07d}".format(rng.randint(200, 999), rng.randint(0, 9999999))
+        return phone[:3] + "-" + phone[3:6] + "-" + phone[6:]
+    elif kind < 0.8:
+        # The last four digits
+        return "{:04d}".format(rng.randint(0, 9999))
+
+    return rng.choice([note for note in NOTES if note])
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix="hosty-bench-")
+    db = Database(os.path.join(tmp, "hosty.db"))
+    rng = random.Random(25)
+
+    # A database from before the search index, with years of reservations in it
+    for number, migration in enumerate(MIGRATIONS[:MIGRATIONS.index(create_reservation_search)], 1):
+        with db.transaction():
+            migration(db)
+            db.execute(f"PRAGMA user_version = {number}")
+
+    rows = make_rows(rng, RESERVATIONS)
+    with db.transaction():
+        db.executemany("INSERT INTO reservations (date, time, name, size, phone, note, state) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    began = time.perf_counter()
+    db.create_tables()
+    print(f"index {RESERVATIONS} reservations   {(time.perf_counter() - began) * 1000:8.1f} ms")
+
+    assert ressearch.available(db), "the search index wasn't made"
+    db.execute("INSERT INTO reservations_search (reservations_search, rank) VALUES ('integrity-check', 1)")
+
+    # The triggers keep the index up to date
+    with db.transaction():
+        db.execute("UPDATE reservations SET name = 'Xavier Quux' WHERE res_id = 10")
+        db.execute("UPDATE reservations SET state = 1, size = 3 WHERE res_id = 11")
+        db.execute("DELETE FROM reservations WHERE res_id = 12")
+        db.execute("INSERT INTO reservations (date, time, name, size, phone, note) "
+                   "VALUES ('2026-01-01', '19:00:00', 'Zed Quux', 2, '5550001111', 'Corner table')")
+    db.execute("INSERT INTO reservations_search (reservations_search, rank) VALUES ('integrity-check', 1)")
+
+    assert search_all(db, "quux") == [RESERVATIONS + 1, 10], "an added or renamed reservation wasn't found"
+    assert search_all(db, "555-000-111") == [RESERVATIONS + 1], "a phone number wasn't found"
+    assert RESERVATIONS + 1 in search_all(db, "1111"), "a phone number wasn't found by its last digits"
+    assert RESERVATIONS + 1 not in search_all(db, "0001"), "a phone number was found by digits in its middle"
+    assert search_all(db, "corner tab") == [RESERVATIONS + 1], "a note wasn't found"
+    assert ressearch.match_query("x") is None and ressearch.match_query(" - ") is None, "a single letter was searched"
+    table = read_words(db)
+    assert search_all(db, 'and "or" not') == scan(table, 'and "or" not'), "query syntax in the search box leaked through"
+    old_name = rows[11][2]
+    assert 12 not in search_all(db, old_name), "a deleted reservation was still found"
+
+    began = time.perf_counter()
+    for _ in range(CHECKED):
+        text = typed_text(rng)
+        assert search_all(db, text) == scan(table, text), "search for " + repr(text) + " differs from a scan"
+    print(f"checked {CHECKED} searches against a scan of every row ({time.perf_counter() - began:.1f} s)")
+
+    # Each letter typed searches again, only the first page is read unless the list is scrolled
+    first = []
+    more = []
+    for _ in range(SEARCHES):
+        text = typed_text(rng)
+
+        for length in range(1, len(text) + 1):
+            query = ressearch.match_query(text[:length])
+            if query is None:
+                continue
+
+            began = time.perf_counter()
+            page = ressearch.search_page(db, query, None, PAGE_SIZE)
+            first.append(time.perf_counter() - began)
+
+            if len(page) == PAGE_SIZE:
+                began = time.perf_counter()
+                ressearch.search_page(db, query, page[-1][0], PAGE_SIZE)
+                more.append(time.perf_counter() - began)
+
+    first.sort()
+    print(f"first page  median {statistics.median(first) * 1000:6.2f} ms   "
+          f"95th {first[int(len(first) * 0.95)] * 1000:6.2f} ms   worst {first[-1] * 1000:6.2f} ms   "
+          f"({len(first)} searches)")
+    print(f"next page   median {statistics.median(more) * 1000:6.2f} ms   worst {max(more) * 1000:6.2f} ms")
+
+    assert statistics.median(first) < 0.005, "a search took 5 ms or more"
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# CPU cost of keeping 500 sat tables' timers ticking
+# Compares the scene's shared seat clock with the old one-QTimer-per-table approach
+# Run from the repository root: python -m benchmarks.bench_seat_clock
+import time
+
+from benchmarks.harness import setup, grid_rect
+
+TABLES = 500
+SECONDS = 10
+
+
+def run_for(seconds):
+    from qtpy.QtCore import QEventLoop, QTimer
+
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+
+    start = time.process_time()
+    loop.exec_()
+    return time.process_time() - start
+
+
+def main():
+    hp = setup()
+    import core.globals as g
+    from core.objects import POS_Server, POS_Table
+    from qtpy.QtCore import QTimer
+
+    POS_Server("Server 1")
+
+    tables = []
+    for i in range(TABLES):
+        tbl = POS_Table(grid_rect(i), 0, str(i + 1))
+        g.SCENE.addItem(tbl)
+        tables.append(tbl)
+
+    # Seat every table without going through the party size prompt
+    for tbl in tables:
+        tbl.state = 1
+        tbl.numCustomers = 2
+        tbl.seatTime = time.monotonic()
+
+    idle = run_for(SECONDS)
+    print(f"idle                      {idle / SECONDS * 1000:7.1f} ms CPU per second")
+
+    # The old approach, every table runs its own one second timer and repaints its whole rect
+    timers = []
+    for tbl in tables:
+        timer = QTimer()
+        timer.timeout.connect(lambda t=tbl: t.update(t.rect))
+        timer.start(1000)
+        timers.append(timer)
+
+    per_table = run_for(SECONDS)
+    print(f"one QTimer per table      {per_table / SECONDS * 1000:7.1f} ms CPU per second   "
+          f"({(per_table - idle) / SECONDS * 1000:5.1f} over idle)")
+
+    for timer in timers:
+        timer.stop()
+
+    for tbl in tables:
+        g.SCENE.start_seat_timer(tbl)
+
+    shared = run_for(SECONDS)
+    print(f"shared seat clock         {shared / SECONDS * 1000:7.1f} ms CPU per second   "
+          f"({(shared - idle) / SECONDS * 1000:5.1f} over idle)")
+
+    # Time the tick itself, without the repaint it schedules
+    start = time.perf_counter()
+    for _ in range(100):
+        g.SCENE.tick_seat_clock()
+    print(f"tick_seat_clock           {(time.perf_counter() - start) / 100 * 1000:7.3f} ms per tick")
+
+
+if __name__ == "__main__":
+    main()
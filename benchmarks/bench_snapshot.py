@@ -0,0 +1,83 @@
+# Times snapshotting the live floor during service and restoring it on startup
+# Run from the repository root: python -m benchmarks.bench_snapshot
+import time
+
+from benchmarks.harness import setup, settle
+
+TABLES = 5000
+SERVERS = 20
+# Tables cycled between two snapshots
+BUSY = 25
+
+
+def build_floor(sections):
+    import core.globals as g
+    from benchmarks.suite import plan_rows
+    from core.objects import POS_Server
+
+    g.ALL_SERVERS.clear()
+    for i in range(SERVERS):
+        POS_Server("Server " + str(i + 1))
+
+    # Rows as they are read, table_id first (these were never saved)
+    rows = [(None,) + row[1:] for row in plan_rows(0, TABLES, SERVERS)]
+    per_section = -(-TABLES // sections)
+    g.SCENE.sections.load([("Section " + str(i + 1), rows[i * per_section:(i + 1) * per_section])
+                           for i in range(sections)])
+
+
+def seat_some(offset):
+    import core.globals as g
+
+    tables = g.SCENE.tables.tables()
+    for tbl in tables[offset:offset + BUSY]:
+        tbl.state = 1
+        tbl.seat(2 + offset % 4)
+
+
+def main():
+    setup()
+    import core.globals as g
+    from core.snapshot import FloorSnapshot
+
+    snapshot = FloorSnapshot(g.SCENE)
+
+    for sections in (1, 5):
+        snapshot.discard(g.DB)
+        build_floor(sections)
+
+        start = time.perf_counter()
+        snapshot.take()
+        first = time.perf_counter() - start
+        settle()
+
+        seat_some(0)
+        start = time.perf_counter()
+        future = snapshot.take()
+        incremental = time.perf_counter() - start
+        written = len(future.args[0])
+        settle()
+
+        start = time.perf_counter()
+        snap = FloorSnapshot.read(g.DB)
+        read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot.restore(snap)
+        restore = time.perf_counter() - start
+        g.APP.processEvents()
+
+        assert len(g.SCENE.tables) + len(g.SCENE.sections.records()) == TABLES, "tables went missing"
+        assert len(g.SCENE.tables.in_state(1)) == BUSY, "sat tables weren't restored"
+
+        print(f"{TABLES} tables in {sections} section(s)")
+        print(f"  first snapshot           {first * 1000:8.2f} ms on the GUI thread")
+        print(f"  snapshot after {BUSY} seats {incremental * 1000:8.2f} ms on the GUI thread, {written} table rows")
+        print(f"  read on startup          {read * 1000:8.2f} ms")
+        print(f"  restore                  {restore * 1000:8.2f} ms")
+
+        assert read + restore < 1.0, "restoring took a second or more"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Repaint time of ever larger floors, each zoomed out to fit the view
+# With level of detail the far-out floors are drawn as plain shapes, so a frame should cost about the same
+# however many tables there are. The same floors are also timed with every table drawn at full detail.
+# Run from the repository root: python -m benchmarks.bench_zoom
+import time
+
+from benchmarks.harness import setup
+
+FLOORS = (250, 1000, 4000)
+FRAMES = 20
+WIDTH = 1600
+HEIGHT = 1000
+
+
+def build_floor(count):
+    from qtpy.QtCore import QRectF
+    import core.globals as g
+    from core.objects import POS_Table
+
+    for item in g.SCENE.tables.tables():
+        g.SCENE.removeItem(item)
+
+    columns = int((count * 1.6) ** 0.5)
+    now = time.monotonic()
+    for i in range(count):
+        tbl = POS_Table(QRectF((i % columns) * 100, (i // columns) * 100, 80, 80), 0, str(i + 1), i % 4 == 0)
+        g.SCENE.addItem(tbl)
+
+        # A third of the floor is sat
+        if i % 3 == 0:
+            tbl.state = 1
+            tbl.seatTime = now - 600
+            g.SCENE.start_seat_timer(tbl)
+
+
+def fit_floor():
+    import core.globals as g
+
+    g.VIEW.set_zoom(1.0)
+    bounds = g.SCENE.itemsBoundingRect()
+    g.VIEW.set_zoom(min(WIDTH / bounds.width(), HEIGHT / bounds.height()) * 0.95)
+
+
+def frame_time():
+    import core.globals as g
+
+    # Fill the item caches first
+    g.VIEW.viewport().repaint()
+
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        g.SCENE.tick_seat_clock()
+        g.VIEW.viewport().repaint()
+
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+
+def main():
+    setup(WIDTH, HEIGHT)
+    import core.globals as g
+    from core.objects import POS_Server, POS_Table
+
+    POS_Server("Server 1")
+
+    lod = (POS_Table.LOD_TEXT, POS_Table.LOD_SHAPE)
+
+    for count in FLOORS:
+        build_floor(count)
+        fit_floor()
+
+        POS_Table.LOD_TEXT, POS_Table.LOD_SHAPE = lod
+        with_lod = frame_time()
+
+        # Every table at full detail, whatever the zoom
+        POS_Table.LOD_TEXT = POS_Table.LOD_SHAPE = 0.0
+        for tbl in g.SCENE.tables.tables():
+            tbl.update()
+        full = frame_time()
+
+        POS_Table.LOD_TEXT, POS_Table.LOD_SHAPE = lod
+        print(f"{count:5} tables at zoom {g.VIEW.zoom:5.2f}   level of detail {with_lod:7.2f} ms   "
+              f"full detail {full:7.2f} ms per frame")
+
+
+if __name__ == "__main__":
+    main()
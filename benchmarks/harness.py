@@ -0,0 +1,84 @@
+# Builds a headless copy of the main window for the benchmarks
+# The database and settings are kept in a temporary directory so real data is never touched
+import atexit
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from qtpy.QtCore import QSettings, QTime, Qt
+from qtpy.QtWidgets import QApplication, QVBoxLayout, QWidget
+
+import core.globals as g
+from core.database import Database
+from core.dbworker import DatabaseWorker
+from core.events import EventLog
+
+
+# factory makes the database worker's connection (a slowed down Database can be passed in)
+def setup(width=1600, height=1000, factory=Database):
+    tmp = tempfile.mkdtemp(prefix="hosty-bench-")
+
+    g.DB = Database(os.path.join(tmp, "hosty.db"))
+    g.DB.create_tables()
+
+    g.WORKER = DatabaseWorker(os.path.join(tmp, "hosty.db"), factory)
+    g.WORKER.start()
+    atexit.register(g.WORKER.stop)
+
+    g.SETTINGS = QSettings(os.path.join(tmp, "settings.ini"), QSettings.IniFormat)
+    g.SETTINGS.setValue("b_preview", 0)
+    g.SETTINGS.setValue("settings/fullhour", 0)
+    g.SETTINGS.setValue("settings/minResTime", QTime(0, 0))
+    g.SETTINGS.setValue("settings/maxResTime", QTime(23, 59))
+    g.SETTINGS.setValue("settings/overflowMultiplier", 1)
+    g.SETTINGS.setValue("settings/maxrecents", 5)
+    g.SETTINGS.setValue("data/overflowRules", g.overflowRules)
+    g.SETTINGS.setValue("data/recentFloorplans", g.recentFloorplans)
+
+    g.APP = QApplication.instance() or QApplication(sys.argv[:1])
+    g.EVENTS = EventLog()
+
+    # Imported here so the application exists before any widgets are made
+    import hostprogram as hp
+    from docks.resDock import ResList_Dock
+    from docks.servDock import ServList_Dock
+
+    g.WINDOW = hp.MainWindow()
+    g.SERVER_LIST = ServList_Dock(g.WINDOW)
+    g.RES_LIST = ResList_Dock(g.WINDOW)
+    g.WINDOW.addDockWidget(Qt.RightDockWidgetArea, g.RES_LIST)
+    g.WINDOW.addDockWidget(Qt.RightDockWidgetArea, g.SERVER_LIST)
+
+    g.SCENE = hp.GraphicsScene()
+    g.VIEW = hp.GraphicsView(g.SCENE, g.WINDOW)
+    central = QWidget(g.WINDOW)
+    layout = QVBoxLayout(central)
+    layout.setContentsMargins(0, 0, 0, 0)
+    layout.setSpacing(0)
+    layout.addWidget(g.VIEW.sectionBar)
+    layout.addWidget(g.VIEW)
+    g.WINDOW.setCentralWidget(central)
+
+    g.WINDOW.resize(width, height)
+    g.WINDOW.show()
+    settle()
+
+    return hp
+
+
+# Runs the event loop until every job given to the database worker has been delivered
+def settle():
+    while g.WORKER.active:
+        g.APP.processEvents()
+        time.sleep(0.0005)
+    g.APP.processEvents()
+
+
+# Lays tables out on a grid of 100x100 cells
+def grid_rect(i, columns=40, size=80):
+    from qtpy.QtCore import QRectF
+
+    return QRectF((i % columns) * 100, (i // columns) * 100, size, size)
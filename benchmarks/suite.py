@@ -0,0 +1,334 @@
+# Times the host stand's hot paths at several floor, staff and booking sizes, headless
+# Results are written as JSON so runs from before and after a change can be compared
+# Run from the repository root: python -m benchmarks.suite [--quick] [--repeat N] [--out results.json]
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import setup, settle
+
+TABLES = (10, 100, 1000, 5000)
+SERVERS = (1, 10, 50, 200)
+RESERVATIONS = (100, 1000, 10000, 100000)
+FLOORPLANS = (10, 100, 1000)
+
+QUICK_TABLES = (10, 100)
+QUICK_SERVERS = (1, 10)
+QUICK_RESERVATIONS = (100, 1000)
+QUICK_FLOORPLANS = (10,)
+
+WIDTH = 1600
+HEIGHT = 1000
+# Seats of the generated tables, in turn
+SEATS = (2, 4, 4, 6, 8)
+
+
+# Runs fn repeat times (after one untimed warm up run) and returns the run times in milliseconds
+def measure(fn, repeat, warmup=True):
+    if warmup:
+        fn()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+
+    return times
+
+
+class Suite:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def record(self, name, size, unit, times):
+        result = {
+            "name":   name,
+            "size":   size,
+            "unit":   unit,
+            "runs":   len(times),
+            "min":    min(times),
+            "median": statistics.median(times),
+            "mean":   statistics.fmean(times),
+            "max":    max(times),
+        }
+        self.results.append(result)
+        print(f"{name:32} {size:>7} {unit:12} median {result['median']:9.3f} ms   min {result['min']:9.3f} ms")
+
+    def run(self, name, size, unit, fn, warmup=True):
+        self.record(name, size, unit, measure(fn, self.repeat, warmup))
+
+
+# A square grid of tables that fills the view, alternating between the plan's servers
+def plan_rows(plan_id, count, servers):
+    columns = max(1, math.ceil(math.sqrt(count * WIDTH / HEIGHT)))
+    cell = WIDTH / columns
+    size = cell * 0.8
+
+    return [(plan_id, (i % columns) * cell, (i // columns) * cell, size, size, i % servers, str(i + 1), i % 5 == 0, 0,
+             SEATS[i % len(SEATS)])
+            for i in range(count)]
+
+
+def add_plan(count, servers):
+    import core.globals as g
+    from core.objects import POS_Table
+
+    with g.DB.transaction():
+        plan_id = g.DB.execute("INSERT INTO floorplans (name, server_count) VALUES (?, ?)",
+                               ("Bench " + str(count), servers)).lastrowid
+        g.DB.executemany("INSERT INTO plan_tables (plan_id, " + POS_Table.COLUMNS + ") "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", plan_rows(plan_id, count, servers))
+
+    return plan_id
+
+
+# Reads the plan from the database every time (cold) or from the view's plan cache (warm)
+def load_plan(plan_id, temp, cold):
+    import core.globals as g
+
+    def run():
+        if cold:
+            g.VIEW.invalidate_plan(plan_id)
+        elif temp:
+            # Only the plan rows are cached, the preview scene is built again
+            g.VIEW.previewCache.invalidate(plan_id)
+
+        g.VIEW.load_floorplan(plan_id, temp)
+        settle()
+
+        if temp:
+            g.VIEW.restore_plan()
+
+    return run
+
+
+def bench_floorplans(suite, sizes):
+    import core.globals as g
+
+    for count in sizes:
+        plan_id = add_plan(count, 4)
+
+        g.VIEW.store_plan()
+        suite.run("load_floorplan cold", count, "tables", load_plan(plan_id, False, True))
+        suite.run("load_floorplan warm", count, "tables", load_plan(plan_id, False, False))
+        suite.run("load_floorplan preview cold", count, "tables", load_plan(plan_id, True, True))
+        suite.run("load_floorplan preview warm", count, "tables", load_plan(plan_id, True, False))
+
+        # Every table in view, painted the way a frame of the viewport is
+        g.VIEW.load_floorplan(plan_id)
+        settle()
+        g.VIEW.fitInView(g.SCENE.itemsBoundingRect(), 1)
+        suite.run("paint full viewport", count, "tables", g.VIEW.viewport().repaint)
+        g.VIEW.resetTransform()
+
+
+# The same number of tables split evenly over sections, only the first section's tables are built on load
+def add_sectioned_plan(count, servers, sections):
+    import core.globals as g
+    from core.objects import POS_Table
+
+    per_section = math.ceil(count / sections)
+
+    with g.DB.transaction():
+        plan_id = g.DB.execute("INSERT INTO floorplans (name, server_count) VALUES (?, ?)",
+                               ("Bench sections " + str(count), servers)).lastrowid
+        g.DB.executemany("INSERT INTO plan_sections (plan_id, position, name) VALUES (?, ?, ?)",
+                         [(plan_id, i, "Section " + str(i + 1)) for i in range(sections)])
+        g.DB.executemany("INSERT INTO plan_tables (plan_id, section, " + POS_Table.COLUMNS + ") "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         [(plan_id, i // per_section) + row[1:]
+                          for i, row in enumerate(plan_rows(plan_id, count, servers))])
+
+    return plan_id
+
+
+def bench_sections(suite, sizes, sections=5):
+    import core.globals as g
+
+    for count in sizes:
+        plan_id = add_sectioned_plan(count, 4, sections)
+
+        suite.run("load_floorplan cold, " + str(sections) + " sections", count, "tables",
+                  load_plan(plan_id, False, True))
+
+        # Puts the active section away and builds the next one
+        def switch():
+            g.VIEW.show_section((g.SCENE.sections.active + 1) % sections)
+
+        suite.run("switch section", count, "tables", switch)
+
+
+# A floor with every other table sat, tables spread across the servers
+def seat_floor(table_count, server_count):
+    import core.globals as g
+    from qtpy.QtCore import QRectF
+    from core.objects import POS_Server, POS_Table
+
+    for item in g.SCENE.tables.tables():
+        g.SCENE.removeItem(item)
+    g.ALL_SERVERS.clear()
+    g.RECENTS.clear()
+
+    for i in range(server_count):
+        POS_Server("Server " + str(i + 1))
+
+    pred = g.SERVER_LIST.widget().pred
+    now = time.monotonic()
+
+    for i in range(table_count):
+        tbl = POS_Table(QRectF((i % 50) * 100, (i // 50) * 100, 80, 80), i % server_count, str(i + 1))
+        g.SCENE.addItem(tbl)
+
+        if i % 2 == 0:
+            num = 2 + i % 5
+            tbl.state = 1
+            tbl.numCustomers = num
+            tbl.seatTime = now
+            tbl.server.headActive += num
+            tbl.server.headTotal += num
+            tbl.server.active += 1
+            tbl.server.total += 1
+            pred.overflow.add(num, now - (i % 40) * 60)
+
+    g.SERVER_LIST.widget().servList.populate_servers()
+
+
+def bench_predictor(suite, server_sizes, table_count):
+    import core.globals as g
+
+    pred = g.SERVER_LIST.widget().pred
+    servList = g.SERVER_LIST.widget().servList
+
+    for count in server_sizes:
+        seat_floor(table_count, count)
+
+        suite.run("calculate_choice (all)", count, "servers", pred.calculate_choice)
+        server = g.ALL_SERVERS[count // 2]
+        suite.run("calculate_choice (one)", count, "servers", lambda: pred.calculate_choice(server))
+        suite.run("calculate_overflow", count, "servers", pred.calculate_overflow)
+
+        def populate():
+            servList.populate_servers()
+            servList.viewport().repaint()
+
+        suite.run("populate_servers", count, "servers", populate)
+
+
+def bench_reservations(suite, sizes):
+    import core.globals as g
+    from qtpy.QtCore import QDate, Qt
+
+    resList = g.RES_LIST.widget().resList
+    month = QDate.currentDate().addMonths(1)
+    month = QDate(month.year(), month.month(), 1)
+    day = month.addDays(14)
+    stored = 0
+
+    for count in sizes:
+        # Half the bookings land on the day being shown, the rest across the month
+        rows = []
+        for i in range(stored, count):
+            date = day if i % 2 == 0 else month.addDays(i % 28)
+            rows.append((date.toString(Qt.ISODate), "%02d:%02d:00" % (11 + i % 11, i % 60),
+                         "Guest " + str(i), 1 + i % 8, "555%07d" % i, "", i % 4))
+
+        with g.DB.transaction():
+            g.DB.executemany("INSERT INTO reservations (date, time, name, size, phone, note, state) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        stored = count
+
+        def cold():
+            resList.cache.clear()
+            resList.populate_reservations(day)
+            settle()
+            resList.viewport().repaint()
+
+        def warm():
+            resList.populate_reservations(day)
+            settle()
+            resList.viewport().repaint()
+
+        suite.run("populate_reservations cold", count, "reservations", cold)
+        suite.run("populate_reservations warm", count, "reservations", warm)
+
+
+def bench_floorplan_dialog(suite, sizes):
+    import core.globals as g
+    from qtpy.QtWidgets import QDialog
+    from core.dialogs import FloorplanDialog
+
+    stored = g.DB.fetchone("SELECT COUNT(*) FROM floorplans")[0]
+
+    for count in sizes:
+        with g.DB.transaction():
+            g.DB.executemany("INSERT INTO floorplans (name, server_count) VALUES (?, ?)",
+                             [("Plan " + str(i), i % 12) for i in range(stored, count)])
+        stored = max(stored, count)
+
+        # The dialog is modal, time it up to the point its lists are filled instead of waiting for a click
+        def open_dialog():
+            exec_ = QDialog.exec_
+            QDialog.exec_ = lambda self: settle() or 0
+            try:
+                dialog = FloorplanDialog(g.WINDOW)
+                dialog.deleteLater()
+            finally:
+                QDialog.exec_ = exec_
+
+        suite.run("FloorplanDialog open", count, "floorplans", open_dialog)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the host stand's hot paths")
+    parser.add_argument("--quick", action="store_true", help="only the smaller sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs of each benchmark")
+    parser.add_argument("--out", help="file to write the JSON results to (printed if not given)")
+    args = parser.parse_args()
+
+    setup(WIDTH, HEIGHT)
+    from qtpy import API_NAME, QT_VERSION
+
+    suite = Suite(args.repeat)
+
+    bench_floorplans(suite, QUICK_TABLES if args.quick else TABLES)
+    bench_sections(suite, QUICK_TABLES if args.quick else TABLES)
+    bench_predictor(suite, QUICK_SERVERS if args.quick else SERVERS, 400)
+    bench_reservations(suite, QUICK_RESERVATIONS if args.quick else RESERVATIONS)
+    bench_floorplan_dialog(suite, QUICK_FLOORPLANS if args.quick else FLOORPLANS)
+
+    report = {
+        "created":  time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python":   platform.python_version(),
+        "qt":       API_NAME + " " + QT_VERSION,
+        "platform": platform.platform(),
+        "repeat":   args.repeat,
+        "results":  suite.results,
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print("written to " + args.out)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
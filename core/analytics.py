@@ -0,0 +1,290 @@
+import time
+
+from core.database import EVENT_TABLE
+
+# numpy is optional, without it the analytics dock only says it's missing
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Codes the events are loaded with
+SEAT = 0
+CLEAR = 1
+TRANSFER = 2
+
+# Length of a covers bucket (seconds)
+BUCKET = 15 * 60
+BUCKETS = 86400 // BUCKET
+
+
+def available() -> bool:
+    return np is not None
+
+
+# A date range of seat, clear and transfer events as numpy arrays (one entry per event, in the order they happened)
+# Tables and servers are stored as codes into the tables / servers name lists
+class EventArrays:
+    def __init__(self, kind, wall, party, table, server, old_server, place, tables: list, servers: list):
+        self.kind = kind
+        self.wall = wall
+        self.party = party
+        self.table = table
+        self.server = server
+        # The server a transferred party came from (-1 for other events)
+        self.old_server = old_server
+        # Which table the event happened at (see database.EVENT_TABLE), tables can share a title so turns are paired
+        # by this instead
+        self.place = place
+        self.tables = tables
+        self.servers = servers
+
+    def __len__(self):
+        return len(self.kind)
+
+
+# Codes of every value in a column, codes holds the values already given a code (and gets the new ones)
+# A dict is much quicker than np.unique here, there are only a few distinct names and sorting strings is slow
+def encode(values, codes: dict):
+    return np.fromiter((codes.setdefault(value, len(codes)) for value in values), np.int32, len(values))
+
+
+# What the names in event_names are
+TABLE_NAMES = 0
+SERVER_NAMES = 1
+PLACE_NAMES = 2
+
+# One event of a packed day (event_days), the table, servers and place are event_names codes
+EVENT = None if np is None else np.dtype([("kind", np.int8), ("wall", np.float64), ("party", np.int32),
+                                          ("table", np.int32), ("server", np.int32), ("old_server", np.int32),
+                                          ("place", np.int32)])
+
+# The events that haven't been packed yet (the ones after the last event_id packed)
+NEW_EVENTS = "SELECT event_id, CASE kind WHEN 'seat' THEN 0 WHEN 'clear' THEN 1 ELSE 2 END, wall, " \
+             "COALESCE(party, 0), COALESCE(title, ''), COALESCE(server, ''), COALESCE(detail, ''), " + \
+             EVENT_TABLE + " FROM events WHERE event_id > ? AND kind IN ('seat', 'clear', 'transfer') " \
+             "ORDER BY event_id"
+
+
+# The event_names codes of each role (key is the role, value is a dict of name -> code)
+def read_names(db) -> dict:
+    names = {TABLE_NAMES: {}, SERVER_NAMES: {}, PLACE_NAMES: {}}
+
+    for role, name, code in db.fetchall_tuples("SELECT role, name, code FROM event_names ORDER BY role, code"):
+        names[role][name] = code
+
+    return names
+
+
+# Packs the events logged since the last time into their days (UTC days of their wall clock time), in the order they
+# were logged
+# Reading rows out of SQLite takes far longer than aggregating them (the sqlite3 module makes an object per value), so
+# every event is only read once. Returns how many were packed (runs on the database worker).
+def roll_up(db) -> int:
+    last = db.fetchone("SELECT COALESCE(MAX(last), 0) FROM event_days")[0]
+    rows = db.fetchall_tuples(NEW_EVENTS, (last,))
+
+    if not rows:
+        return 0
+
+    names = read_names(db)
+    known = {role: len(codes) for role, codes in names.items()}
+
+    event_id, kind, wall, party, titles, servers, details, places = zip(*rows)
+    count = len(rows)
+
+    events = np.zeros(count, EVENT)
+    events["kind"] = np.fromiter(kind, np.int8, count)
+    events["wall"] = np.fromiter(wall, np.float64, count)
+    events["party"] = np.fromiter(party, np.int32, count)
+    events["table"] = encode(titles, names[TABLE_NAMES])
+    # Servers and the servers transfers came from share one list of names
+    events["server"] = encode(servers, names[SERVER_NAMES])
+    events["old_server"] = np.where(events["kind"] == TRANSFER, encode(details, names[SERVER_NAMES]), -1)
+    events["place"] = encode(places, names[PLACE_NAMES])
+
+    newest = max(event_id)
+    # In the order they happened (events logged together keep their order)
+    events = events[np.argsort(events["wall"], kind="stable")]
+    days = np.floor(events["wall"] / 86400).astype(np.int64)
+
+    with db.transaction():
+        db.executemany("INSERT INTO event_names (role, name, code) VALUES (?, ?, ?)",
+                       [(role, name, code) for role, codes in names.items() for name, code in codes.items()
+                        if code >= known[role]])
+
+        # Each day the events fall on gets them as a chunk of its own, nothing already packed is written again
+        db.executemany("INSERT INTO event_days (day, last, data) VALUES (?, ?, ?)",
+                       [(day, newest, events[days == day].tobytes()) for day in np.unique(days).tolist()])
+
+        # The days before the last one are over, their chunks are joined so a long range reads a row per day
+        for day, in db.fetchall_tuples("SELECT day FROM event_days WHERE day < ? GROUP BY day HAVING COUNT(*) > 1",
+                                       (int(days.max()),)):
+            chunks = db.fetchall_tuples("SELECT last, data FROM event_days WHERE day = ? ORDER BY last", (day,))
+
+            db.execute("DELETE FROM event_days WHERE day = ?", (day,))
+            db.execute("INSERT INTO event_days (day, last, data) VALUES (?, ?, ?)",
+                       (day, chunks[-1][0], b"".join(data for _, data in chunks)))
+
+    return count
+
+
+# The packed events between two wall clock times as EventArrays (runs on the database worker)
+# The codes are narrowed down to the tables and servers that show up in the range
+def read_days(db, start: float, end: float) -> EventArrays:
+    blobs = db.fetchall_tuples("SELECT data FROM event_days WHERE day >= ? AND day <= ? ORDER BY day, last",
+                               (int(start // 86400), int(end // 86400)))
+
+    if blobs:
+        events = np.concatenate([np.frombuffer(data, EVENT) for data, in blobs])
+    else:
+        events = np.zeros(0, EVENT)
+
+    # The first and last days are only partly in the range
+    events = events[(events["wall"] >= start) & (events["wall"] < end)]
+
+    # Events are logged as they happen, so a day is only out of order when older events were packed after newer ones
+    if len(events) and (np.diff(events["wall"]) < 0).any():
+        events = events[np.argsort(events["wall"], kind="stable")]
+
+    names = {role: list(codes) for role, codes in read_names(db).items()}
+
+    used, table = np.unique(events["table"], return_inverse=True)
+    tables = [names[TABLE_NAMES][code] for code in used.tolist()]
+
+    old_server = events["old_server"]
+    used = np.unique(np.concatenate((events["server"], old_server[old_server >= 0])))
+    servers = [names[SERVER_NAMES][code] for code in used.tolist()]
+    old_server = np.where(old_server >= 0, np.searchsorted(used, old_server), -1).astype(np.int32)
+
+    return EventArrays(events["kind"].copy(), events["wall"].copy(), events["party"].copy(),
+                       table.astype(np.int32), np.searchsorted(used, events["server"]).astype(np.int32), old_server,
+                       events["place"].copy(), tables, servers)
+
+
+# Reads the events between two wall clock times into arrays, packing the ones logged since the last read first
+# (runs on the database worker)
+def load_events(db, start: float, end: float) -> EventArrays:
+    roll_up(db)
+
+    return read_days(db, start, end)
+
+
+# Count, mean and median of values in each group (groups are codes from 0 to size - 1)
+def group_stats(groups, values, size: int):
+    count = np.bincount(groups, minlength=size)
+    total = np.bincount(groups, weights=values, minlength=size)
+    mean = np.divide(total, count, out=np.zeros(size), where=count > 0)
+
+    # Sorted by group and then value, each group's median sits in the middle of its run
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    starts = np.cumsum(count) - count
+    has = count > 0
+    lower = ordered[(starts + (count - 1) // 2)[has]]
+    upper = ordered[(starts + count // 2)[has]]
+    median = np.zeros(size)
+    median[has] = (lower + upper) / 2
+
+    return count, mean, median
+
+
+# Seconds to add to each wall clock time to get local time, worked out once per day of the range
+def local_offsets(wall):
+    first = np.floor(wall.min() / 86400) * 86400
+    day = ((wall - first) // 86400).astype(np.int64)
+    offsets = np.array([time.localtime(first + i * 86400 + 43200).tm_gmtoff for i in range(day.max() + 1)],
+                       dtype=np.float64)
+
+    return offsets[day]
+
+
+# Works out the service statistics of a range of events
+# Turn times are the time from a table's seating to its clear, per table and per party size
+# Covers are summed per 15 minutes of the day (local time), per server (transfers move them along) and utilization
+# is how much of the service a table spent sat (service runs from the first to the last event of each day)
+def aggregate(events: EventArrays) -> dict:
+    table_count = len(events.tables)
+    server_count = len(events.servers)
+
+    kind = events.kind
+    wall = events.wall
+    party = events.party
+
+    seat = kind == SEAT
+    transfer = kind == TRANSFER
+
+    # Each seating is paired with the table's next seat or clear event, a turn is a seat followed by a clear
+    # Turn times are then grouped by the table's title
+    place = events.place
+    turns = np.flatnonzero(kind != TRANSFER)
+    turns = turns[np.lexsort((wall[turns], place[turns]))]
+    first, second = turns[:-1], turns[1:]
+    paired = (kind[first] == SEAT) & (kind[second] == CLEAR) & (place[first] == place[second])
+    first, second = first[paired], second[paired]
+    turn_time = wall[second] - wall[first]
+    turn_table = events.table[first]
+    turn_party = party[first]
+
+    table_turns, table_mean, table_median = group_stats(turn_table, turn_time, table_count)
+
+    largest = int(turn_party.max()) + 1 if len(turn_party) else 1
+    party_turns, party_mean, party_median = group_stats(turn_party, turn_time, largest)
+
+    # Covers sat in each 15 minutes of the day
+    covers = np.zeros(BUCKETS)
+    days = 0
+    service = 0.0
+    if len(wall):
+        local = wall + local_offsets(wall)
+        bucket = ((local[seat] % 86400) // BUCKET).astype(np.int64)
+        covers = np.bincount(bucket, weights=party[seat], minlength=BUCKETS)
+
+        # Each day's service runs from its first event to its last
+        day = (local // 86400).astype(np.int64)
+        starts = np.flatnonzero(np.diff(day, prepend=day[0] - 1))
+        ends = np.append(starts[1:], len(day)) - 1
+        days = len(starts)
+        service = float(np.sum(wall[ends] - wall[starts]))
+
+    # Covers and tables per server, a transfer moves them from the old server to the new one
+    server_covers = (np.bincount(events.server[seat], weights=party[seat], minlength=server_count) +
+                     np.bincount(events.server[transfer], weights=party[transfer], minlength=server_count) -
+                     np.bincount(events.old_server[transfer], weights=party[transfer], minlength=server_count))
+    server_tables = (np.bincount(events.server[seat], minlength=server_count) +
+                     np.bincount(events.server[transfer], minlength=server_count) -
+                     np.bincount(events.old_server[transfer], minlength=server_count))
+
+    occupied = np.bincount(turn_table, weights=turn_time, minlength=table_count)
+    utilization = occupied / service if service > 0 else np.zeros(table_count)
+
+    return {
+        "events":        len(events),
+        "days":          days,
+        "service":       service,
+        "tables":        events.tables,
+        "table_turns":   table_turns,
+        "table_mean":    table_mean,
+        "table_median":  table_median,
+        "utilization":   utilization,
+        "party_turns":   party_turns,
+        "party_mean":    party_mean,
+        "party_median":  party_median,
+        "covers":        covers,
+        "servers":       events.servers,
+        "server_covers": server_covers,
+        "server_tables": server_tables,
+    }
+
+
+# Loads and aggregates a range of events, timing both (runs on the database worker)
+def analyze(db, start: float, end: float) -> dict:
+    began = time.perf_counter()
+    events = load_events(db, start, end)
+    loaded = time.perf_counter()
+
+    stats = aggregate(events)
+    stats["load_time"] = loaded - began
+    stats["aggregate_time"] = time.perf_counter() - loaded
+
+    return stats
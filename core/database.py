@@ -0,0 +1,380 @@
+import sqlite3 as sql
+from contextlib import contextmanager
+
+from core.profiler import profiled_query
+
+# Database file every connection opens
+DB_FILE = "hosty.db"
+
+
+# Long-lived connection to the hosty database
+# One of these is opened at startup (g.DB) and shared by the whole GUI, instead of connecting per query
+class Database:
+    def __init__(self, path=DB_FILE):
+        self.path = path
+
+        # isolation_level=None keeps the connection in autocommit mode, writes are grouped with transaction()
+        # cached_statements keeps prepared statements around so repeated queries skip the SQL compile step
+        self.con = sql.connect(path, isolation_level=None, cached_statements=256)
+        # Rows can be read by index or by column name
+        self.con.row_factory = sql.Row
+
+        # Write-ahead logging lets readers continue while a write is in progress
+        self.con.execute("PRAGMA journal_mode = WAL")
+        # In WAL mode NORMAL only syncs on checkpoints, which is still safe against application crashes
+        self.con.execute("PRAGMA synchronous = NORMAL")
+        # Wait for a lock instead of failing straight away when another connection is writing
+        self.con.execute("PRAGMA busy_timeout = 5000")
+
+        # How many transaction() scopes are currently open
+        self.depth = 0
+
+    # Groups every statement run inside the with block into a single transaction
+    # Scopes can be nested, only the outermost one commits (or rolls back on an exception)
+    @contextmanager
+    def transaction(self):
+        if self.depth == 0:
+            self.con.execute("BEGIN IMMEDIATE")
+
+        self.depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.depth -= 1
+            if self.depth == 0:
+                self.con.execute("ROLLBACK")
+            raise
+        else:
+            self.depth -= 1
+            if self.depth == 0:
+                self.con.execute("COMMIT")
+
+    @profiled_query("db.query")
+    def execute(self, query: str, params=()) -> sql.Cursor:
+        return self.con.execute(query, params)
+
+    @profiled_query("db.query")
+    def executemany(self, query: str, seq_params) -> sql.Cursor:
+        return self.con.executemany(query, seq_params)
+
+    @profiled_query("db.query")
+    def fetchone(self, query: str, params=()):
+        return self.con.execute(query, params).fetchone()
+
+    @profiled_query("db.query")
+    def fetchall(self, query: str, params=()) -> list:
+        return self.con.execute(query, params).fetchall()
+
+    # Same as fetchall, with plain tuples instead of sqlite3.Rows (quite a bit cheaper for a lot of rows)
+    @profiled_query("db.query")
+    def fetchall_tuples(self, query: str, params=()) -> list:
+        cur = self.con.cursor()
+        cur.row_factory = None
+        return cur.execute(query, params).fetchall()
+
+    # Creates the database tables if they aren't already made, and brings older databases up to date
+    # PRAGMA user_version holds how many of the MIGRATIONS have been applied
+    def create_tables(self):
+        version = self.fetchone("PRAGMA user_version")[0]
+
+        for number, migration in enumerate(MIGRATIONS, 1):
+            if version < number:
+                with self.transaction():
+                    migration(self)
+                    self.execute(f"PRAGMA user_version = {number}")
+
+    def close(self):
+        self.con.close()
+
+
+# Version 1, the original schema
+def create_base_tables(db: Database):
+    db.execute(""" CREATE TABLE IF NOT EXISTS floorplans (
+                        plan_id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        server_count INTEGER NOT NULL
+                    )""")
+    db.execute(""" CREATE TABLE IF NOT EXISTS plan_tables (
+                        table_id INTEGER PRIMARY KEY,
+                        data BLOB NOT NULL,
+                        plan_id INTEGER NOT NULL,
+                        FOREIGN KEY(plan_id) REFERENCES floorplans(plan_id)
+                    )""")
+    db.execute(""" CREATE TABLE IF NOT EXISTS reservations (
+                        res_id INTEGER PRIMARY KEY,
+                        date NUMERIC NOT NULL,
+                        time NUMERIC NOT NULL,
+                        name TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        phone TEXT,
+                        note TEXT,
+                        state INTEGER DEFAULT 0
+                    )""")
+
+
+# Version 2, plan tables get a typed column for each property instead of the "x,y,w,h;server;title;circ;rot" string
+def convert_plan_tables(db: Database):
+    db.execute(""" CREATE TABLE plan_tables_typed (
+                        table_id INTEGER PRIMARY KEY,
+                        plan_id INTEGER NOT NULL,
+                        x REAL NOT NULL,
+                        y REAL NOT NULL,
+                        w REAL NOT NULL,
+                        h REAL NOT NULL,
+                        server INTEGER NOT NULL DEFAULT -1,
+                        title TEXT NOT NULL DEFAULT '',
+                        circ INTEGER NOT NULL DEFAULT 0,
+                        rotation REAL NOT NULL DEFAULT 0,
+                        FOREIGN KEY(plan_id) REFERENCES floorplans(plan_id)
+                    )""")
+
+    rows = []
+    for table_id, data, plan_id in db.fetchall("SELECT table_id, data, plan_id FROM plan_tables"):
+        parts = str(data).split(";")
+        rect = parts[0].split(",")
+        # Titles could contain semicolons, so take the fixed fields from both ends and join the rest back up
+        rows.append((table_id, plan_id,
+                     float(rect[0]), float(rect[1]), float(rect[2]), float(rect[3]),
+                     int(parts[1]),
+                     ";".join(parts[2:-2]),
+                     parts[-2] == "True",
+                     float(parts[-1])))
+
+    db.executemany("INSERT INTO plan_tables_typed (table_id, plan_id, x, y, w, h, server, title, circ, rotation) "
+                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    db.execute("DROP TABLE plan_tables")
+    db.execute("ALTER TABLE plan_tables_typed RENAME TO plan_tables")
+    db.execute("CREATE INDEX plan_tables_plan ON plan_tables (plan_id)")
+
+
+# Version 3, indexes for looking reservations up by date (in time order) and by state
+def index_reservations(db: Database):
+    db.execute("CREATE INDEX IF NOT EXISTS reservations_date_time ON reservations (date, time)")
+    db.execute("CREATE INDEX IF NOT EXISTS reservations_state_date ON reservations (state, date)")
+
+
+# Version 4, floorplans are split into named sections (dining room, patio, bar...)
+# A table's section is the position of its section in the plan, existing plans get one "Main" section
+def add_plan_sections(db: Database):
+    db.execute(""" CREATE TABLE IF NOT EXISTS plan_sections (
+                        plan_id INTEGER NOT NULL,
+                        position INTEGER NOT NULL,
+                        name TEXT NOT NULL,
+                        PRIMARY KEY(plan_id, position),
+                        FOREIGN KEY(plan_id) REFERENCES floorplans(plan_id)
+                    )""")
+    db.execute("ALTER TABLE plan_tables ADD COLUMN section INTEGER NOT NULL DEFAULT 0")
+    db.execute("INSERT INTO plan_sections (plan_id, position, name) SELECT plan_id, 0, 'Main' FROM floorplans")
+
+
+# Version 5, append-only log of what happens during service (see core.events.EventLog)
+# mono is the time.monotonic() the event happened at, wall the same moment on the wall clock
+def create_events(db: Database):
+    db.execute(""" CREATE TABLE IF NOT EXISTS events (
+                        event_id INTEGER PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        mono REAL NOT NULL,
+                        wall REAL NOT NULL,
+                        table_id INTEGER,
+                        title TEXT,
+                        server TEXT,
+                        party INTEGER,
+                        detail TEXT
+                    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS events_wall ON events (wall)")
+
+    # Events are only ever added
+    db.execute(""" CREATE TRIGGER IF NOT EXISTS events_no_update BEFORE UPDATE ON events
+                    BEGIN
+                        SELECT RAISE(ABORT, 'events are append-only');
+                    END""")
+    db.execute(""" CREATE TRIGGER IF NOT EXISTS events_no_delete BEFORE DELETE ON events
+                    BEGIN
+                        SELECT RAISE(ABORT, 'events are append-only');
+                    END""")
+
+
+# Version 6, a copy of the live floor that's kept up to date during service (see core.snapshot.FloorSnapshot)
+# Times are on the wall clock, monotonic times don't carry over a reboot
+def create_snapshot_tables(db: Database):
+    db.execute(""" CREATE TABLE IF NOT EXISTS snapshot_tables (
+                        slot INTEGER PRIMARY KEY,
+                        section INTEGER NOT NULL,
+                        table_id INTEGER,
+                        x REAL NOT NULL,
+                        y REAL NOT NULL,
+                        w REAL NOT NULL,
+                        h REAL NOT NULL,
+                        server INTEGER NOT NULL DEFAULT -1,
+                        title TEXT NOT NULL DEFAULT '',
+                        circ INTEGER NOT NULL DEFAULT 0,
+                        rotation REAL NOT NULL DEFAULT 0,
+                        state INTEGER NOT NULL DEFAULT 0,
+                        party INTEGER NOT NULL DEFAULT 0,
+                        seat_wall REAL
+                    )""")
+    db.execute(""" CREATE TABLE IF NOT EXISTS snapshot_servers (
+                        num INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        head_active INTEGER NOT NULL,
+                        head_total INTEGER NOT NULL,
+                        active INTEGER NOT NULL,
+                        total INTEGER NOT NULL
+                    )""")
+    db.execute(""" CREATE TABLE IF NOT EXISTS snapshot_recents (
+                        seat_wall REAL NOT NULL,
+                        num INTEGER NOT NULL,
+                        rate REAL NOT NULL
+                    )""")
+    db.execute(""" CREATE TABLE IF NOT EXISTS snapshot_meta (
+                        key TEXT PRIMARY KEY,
+                        value
+                    )""")
+
+
+# Version 7, how many people each table seats (existing tables are taken to be four-tops)
+def add_table_seats(db: Database):
+    db.execute("ALTER TABLE plan_tables ADD COLUMN seats INTEGER NOT NULL DEFAULT 4")
+    db.execute("ALTER TABLE snapshot_tables ADD COLUMN seats INTEGER NOT NULL DEFAULT 4")
+
+
+# Version 8, full text index of the reservations' names, phone numbers and notes (see core.ressearch)
+# The index only holds the words, the reservations table holds the rows (an external content table), and triggers keep
+# the two in step. SQLite builds without FTS5 go without it, the search box then says so.
+def create_reservation_search(db: Database):
+    try:
+        db.execute(""" CREATE VIRTUAL TABLE IF NOT EXISTS reservations_search USING fts5(
+                            name, phone, note,
+                            content='reservations', content_rowid='res_id',
+                            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                        )""")
+    except sql.OperationalError as e:
+        print("reservation search isn't available: " + str(e))
+        return
+
+    db.execute(""" CREATE TRIGGER IF NOT EXISTS reservations_search_insert AFTER INSERT ON reservations
+                    BEGIN
+                        INSERT INTO reservations_search (rowid, name, phone, note)
+                        VALUES (new.res_id, new.name, new.phone, new.note);
+                    END""")
+    db.execute(""" CREATE TRIGGER IF NOT EXISTS reservations_search_delete AFTER DELETE ON reservations
+                    BEGIN
+                        INSERT INTO reservations_search (reservations_search, rowid, name, phone, note)
+                        VALUES ('delete', old.res_id, old.name, old.phone, old.note);
+                    END""")
+    # Changing a reservation's time, size or state doesn't touch the index
+    db.execute(""" CREATE TRIGGER IF NOT EXISTS reservations_search_update AFTER UPDATE OF name, phone, note
+                    ON reservations
+                    BEGIN
+                        INSERT INTO reservations_search (reservations_search, rowid, name, phone, note)
+                        VALUES ('delete', old.res_id, old.name, old.phone, old.note);
+                        INSERT INTO reservations_search (rowid, name, phone, note)
+                        VALUES (new.res_id, new.name, new.phone, new.note);
+                    END""")
+
+    # Index the reservations made before this version
+    db.execute("INSERT INTO reservations_search (reservations_search) VALUES ('rebuild')")
+
+
+# Version 9, the snapshot slot of the table an event happened at (see POS_Table.slot)
+# Titles can be shared by several tables (a "1" in each section, or tables left untitled) and tables that were never
+# saved have no table_id, so seat and clear events are paired up by the slot
+def add_event_slots(db: Database):
+    db.execute("ALTER TABLE events ADD COLUMN slot INTEGER")
+
+
+# Which table an event happened at, for pairing its seat and clear events into a turn
+# Events logged before version 9 have no slot, they fall back to the table's table_id and then its title
+EVENT_TABLE = "COALESCE('s' || slot, 't' || table_id, 'n' || COALESCE(title, ''))"
+
+
+# How many of a phone number's last digits are indexed backwards (the dialog takes ten)
+PHONE_REVERSED = 10
+
+
+# SQL for a phone number column's digits backwards, the last digits of the number start it (see index_phone_digits)
+# Phone numbers are stored as digits only. SQLite has no reverse(), so the number is taken apart a digit at a time from
+# its end (positions before its start are empty).
+def reversed_phone(column: str) -> str:
+    return " || ".join(f"substr({column}, -{position}, 1)" for position in range(1, PHONE_REVERSED + 1))
+
+
+# Version 10, phone numbers are indexed backwards as well, so the last few digits of a number find it
+# FTS5 only matches the start of a word, the start of the reversed number is its end. The index's content is now a
+# view that adds the reversed numbers to the reservations.
+def index_phone_digits(db: Database):
+    db.execute("DROP TRIGGER IF EXISTS reservations_search_insert")
+    db.execute("DROP TRIGGER IF EXISTS reservations_search_delete")
+    db.execute("DROP TRIGGER IF EXISTS reservations_search_update")
+    db.execute("DROP TABLE IF EXISTS reservations_search")
+
+    db.execute(f""" CREATE VIEW IF NOT EXISTS reservations_search_content AS
+                     SELECT res_id, name, phone, note, {reversed_phone("phone")} AS phone_reversed
+                     FROM reservations""")
+
+    try:
+        db.execute(""" CREATE VIRTUAL TABLE IF NOT EXISTS reservations_search USING fts5(
+                            name, phone, note, phone_reversed,
+                            content='reservations_search_content', content_rowid='res_id',
+                            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                        )""")
+    except sql.OperationalError as e:
+        print("reservation search isn't available: " + str(e))
+        return
+
+    db.execute(f""" CREATE TRIGGER IF NOT EXISTS reservations_search_insert AFTER INSERT ON reservations
+                     BEGIN
+                         INSERT INTO reservations_search (rowid, name, phone, note, phone_reversed)
+                         VALUES (new.res_id, new.name, new.phone, new.note, {reversed_phone("new.phone")});
+                     END""")
+    db.execute(f""" CREATE TRIGGER IF NOT EXISTS reservations_search_delete AFTER DELETE ON reservations
+                     BEGIN
+                         INSERT INTO reservations_search (reservations_search, rowid, name, phone, note, phone_reversed)
+                         VALUES ('delete', old.res_id, old.name, old.phone, old.note, {reversed_phone("old.phone")});
+                     END""")
+    # Changing a reservation's time, size or state doesn't touch the index
+    db.execute(f""" CREATE TRIGGER IF NOT EXISTS reservations_search_update AFTER UPDATE OF name, phone, note
+                     ON reservations
+                     BEGIN
+                         INSERT INTO reservations_search (reservations_search, rowid, name, phone, note, phone_reversed)
+                         VALUES ('delete', old.res_id, old.name, old.phone, old.note, {reversed_phone("old.phone")});
+                         INSERT INTO reservations_search (rowid, name, phone, note, phone_reversed)
+                         VALUES (new.res_id, new.name, new.phone, new.note, {reversed_phone("new.phone")});
+                     END""")
+
+    db.execute("INSERT INTO reservations_search (reservations_search) VALUES ('rebuild')")
+
+
+# Version 11, the seat, clear and transfer events packed a day at a time, for the analytics (see core.analytics)
+# Events are only ever added, so a day that was packed only gets more chunks (last is the newest event_id in a chunk).
+# These are worked out from the events and can be thrown away and made again.
+def create_event_days(db: Database):
+    db.execute(""" CREATE TABLE IF NOT EXISTS event_days (
+                        day INTEGER NOT NULL,
+                        last INTEGER NOT NULL,
+                        data BLOB NOT NULL,
+                        PRIMARY KEY (day, last)
+                    )""")
+    # The table titles, server names and places in the packed days are stored as these codes
+    db.execute(""" CREATE TABLE IF NOT EXISTS event_names (
+                        role INTEGER NOT NULL,
+                        name TEXT NOT NULL,
+                        code INTEGER NOT NULL,
+                        PRIMARY KEY (role, name)
+                    )""")
+
+
+# Schema changes in the order they were made, never reorder or remove these (only append)
+MIGRATIONS = [
+    create_base_tables,
+    convert_plan_tables,
+    index_reservations,
+    add_plan_sections,
+    create_events,
+    create_snapshot_tables,
+    add_table_seats,
+    create_reservation_search,
+    add_event_slots,
+    index_phone_digits,
+    create_event_days,
+]
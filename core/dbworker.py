@@ -0,0 +1,117 @@
+import queue
+import threading
+import traceback
+
+from qtpy.QtCore import QObject, QThread, Qt, Signal
+
+from core.database import Database, DB_FILE
+from core.profiler import section
+
+
+# The result of a job handed to the DatabaseWorker
+# finished / failed are delivered on the GUI thread, once the job has run on the worker thread
+class DBFuture(QObject):
+    # Emitted with whatever the job returned
+    finished = Signal(object)
+    # Emitted with the error text when the job raised
+    failed = Signal(str)
+
+    # Sent from the worker thread, queued over to the GUI thread
+    done = Signal()
+
+    def __init__(self, worker, fn, args):
+        super(DBFuture, self).__init__()
+        self.worker = worker
+        self.fn = fn
+        self.args = args
+
+        self.result = None
+        self.error = None
+        self.canceled = False
+        self.delivered = False
+
+        # Set by the worker thread once the job has run (or been skipped)
+        self.event = threading.Event()
+
+        self.done.connect(self.deliver, Qt.QueuedConnection)
+
+    # The result isn't wanted anymore, a job that hasn't started yet is skipped
+    def cancel(self):
+        self.canceled = True
+
+    def is_done(self) -> bool:
+        return self.event.is_set()
+
+    # Blocks until the job has run and delivers its result straight away
+    # Only for code with no event loop to wait in (shutdown, benchmarks), the GUI connects to finished instead
+    def wait(self, timeout=None):
+        if self.event.wait(timeout):
+            self.deliver()
+
+        return self.result
+
+    def deliver(self):
+        if self.delivered:
+            return
+
+        self.delivered = True
+        self.worker.active.discard(self)
+
+        if self.canceled:
+            return
+
+        if self.error is not None:
+            self.failed.emit(self.error)
+        else:
+            self.finished.emit(self.result)
+
+
+# Runs database jobs on a thread of its own, so a slow disk or a locked database never freezes the GUI
+# Jobs are run one at a time in the order they were submitted, so a write that was submitted before a read
+# is always seen by that read. The worker has its own connection, SQLite connections can't be shared between threads.
+class DatabaseWorker(QThread):
+    def __init__(self, path=DB_FILE, factory=Database, parent=None):
+        super(DatabaseWorker, self).__init__(parent)
+        self.path = path
+        self.factory = factory
+
+        self.jobs = queue.Queue()
+        # Futures that haven't been delivered yet (keeps them alive until their results are handed over)
+        self.active = set()
+
+    # Queues fn(db, *args) to run on the worker's connection
+    def submit(self, fn, *args) -> DBFuture:
+        future = DBFuture(self, fn, args)
+        self.active.add(future)
+        self.jobs.put(future)
+
+        return future
+
+    def run(self):
+        db = self.factory(self.path)
+
+        while True:
+            future = self.jobs.get()
+
+            # Sent by stop()
+            if future is None:
+                break
+
+            if not future.canceled:
+                try:
+                    with section("worker." + getattr(future.fn, "__name__", "job")):
+                        future.result = future.fn(db, *future.args)
+                except Exception as e:
+                    traceback.print_exc()
+                    future.error = str(e) or type(e).__name__
+
+            future.event.set()
+            future.done.emit()
+
+        db.close()
+
+    # Finishes every job already submitted, then ends the thread
+    def stop(self):
+        if self.isRunning():
+            self.jobs.put(None)
+            self.wait()
@@ -1,15 +1,15 @@
 # import pickle
 import random
-import sqlite3 as sql
 
-from qtpy.QtCore import Qt, QRectF, QTime, QDate, QRegExp
+from qtpy.QtCore import Qt, QRectF, QTime, QDate, QDateTime, QRegExp
 from qtpy.QtGui import QColor, QIcon, QPixmap, QRegExpValidator, QBrush, QStandardItemModel, \
     QStandardItem
 from qtpy.QtWidgets import *
 
 import core.globals as g
 import core.objects as o
-from core.globals import get_path, create_connection
+from core.globals import get_path
+from core.predict import KitchenModel
 
 
 class ReservationDialog(QDialog):
@@ -20,15 +20,8 @@ class ReservationDialog(QDialog):
         self.setSizeGripEnabled(False)
         self.setModal(True)
 
-        # If a reservation index is supplied, set the editRes to represent its reservation data
+        # If a reservation index is supplied, editRes is set to represent its reservation data once it's read
         self.editRes = None
-        if index is not None:
-            # Query reservations table for the reservation that matches this id
-            con = create_connection()
-            con.row_factory = sql.Row
-            cur = con.cursor()
-            self.editRes = cur.execute("SELECT * FROM reservations WHERE res_id = ?", index).fetchone()
-            con.close()
 
         # Set up name box
         self.nameLabel = QLabel("Name:", self)
@@ -140,35 +133,39 @@ class ReservationDialog(QDialog):
                     # Reject reservation
                     return False
 
-            # If a reservation was supplied (editing an existing one)
-            if index is not None:
-                # Update the reservation in the database with its new data
-                con = create_connection()
-                cur = con.cursor()
-                cur.execute(
-                    "UPDATE reservations SET (date, time, name, size, phone, note) = (date(?), time(?), ?, ?, ?, ?) WHERE res_id = ?",
-                    (self.arrivalDateBox.date().toString(Qt.ISODate),
-                     self.arrivalTimeBox.time().toString(Qt.ISODate),
-                     self.nameBox.text(),
-                     str(self.partySizeBox.value()),
-                     self.phoneNumBox.text(),
-                     self.notesBox.text(),
-                     index))
-                con.commit()
-                con.close()
+            values = (self.arrivalDateBox.date().toString(Qt.ISODate),
+                      self.arrivalTimeBox.time().toString(Qt.ISODate),
+                      self.nameBox.text(),
+                      str(self.partySizeBox.value()),
+                      self.phoneNumBox.text(),
+                      self.notesBox.text())
+
+            # The reservation is written on the database worker, anything read after this will see it
+            future = g.WORKER.submit(self.write_reservation, index, values)
+
+            def on_failed(error):
+                g.RES_LIST.widget().resList.reload("Couldn't save the reservation: " + error)
+
+            future.failed.connect(on_failed)
+
+            # The month cache no longer matches the reservation's old or new date
+            new_date = values[0]
+            cache = g.RES_LIST.widget().resList.cache
+            cache.invalidate(new_date)
+
+            # Move the reservation's covers on the calendar (canceled reservations aren't counted)
+            calendar = g.RES_LIST.widget().calendar
+            if self.editRes is not None:
+                cache.invalidate(self.editRes["date"])
+
+                if self.editRes["state"] != 2:
+                    calendar.adjust(self.editRes["date"], -1, -self.editRes["size"])
+                    calendar.adjust(new_date, 1, self.partySizeBox.value())
+
+                # The reservation now has this data, in case it's edited again before the dialog closes
+                self.editRes = dict(self.editRes, date=new_date, size=self.partySizeBox.value())
             else:
-                # Insert a new reservation into the database
-                con = create_connection()
-                cur = con.cursor()
-                cur.execute("INSERT INTO reservations (date, time, name, size, phone, note) VALUES(?, ?, ?, ?, ?, ?)",
-                            (self.arrivalDateBox.date().toString(Qt.ISODate),
-                             self.arrivalTimeBox.time().toString(Qt.ISODate),
-                             self.nameBox.text(),
-                             str(self.partySizeBox.value()),
-                             self.phoneNumBox.text(),
-                             self.notesBox.text()))
-                con.commit()
-                con.close()
+                calendar.adjust(new_date, 1, self.partySizeBox.value())
 
             # Refresh the visual list of reservations
             g.RES_LIST.widget().resList.populate_reservations(self.arrivalDateBox.date())
@@ -196,9 +193,22 @@ class ReservationDialog(QDialog):
         self.buttonBox.addButton(self.addCloseButton, QDialogButtonBox.AcceptRole)
         self.buttonBox.addButton(self.addButton, QDialogButtonBox.ApplyRole)
 
-        # We are editing a reservation, set the dialog's inputs
-        if self.editRes is not None:
-            self.set_reservation(self.editRes)
+        # We are editing a reservation, set the dialog's inputs once it's been read
+        if index is not None:
+            # Can't add or edit until the reservation is here
+            self.buttonBox.setEnabled(False)
+
+            def on_loaded(res):
+                if res is None:
+                    return print("reservation no longer exists")
+
+                self.editRes = res
+                self.set_reservation(res)
+                self.buttonBox.setEnabled(True)
+
+            # Write any queued inline edits first, so the dialog reads the saved reservation
+            g.RES_LIST.widget().writer.flush()
+            g.WORKER.submit(self.read_reservation, index).finished.connect(on_loaded)
 
         layout = QFormLayout(self)
 
@@ -216,7 +226,29 @@ class ReservationDialog(QDialog):
         self.setLayout(layout)
         self.show()
 
-    def set_reservation(self, res: sql.Row):
+    # Runs on the database worker
+    @staticmethod
+    def read_reservation(db, res_id):
+        row = db.fetchone("SELECT * FROM reservations WHERE res_id = ?", (res_id,))
+
+        if row is None:
+            return None
+
+        return dict(row)
+
+    # Updates the reservation if a res_id is supplied, otherwise inserts a new one (runs on the database worker)
+    @staticmethod
+    def write_reservation(db, res_id, values: tuple):
+        with db.transaction():
+            if res_id is not None:
+                db.execute("UPDATE reservations SET (date, time, name, size, phone, note) = "
+                           "(date(?), time(?), ?, ?, ?, ?) WHERE res_id = ?",
+                           values + (res_id,))
+            else:
+                db.execute("INSERT INTO reservations (date, time, name, size, phone, note) VALUES(?, ?, ?, ?, ?, ?)",
+                           values)
+
+    def set_reservation(self, res: dict):
         self.setWindowTitle("Edit Reservation")
         self.nameBox.setText(res["name"])
         self.partySizeBox.setValue(res["size"])
@@ -257,6 +289,10 @@ class TableDialog(QDialog):
 
         self.circCheckBox = QCheckBox(self)
 
+        self.seatsSpinBox = QSpinBox(self)
+        self.seatsSpinBox.setRange(1, 100)
+        self.seatsSpinBox.setValue(o.POS_Table.DEFAULT_SEATS)
+
         # Create the server dropdown to select a server at table creation
         self.serverBox = QComboBox()
         self.serverBox.setVisible(False)
@@ -281,6 +317,7 @@ class TableDialog(QDialog):
             self.titleBox.setText(self.item.title)
             self.rotSpinBox.setValue(self.item.rotation())
             self.circCheckBox.setChecked(self.item.circ)
+            self.seatsSpinBox.setValue(self.item.seats)
             if self.item.server:
                 # Set the server selector's index to the table's server's index
                 self.serverBox.setCurrentIndex(self.item.server.num)
@@ -304,17 +341,18 @@ class TableDialog(QDialog):
                 self.item.rect = rect
                 self.item.rotate(self.rotSpinBox.value())
                 self.item.circ = self.circCheckBox.isChecked()
+                self.item.seats = self.seatsSpinBox.value()
 
                 if s is not None:
-                    self.item.change_server(s)
+                    self.item.change_server(s, log=True)
             else:
                 if self.circCheckBox.isChecked():
                     g.SCENE.addItem(
-                        o.POS_Table(QRectF(rect), s, self.titleBox.text(), True))
+                        o.POS_Table(QRectF(rect), s, self.titleBox.text(), True, seats=self.seatsSpinBox.value()))
                 else:
                     g.SCENE.addItem(
                         o.POS_Table(QRectF(rect), s, self.titleBox.text(), False,
-                                    self.rotSpinBox.value()))
+                                    self.rotSpinBox.value(), self.seatsSpinBox.value()))
 
             self.accept()
 
@@ -332,6 +370,7 @@ class TableDialog(QDialog):
         layout.addRow("H:", self.hSpinBox)
         layout.addRow("Rotation:", self.rotSpinBox)
         layout.addRow("Circular:", self.circCheckBox)
+        layout.addRow("Seats:", self.seatsSpinBox)
         # Make the dropdown visible if any servers exist
         if len(g.ALL_SERVERS) > 0:
             self.serverBox.setVisible(True)
@@ -370,63 +409,66 @@ class FloorplanDialog(QDialog):
             # Alias the server count
             count = curr.data(Qt.UserRole)
 
+            def on_loaded(plans):
+                # Another category was picked while this one was being read
+                if category_list.currentItem() is not curr:
+                    return
+
+                # Iterate all floorplans
+                for row in plans:
+                    # Makes a new floorplan row and sets its data to the plan_id
+                    plan_item = QListWidgetItem(row["name"])
+                    plan_item.setData(Qt.UserRole, row["plan_id"])
+                    plan_list.addItem(plan_item)
+
             # Query for all floorplans with this server count
-            con = create_connection()
-            con.row_factory = sql.Row
-            cur = con.cursor()
-            plans = cur.execute("SELECT * FROM floorplans WHERE server_count = ?", str(count)).fetchall()
-            con.close()
-
-            # Iterate all floorplans
-            for row in plans:
-                # Makes a new floorplan row and sets its data to the plan_id
-                plan_item = QListWidgetItem(row["name"])
-                plan_item.setData(Qt.UserRole, row["plan_id"])
-                plan_list.addItem(plan_item)
+            g.WORKER.submit(lambda db: db.fetchall("SELECT * FROM floorplans WHERE server_count = ?",
+                                                   (count,))).finished.connect(on_loaded)
 
         # Create category list
         category_list = QListWidget(self)
         # category_list.setSortingEnabled(True)
         category_list.currentItemChanged.connect(on_clicked_category)
 
-        def create_categories():
+        # The categories are read on the database worker, select is the server count to select once they're in
+        def create_categories(select=None):
             # Clear out the category list
             category_list.clear()
 
+            def on_loaded(plans):
+                server_counts = []
+
+                # Iterate through all floorplans
+                for row in plans:
+                    # No duplicate numbers
+                    if row["server_count"] not in server_counts:
+                        # Mark that we need a category for this server count
+                        server_counts.append(row["server_count"])
+
+                # Sort the list by their counts
+                def sort_by_count(d):
+                    return d
+
+                server_counts.sort(key=sort_by_count)
+
+                # Iterate through the marked category numbers we need to populate
+                for num in server_counts:
+                    # Make a new category row for each number of servers in floorplans
+                    category_item = QListWidgetItem(str(num) + " Servers")
+                    category_item.setData(Qt.UserRole, num)
+                    # Special grammar case for single server
+                    if num == 1:
+                        category_item.setText("1 Server")
+                    elif num == 0:
+                        category_item.setText("No Servers")
+
+                    category_list.addItem(category_item)
+
+                    if num == select:
+                        category_list.setCurrentItem(category_item)
+
             # Query for all floorplans
-            con = create_connection()
-            con.row_factory = sql.Row
-            cur = con.cursor()
-            plans = cur.execute("SELECT * FROM floorplans").fetchall()
-            con.close()
-
-            server_counts = []
-
-            # Iterate through all floorplans
-            for row in plans:
-                # No duplicate numbers
-                if row["server_count"] not in server_counts:
-                    # Mark that we need a category for this server count
-                    server_counts.append(row["server_count"])
-
-            # Sort the list by their counts
-            def sort_by_count(d):
-                return d
-
-            server_counts.sort(key=sort_by_count)
-
-            # Iterate through the marked category numbers we need to populate
-            for num in server_counts:
-                # Make a new category row for each number of servers in floorplans
-                category_item = QListWidgetItem(str(num) + " Servers")
-                category_item.setData(Qt.UserRole, num)
-                # Special grammar case for single server
-                if num == 1:
-                    category_item.setText("1 Server")
-                elif num == 0:
-                    category_item.setText("No Servers")
-
-                category_list.addItem(category_item)
+            g.WORKER.submit(lambda db: db.fetchall("SELECT * FROM floorplans")).finished.connect(on_loaded)
 
         create_categories()
 
@@ -446,53 +488,41 @@ class FloorplanDialog(QDialog):
             #     QErrorMessage.showMessage("Add at least 1 server to the floorplan to save it.")
             #     return print("no servers error")
 
-            # Insert the floorplan into the database
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("INSERT INTO floorplans (name, server_count) VALUES (?, ?)", (txt, len(g.ALL_SERVERS)))
-            # Get the plan id of the floorplan we just added
-            plan_id = cur.execute("SELECT last_insert_rowid()").fetchone()[0]
+            # Amount of servers
+            server_count = len(g.ALL_SERVERS)
 
-            # Insert all tables into the database
-            for tbl in g.SCENE.items():
-                if type(tbl) is o.POS_Table:
-                    cur.execute("INSERT INTO plan_tables (data, plan_id) VALUES (?, ?)", (tbl, plan_id))
+            def on_added(plan_id):
+                # A deleted plan's id can be handed out again, so make sure nothing stale is cached for it
+                g.VIEW.invalidate_plan(plan_id)
 
-            con.commit()
-            con.close()
+                # If there's no categories
+                if category_list.count() == 0:
+                    # Re-create them so the newly added floorplan shows up
+                    create_categories(server_count)
 
-            # If there's no categories
-            if category_list.count() == 0:
-                # Re-create them so the newly added floorplan shows up
-                create_categories()
-                category_list.setCurrentRow(0)
+                    return print("no categories")
 
-                return print("no categories")
+                # The current category's server count (-1 if no category selected)
+                category_count = -1
+                curr_category = category_list.currentItem()
+                if curr_category is not None:
+                    category_count = category_list.currentItem().data(Qt.UserRole)
 
-            # The current category's server count (-1 if no category selected)
-            category_count = -1
-            curr_category = category_list.currentItem()
-            if curr_category is not None:
-                category_count = category_list.currentItem().data(Qt.UserRole)
-
-            # Amount of servers
-            server_count = len(g.ALL_SERVERS)
+                # If the current category's server count is not the amount of servers
+                if category_count != server_count:
+                    # Re-create them so any newly added plans show up, selecting the one that matches the server count
+                    create_categories(server_count)
 
-            # If the current category's server count is not the amount of servers
-            if category_count != server_count:
-                # Re-create them so any newly added plans show up
-                create_categories()
-                # Iterate through each category, selecting the one that matches the server count
-                for row in range(category_list.count()):
-                    category_item = category_list.item(row)
-                    if category_item.data(Qt.UserRole) == server_count:
-                        category_list.setCurrentItem(category_item)
+                    return print("swapping category")
 
-                return print("swapping category")
+                new = QListWidgetItem(txt)
+                new.setData(Qt.UserRole, plan_id)
+                plan_list.addItem(new)
 
-            new = QListWidgetItem(txt)
-            new.setData(1, txt)
-            plan_list.addItem(new)
+            # Insert the floorplan and all of its tables into the database as one transaction (on the database worker)
+            future = g.WORKER.submit(self.insert_plan, txt, server_count, g.SCENE.sections.plan_rows())
+            future.finished.connect(on_added)
+            future.failed.connect(lambda error: print("couldn't save floorplan: " + error))
 
         button_addplan = QPushButton(QIcon(get_path("add.png")), "Add", self)
         button_addplan.clicked.connect(on_clicked_addplan)
@@ -509,11 +539,8 @@ class FloorplanDialog(QDialog):
 
             plan_id = curr.data(Qt.UserRole)
             # Update name query
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("UPDATE floorplans SET name = ? WHERE plan_id = ?", (txt, str(plan_id)))
-            con.commit()
-            con.close()
+            g.WORKER.submit(lambda db: db.execute("UPDATE floorplans SET name = ? WHERE plan_id = ?", (txt, plan_id)))
+            g.VIEW.invalidate_plan(plan_id)
             # Update the text of the visual list item
             curr.setText(txt)
 
@@ -571,12 +598,8 @@ class FloorplanDialog(QDialog):
                 g.recentFloorplans.remove(plan_id)
 
             # Delete query
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("DELETE FROM floorplans WHERE plan_id = ?", str(plan_id))
-            cur.execute("DELETE FROM plan_tables WHERE plan_id = ?", str(plan_id))
-            con.commit()
-            con.close()
+            g.WORKER.submit(self.delete_plan, plan_id)
+            g.VIEW.invalidate_plan(plan_id)
 
             # Remove the plan from the category (visually)
             plan_list.takeItem(plan_list.currentRow())
@@ -628,6 +651,34 @@ class FloorplanDialog(QDialog):
         # self.move(QPoint(g.WINDOW.width()-self.width()*1.2,g.WINDOW.height()-self.height()*1.2))
         self.exec_()
 
+    # Saves a floorplan, its sections and their tables, returns its plan_id
+    # sections are (name, table rows) in order, table rows are POS_Table.to_row() tuples
+    # Runs on the database worker
+    @staticmethod
+    def insert_plan(db, name: str, server_count: int, sections: list) -> int:
+        with db.transaction():
+            cur = db.execute("INSERT INTO floorplans (name, server_count) VALUES (?, ?)", (name, server_count))
+            # Get the plan id of the floorplan we just added
+            plan_id = cur.lastrowid
+
+            db.executemany("INSERT INTO plan_sections (plan_id, position, name) VALUES (?, ?, ?)",
+                           [(plan_id, position, section) for position, (section, _) in enumerate(sections)])
+
+            # Insert all tables into the database with one statement
+            db.executemany("INSERT INTO plan_tables (plan_id, section, " + o.POS_Table.COLUMNS + ") "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           [(plan_id, position) + row for position, (_, rows) in enumerate(sections) for row in rows])
+
+        return plan_id
+
+    # Runs on the database worker
+    @staticmethod
+    def delete_plan(db, plan_id: int):
+        with db.transaction():
+            db.execute("DELETE FROM floorplans WHERE plan_id = ?", (plan_id,))
+            db.execute("DELETE FROM plan_tables WHERE plan_id = ?", (plan_id,))
+            db.execute("DELETE FROM plan_sections WHERE plan_id = ?", (plan_id,))
+
 
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
@@ -661,7 +712,7 @@ class SettingsDialog(QDialog):
             g.SETTINGS.setValue("data/recentFloorplans", g.recentFloorplans)
             g.SETTINGS.setValue("data/overflowRules", g.overflowRules)
             g.SETTINGS.sync()
-            g.SERVER_LIST.widget().pred.update()
+            g.SERVER_LIST.widget().pred.load_overflow_settings()
 
         self.finished.connect(on_closed_menu)
 
@@ -749,7 +800,8 @@ class OverflowTab(QWidget):
         label = QLabel(
             "Overflow is calculated for recently sat tables based on this formula:<br>"
             "<i># customers - (minutes passed * kitchen speed)</i><br>"
-            "A kitchen speed of 1.0 means the kitchen can serve 1 head every minute (0.5 = 1 customer every 2 minutes, 2.0 = 2 customers every minute).")
+            "A kitchen speed of 1.0 means the kitchen can serve 1 head every minute (0.5 = 1 customer every 2 minutes, 2.0 = 2 customers every minute).<br>"
+            "When fitted to past service, each party size uses how long those tables were sat for over the last few weeks (the kitchen speed is used until there's enough service to go by).")
         label.setAlignment(Qt.AlignCenter)
         label.setWordWrap(True)
         label.setTextFormat(Qt.RichText)
@@ -763,6 +815,30 @@ class OverflowTab(QWidget):
         overflowMultBox.setValue(float(g.SETTINGS.value("settings/overflowMultiplier")))
         overflowMultBox.valueChanged.connect(on_changed_overflowmult)
 
+        pred = g.SERVER_LIST.widget().pred
+
+        def on_toggled_fit(checked):
+            g.SETTINGS.setValue("settings/fitOverflow", int(checked))
+
+        fitCheck = QCheckBox("Fit to past service", self)
+        fitCheck.setChecked(bool(int(g.SETTINGS.value("settings/fitOverflow", 1))))
+        fitCheck.toggled.connect(on_toggled_fit)
+        fitCheck.setToolTip("Estimates the kitchen speed of each party size from past service")
+
+        refitButton = QPushButton(QIcon(get_path("arrow_refresh.png")), "Refit", self)
+        refitButton.clicked.connect(pred.refit)
+        refitButton.setToolTip("Fits the kitchen speeds to the last few weeks of service now")
+
+        fitLayout = QHBoxLayout()
+        fitLayout.addWidget(fitCheck)
+        fitLayout.addWidget(refitButton)
+
+        self.fitLabel = QLabel(self)
+        self.fitLabel.setAlignment(Qt.AlignCenter)
+        self.fitLabel.setWordWrap(True)
+        self.show_model(pred.model)
+        pred.modelChanged.connect(self.show_model)
+
         label2 = QLabel("The thresholds in the table below allow you to change the color and note it shows when going past a certain threshold. (Double click a cell to modify)")
         label2.setAlignment(Qt.AlignCenter)
         label2.setWordWrap(True)
@@ -778,12 +854,38 @@ class OverflowTab(QWidget):
 
         overflowTab.addRow(label)
         overflowTab.addRow("Kitchen Speed", overflowMultBox)
+        overflowTab.addRow(fitLayout)
+        overflowTab.addRow(self.fitLabel)
         overflowTab.addRow(label2)
         overflowTab.addRow(hLayout)
         overflowTab.addRow(overflowTable)
 
         self.setLayout(overflowTab)
 
+    # Lists how long each party size loads the kitchen for
+    def show_model(self, model):
+        if model is None:
+            return self.fitLabel.setText("Not fitted yet")
+
+        lines = []
+        smallest = 1
+        for band, largest in enumerate(KitchenModel.BANDS):
+            if band == len(KitchenModel.BANDS) - 1:
+                parties = "{}+".format(smallest)
+            else:
+                parties = "{}-{}".format(smallest, largest)
+
+            minutes = model.minutes(band)
+            if minutes is None:
+                lines.append("Parties of {}: kitchen speed ({} turns)".format(parties, model.turns[band]))
+            else:
+                lines.append("Parties of {}: {:.0f} minutes ({} turns)".format(parties, minutes, model.turns[band]))
+
+            smallest = largest + 1
+
+        fitted = QDateTime.fromMSecsSinceEpoch(int(model.fitted * 1000)).toString("ddd MMM d, h:mm AP")
+        self.fitLabel.setText("\n".join(lines) + "\nFitted " + fitted)
+
 
 class RuleTable(QTableView):
     def __init__(self, parent=None):
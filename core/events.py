@@ -0,0 +1,86 @@
+import time
+
+from qtpy.QtCore import QObject, QTimer
+
+import core.analytics as analytics
+import core.globals as g
+
+
+# Records what happens during service (seatings, clears, busses, transfers, server changes and arrivals)
+# into the append-only events table. Logging only appends a tuple to a buffer, the buffer is written by the
+# database worker as one transaction a little later (or straight away once it's large), so the GUI never waits.
+class EventLog(QObject):
+    # How long an event can wait in the buffer before it's written (milliseconds)
+    DELAY = 2000
+    # Buffered events that are written without waiting for the delay
+    BATCH = 256
+
+    # Kinds of events
+    SEAT = "seat"
+    CLEAR = "clear"
+    BUS = "bus"
+    TRANSFER = "transfer"
+    SERVER_ADD = "server_add"
+    SERVER_REMOVE = "server_remove"
+    ARRIVE = "arrive"
+
+    COLUMNS = "kind, mono, wall, table_id, title, server, party, detail, slot"
+
+    def __init__(self, parent=None):
+        super(EventLog, self).__init__(parent)
+        # Rows for the events COLUMNS, waiting to be written
+        self.pending = []
+
+        # Events are timed with time.monotonic() (it never jumps when the clock is changed)
+        # and the wall clock time is worked out from when the log was started
+        self.anchor = time.time() - time.monotonic()
+
+        # Started by the first event after a flush and not restarted, so a busy floor is still written every DELAY
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DELAY)
+        self.timer.timeout.connect(self.flush)
+
+    def __len__(self):
+        return len(self.pending)
+
+    # Buffers an event, table is a POS_Table and server a POS_Server (either can be None)
+    def log(self, kind: str, table=None, server=None, party=None, detail=None):
+        now = time.monotonic()
+
+        self.pending.append((kind, now, now + self.anchor,
+                             None if table is None else table.table_id,
+                             None if table is None else table.title,
+                             None if server is None else server.name,
+                             party, detail,
+                             None if table is None else table.slot))
+
+        if len(self.pending) >= self.BATCH:
+            self.flush()
+        elif not self.timer.isActive():
+            self.timer.start()
+
+    # Hands the buffered events to the database worker, to be written as one transaction
+    def flush(self):
+        self.timer.stop()
+
+        if not self.pending:
+            return None
+
+        batch = self.pending
+        self.pending = []
+
+        future = g.WORKER.submit(self.write, batch)
+        future.failed.connect(lambda error: print("couldn't write " + str(len(batch)) + " events: " + error))
+
+        return future
+
+    # Runs on the database worker
+    # The analytics' packed days are kept up to date along with the events, so the analytics never read many events
+    @classmethod
+    def write(cls, db, batch: list):
+        with db.transaction():
+            db.executemany("INSERT INTO events (" + cls.COLUMNS + ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+            if analytics.available():
+                analytics.roll_up(db)
@@ -1,16 +1,10 @@
 import os
 import sys
-import sqlite3 as sql
 
 from qtpy.QtCore import Qt, QMargins
 from qtpy.QtGui import QColor, QFont
 
 
-# Convenience function to connect to the same database file
-def create_connection():
-    con = sql.connect("hosty.db")
-    return con
-
 def get_path(filename):
     if hasattr(sys, "_MEIPASS"):
         return os.path.join(sys._MEIPASS, filename)
@@ -85,11 +79,16 @@ overflowRules = {
 recentFloorplans = []
 
 global APP
+global DB
+global WORKER
+global EVENTS
+global SNAPSHOT
 global WINDOW
 global SCENE
 global VIEW
 global SERVER_LIST
 global RES_LIST
+global ANALYTICS
 global SETTINGS
 
 COUNT_MODE = "heads"
@@ -1,13 +1,15 @@
+import bisect
 import math
 import random
-import sqlite3
-from datetime import datetime
+import time
 
-from qtpy.QtCore import Qt, QRectF, QTimer, QPointF, QTime
-from qtpy.QtGui import QPen, QBrush, QCursor, QIcon, QPixmap, QColor
+from qtpy.QtCore import Qt, QRectF, QPointF
+from qtpy.QtGui import QPen, QBrush, QCursor, QIcon, QPixmap, QColor, QFont, QStaticText, QTransform
 from qtpy.QtWidgets import (QGraphicsItem, QAction, QMenu, QInputDialog)
 
 import core.globals as g
+from core.events import EventLog
+from core.profiler import profiled
 
 
 def roundSnap(x, snap=1):
@@ -19,18 +21,106 @@ def roundSnap(x, snap=1):
         return int(math.floor(x)) * snap
 
 
-def formatTime(time):
-    tt = datetime.fromtimestamp(time)
+# Formats a number of elapsed seconds as hours:minutes:seconds
+def formatElapsed(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
 
-    return tt.strftime("%H:%M:%S")
+    return "{:02}:{:02}:{:02}".format(hours, minutes, seconds)
+
+
+# Pens, brushes and fonts shared by every table, made once for each color or size instead of every paint
+# (keys are QColor.rgba() values, or the point size for fonts)
+OUTLINE_PENS = {}
+FILL_BRUSHES = {}
+TITLE_FONTS = {}
+TIMER_FONTS = {}
+TEXT_PEN = QPen(Qt.black)
+# Outline of the tables the best table finder picked
+HIGHLIGHT_PEN = QPen(QColor(0, 170, 255), 4)
+
+
+def outlinePen(color) -> QPen:
+    color = QColor(color)
+    pen = OUTLINE_PENS.get(color.rgba())
+
+    if pen is None:
+        pen = OUTLINE_PENS[color.rgba()] = QPen(color, 5, Qt.SolidLine)
+
+    return pen
+
+
+def fillBrush(color) -> QBrush:
+    color = QColor(color)
+    brush = FILL_BRUSHES.get(color.rgba())
+
+    if brush is None:
+        brush = FILL_BRUSHES[color.rgba()] = QBrush(color, Qt.SolidPattern)
+
+    return brush
+
+
+# Copy of a base font at a point size (the base fonts in globals are never resized)
+def sizedFont(fonts: dict, base: QFont, size: int) -> QFont:
+    font = fonts.get(size)
+
+    if font is None:
+        font = fonts[size] = QFont(base)
+        font.setPointSize(max(size, 1))
+
+    return font
+
+
+# Fonts and pre-laid-out title text of a table, they only depend on its title, size and shape
+class TableLayout:
+    __slots__ = ("key", "titleFont", "title", "titleSize", "timerFont")
+
+    def __init__(self, key, title: str, width: float, height: float, circ: bool):
+        self.key = key
+
+        # Get the sizing based on the table's width or height, whichever is least
+        s1 = min(width, height)
+        # The actual font's size
+        s2 = s1 / 2.5
+        self.titleFont = sizedFont(TITLE_FONTS, g.FONT_TABLE, int(s2))
+
+        self.title = QStaticText(title)
+        self.title.setTextFormat(Qt.PlainText)
+        self.title.prepare(QTransform(), self.titleFont)
+        self.titleSize = self.title.size()
+
+        # If the table is circular, we have less space for text, so make the counter text 20% smaller
+        if circ:
+            s2 *= 0.8
+
+        self.timerFont = sizedFont(TIMER_FONTS, g.FONT, int(s2 / 2.2))
 
 
 class POS_Table(QGraphicsItem):
-    def __init__(self, rect: QRectF, server=-1, title="", circ=False, rotation=0.0, parent=None):
+    # The plan_tables columns a table is stored in, in the order to_row() returns them
+    COLUMNS = "x, y, w, h, server, title, circ, rotation, seats"
+
+    # Seats of a table nobody said otherwise about
+    DEFAULT_SEATS = 4
+
+    # Level of detail (how much the view scales the table) below which the title and timer aren't drawn,
+    # and below which the table is only a plain colored shape
+    LOD_TEXT = 0.6
+    LOD_SHAPE = 0.3
+
+    def __init__(self, rect: QRectF, server=-1, title="", circ=False, rotation=0.0, seats=DEFAULT_SEATS, parent=None):
         super(POS_Table, self).__init__(parent)
+        # The plan_tables row this table was loaded from (None if it was never saved)
+        self.table_id = None
+        # Identifies the table in the live floor snapshots, handed out by the scene's table registry
+        self.slot = None
         self.rect = QRectF(rect)
         self.title = title
-        self.state = 0
+        # State, server and seats are kept behind properties, so the scene's table registry can follow them
+        self._state = 0
+        self._seats = seats
+        # Picked by the best table finder for the party waiting to be sat
+        self.highlighted = False
         self.circ = circ
         self.color = g.COLORS["tbl_ready"]
         self.numCustomers = 0
@@ -39,89 +129,196 @@ class POS_Table(QGraphicsItem):
         self.setFlag(QGraphicsItem.ItemIsSelectable, True)
 
         if server != -1:
-            self.server = g.ALL_SERVERS[server]
-            self.serverColor = self.server.color
+            self._server = g.ALL_SERVERS[server]
+            self.serverColor = self._server.color
         else:
-            self.server = None
+            self._server = None
             self.serverColor = Qt.black
 
         if rotation:
             self.rotate(rotation)
 
-        self.activeTimer = QTimer()
-        self.counter = 18000
-        self.activeTimer.timeout.connect(self.timerEvent)
+        # Monotonic time the table was sat at (None while not sat)
+        # The scene's shared seat clock repaints the timer text, the table doesn't run a timer of its own
+        self.seatTime = None
 
-    # Method for converting the object into string form (for database storage)
-    def __conform__(self, protocol):
+        # The table's body is rendered once into a cache and reused until its appearance changes
+        # The timer text changes every second, so it's drawn by a child item outside of the cache
+        # The cache is kept at screen resolution, so the table is drawn again at the detail a new zoom calls for
+        self._layout = None
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+        self.timer = SeatTimer(self)
+
+    # Converts the table into a row of values for the plan_tables COLUMNS (for database storage)
+    def to_row(self) -> tuple:
         # Try to get the server's index, -1 if not
         try:
             server_num = self.server.num
         except AttributeError:
             server_num = -1
 
-        if protocol is sqlite3.PrepareProtocol:
-            return f"{self.rect.left()},{self.rect.top()},{self.rect.width()},{self.rect.height()};{server_num};{self.title};{self.circ};{self.rotation()}"
+        return (self.rect.left(), self.rect.top(), self.rect.width(), self.rect.height(),
+                server_num, self.title, self.circ, self.rotation(), self.seats)
 
-    # Method to parse the database string back into an object
+    # Builds a table from a plan_tables row (table_id followed by the COLUMNS)
     @staticmethod
-    def parse(db_string: str):
-        # Split the different parameters up
-        parts = db_string.split(';')
-        # Split the rectangle's dimensions up
-        rect = parts[0].split(',')
-        # Return the parsed object
-        return POS_Table(QRectF(float(rect[0]), float(rect[1]), float(rect[2]), float(rect[3])),
-                         int(parts[1]),
-                         parts[2],
-                         parts[3] == "True",
-                         float(parts[4]))
-
-    def timerEvent(self):
-        self.counter += 1
-        self.update(self.rect)
+    def from_row(row):
+        table_id, x, y, w, h, server, title, circ, rotation, seats = row
+
+        tbl = POS_Table(QRectF(x, y, w, h), server, title, bool(circ), rotation, seats)
+        tbl.table_id = table_id
+
+        return tbl
+
+    # 0 = clean, 1 = sat, 2 = dirty
+    @property
+    def state(self) -> int:
+        return self._state
+
+    @state.setter
+    def state(self, state: int):
+        registry = self.registry()
+        if registry is not None and state != self._state:
+            registry.move_state(self, self._state, state)
+
+        self._state = state
+        self.timer.setVisible(state == 1)
+
+        # Only clean tables are offered to a party
+        if state != 0 and self.highlighted:
+            self.set_highlighted(False)
+
+    @property
+    def server(self):
+        return self._server
+
+    @server.setter
+    def server(self, server):
+        registry = self.registry()
+        if registry is not None and server is not self._server:
+            registry.move_server(self, self._server, server)
+
+        self._server = server
+
+    @property
+    def seats(self) -> int:
+        return self._seats
+
+    @seats.setter
+    def seats(self, seats: int):
+        registry = self.registry()
+        if registry is not None and seats != self._seats:
+            registry.move_seats(self, self._seats, seats)
+
+        self._seats = seats
+
+    def set_highlighted(self, highlighted: bool):
+        if highlighted != self.highlighted:
+            self.highlighted = highlighted
+            self.update()
+
+    # The table registry of the scene this table is on (None if it isn't on a scene)
+    def registry(self):
+        return getattr(self.scene(), "tables", None)
+
+    # Keep the scene's table registry up to date as the table is added to / removed from scenes
+    def itemChange(self, change, value):
+        if change == QGraphicsItem.ItemSceneChange:
+            registry = self.registry()
+            if registry is not None:
+                registry.remove(self)
+        elif change == QGraphicsItem.ItemSceneHasChanged:
+            registry = self.registry()
+            if registry is not None:
+                registry.add(self)
+
+        return super(POS_Table, self).itemChange(change, value)
+
+    # Seconds since the table was sat
+    def elapsed(self):
+        if self.seatTime is None:
+            return 0
+
+        return time.monotonic() - self.seatTime
 
     def boundingRect(self):
         return self.rect
 
+    # The timer's area depends on the table's, so it changes geometry along with it
+    # Also throws away the cached body, which may be drawn differently afterwards
+    def prepareGeometryChange(self):
+        super(POS_Table, self).prepareGeometryChange()
+        self.timer.prepareGeometryChange()
+        self.update()
+
+        # The table is being moved or resized (or retitled), the next snapshot has to write it again
+        registry = self.registry()
+        if registry is not None:
+            registry.touch(self.slot)
+
+    # The table's fonts and title layout, made again only when its title, size or shape has changed
+    def layout(self) -> TableLayout:
+        key = (self.title, self.rect.width(), self.rect.height(), self.circ)
+
+        if self._layout is None or self._layout.key != key:
+            rect = self.gfxRect()
+            self._layout = TableLayout(key, self.title, rect.width(), rect.height(), self.circ)
+
+        return self._layout
+
     def gfxRect(self, penWidth=5.0):
         return self.boundingRect().adjusted(penWidth, penWidth, -penWidth, -penWidth)
 
-    def paint(self, painter, option, widget):
-        # Draw the table's graphics
-        painter.setPen(QPen(self.serverColor, 5, Qt.SolidLine))
-        painter.setBrush(QBrush(self.color, Qt.SolidPattern))
+    # The area the seat timer text is drawn in (the top part of the table)
+    def timerRect(self):
+        rect = self.gfxRect()
 
+        # If the table is circular, we have less space for text, so the counter sits lower
         if self.circ:
-            painter.drawEllipse(self.gfxRect())
+            return rect.adjusted(0, 0, 0, -rect.height() / 1.8)
+
+        return rect.adjusted(0, 0, 0, -rect.height() / 1.5)
+
+    # Draws the table's body (the seat timer is drawn by its SeatTimer child)
+    # The further the view is zoomed out, the less of the table is drawn
+    @profiled("table.paint")
+    def paint(self, painter, option, widget):
+        rect = self.gfxRect()
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+
+        # Draw the table's graphics
+        painter.setPen(outlinePen(self.serverColor))
+        painter.setBrush(fillBrush(self.color))
+
+        # Too small to tell the shapes apart, only its colors matter
+        if lod < self.LOD_SHAPE:
+            painter.drawRect(rect)
+        elif self.circ:
+            painter.drawEllipse(rect)
         else:
-            painter.drawRoundedRect(self.gfxRect(), 8, 8)
+            painter.drawRoundedRect(rect, 8, 8)
 
-        # Draw the table's title
-        painter.setPen(QPen(Qt.black))
-        # Get the sizing based on the table's width or height, whichever is least
-        s1 = min(self.gfxRect().width(), self.gfxRect().height())
-        # The actual font's size
-        s2 = s1 / 2.5
-        g.FONT_TABLE.setPointSize(s2)
-        painter.setFont(g.FONT_TABLE)
-        painter.drawText(self.gfxRect(), Qt.AlignCenter, self.title)
+        # Picked for the waiting party, outlined in the margin around the table's shape
+        if self.highlighted:
+            painter.setPen(HIGHLIGHT_PEN)
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(self.boundingRect().adjusted(2, 2, -2, -2))
 
-        # If the table is occupied
-        if self.state == 1:
-            # Position counter text
-            offset = -self.gfxRect().height() / 1.5
+        if lod < self.LOD_SHAPE:
+            return
+
+        # Text would be too small to read
+        if lod < self.LOD_TEXT:
+            return
 
-            # If the table is circular, we have less space for text, so make the counter text 20% smaller
-            if self.circ:
-                s2 *= 0.8
-                offset = -self.gfxRect().height() / 1.8
+        layout = self.layout()
 
-            # Draw counter text
-            g.FONT.setPointSize(s2 / 2.2)
-            painter.setFont(g.FONT)
-            painter.drawText(self.gfxRect().adjusted(0, 0, 0, offset),
-                             Qt.AlignCenter, formatTime(self.counter))
+        # Draw the table's title, centered
+        painter.setPen(TEXT_PEN)
+        painter.setFont(layout.titleFont)
+        center = rect.center()
+        painter.drawStaticText(QPointF(center.x() - layout.titleSize.width() / 2,
+                                       center.y() - layout.titleSize.height() / 2), layout.title)
 
     def hoverEnterEvent(self, event):
         self.cycleState(False, True)
@@ -217,7 +414,7 @@ class POS_Table(QGraphicsItem):
             if servIdx >= len(g.ALL_SERVERS):
                 servIdx = 0
 
-        self.change_server(servIdx)
+        self.change_server(servIdx, log=True)
 
     # Rotate the object
     def rotate(self, rot):
@@ -259,8 +456,11 @@ class POS_Table(QGraphicsItem):
         from core.dialogs import TableDialog
         TableDialog(self.rect, parent=g.WINDOW, item=self)
 
-    def change_server(self, server: int):
-        self.prepareGeometryChange()
+    # log is set by the handlers a host uses to hand a table over, the automatic reassignments (previews, plan loads,
+    # the first server taking every table) aren't service events
+    def change_server(self, server: int, log=False):
+        # Only the outline color changes, the table's geometry stays the same
+        self.update()
 
         if server is None:
             self.server = None
@@ -281,22 +481,69 @@ class POS_Table(QGraphicsItem):
             oldServ.headTotal -= self.numCustomers
             oldServ.total -= 1
             oldServ.active -= 1
-            # if oldServ.predWidget is not None:
-            # 	oldServ.predWidget.update()
 
             self.server.headActive += self.numCustomers
             self.server.headTotal += self.numCustomers
             self.server.total += 1
             self.server.active += 1
-            # if self.server.predWidget is not None:
-            # 	self.server.predWidget.update()
 
-            # g.SERVER_LIST.widget().servList.update()
-            g.SERVER_LIST.widget().servList.populate_servers()
-            g.SERVER_LIST.widget().pred.calculate_choice()
+            # The sat party was handed to another server
+            if log:
+                g.EVENTS.log(EventLog.TRANSFER, self, self.server, self.numCustomers,
+                             None if oldServ is None else oldServ.name)
+
+            # Only the two servers' rows changed
+            g.SERVER_LIST.widget().servList.update_server(oldServ)
+            g.SERVER_LIST.widget().servList.update_server(self.server)
+            g.SERVER_LIST.widget().pred.calculate_choice(oldServ, self.server)
+
+    # Sits a party of num at the table, counting them for its server
+    @profiled("table.seat")
+    def seat(self, num: int):
+        self.numCustomers = num
+        # Start the time counter on the scene's seat clock
+        self.seatTime = time.monotonic()
+        self.scene().start_seat_timer(self)
+        self.server.headActive += self.numCustomers
+        self.server.headTotal += self.numCustomers
+        self.server.total += 1
+        self.server.active += 1
+        # Update the server's list item
+        g.SERVER_LIST.widget().servList.update_server(self.server)
+
+        g.EVENTS.log(EventLog.SEAT, self, self.server, num)
+
+        # Log this table as a recent seating so overflow can calculate
+        g.SERVER_LIST.widget().pred.add_seating(self.numCustomers)
+
+        # Recalculate overflow and server prediction
+        g.SERVER_LIST.widget().pred.calculate_overflow()
+        g.SERVER_LIST.widget().pred.calculate_choice(self.server)
+
+    # The party left, the table is waiting to be bussed
+    @profiled("table.clear")
+    def clear_seating(self):
+        # Stop the time counter and reset to 0:0:0
+        self.scene().stop_seat_timer(self)
+        self.seatTime = None
+
+        g.EVENTS.log(EventLog.CLEAR, self, self.server, self.numCustomers)
+
+        # Table's server exists
+        if self.server is not None:
+            self.server.headActive -= self.numCustomers
+            self.server.active -= 1
+            # Update the server's list item
+            g.SERVER_LIST.widget().servList.update_server(self.server)
+
+            self.numCustomers = 0
+
+            # Recalculate server prediction
+            g.SERVER_LIST.widget().pred.calculate_choice(self.server)
 
     def cycleState(self, advance, mouseover, override=-1):
-        self.prepareGeometryChange()
+        # Only the table's colors change, its geometry stays the same
+        self.update()
 
         if self.isSelected():
             mouseover = True
@@ -305,10 +552,16 @@ class POS_Table(QGraphicsItem):
         if override > -1:
             self.state = override
 
+        # A table the finder picked is offered to the party it was picked for
+        suggested = getattr(self.scene(), "finderParty", 2) if self.highlighted else 2
+
         # Advance the state if set
         if advance:
             if self.state >= 2:
                 self.state = 0
+
+                # The table was bussed and is ready again
+                g.EVENTS.log(EventLog.BUS, self, self.server)
             else:
                 self.state += 1
 
@@ -323,28 +576,13 @@ class POS_Table(QGraphicsItem):
             if advance:
                 # Prompt user for party size
                 inputDialog = QInputDialog(flags=Qt.WindowStaysOnBottomHint)
-                num, ok = inputDialog.getInt(g.WINDOW, "Size", "Customers:", 2, 1, 100, 1)
+                num, ok = inputDialog.getInt(g.WINDOW, "Size", "Customers:", suggested, 1, 100, 1)
 
                 # Input was entered and the table's server exists
                 if ok and self.server is not None:
-                    self.numCustomers = num
-                    # Start the time counter
-                    self.activeTimer.start(1000)
-                    self.server.headActive += self.numCustomers
-                    self.server.headTotal += self.numCustomers
-                    self.server.total += 1
-                    self.server.active += 1
-                    # Update the server's list item
-                    self.server.predWidget.update()
+                    self.seat(num)
 
                     mouseover = False
-
-                    # Log this table as a recent seating so overflow can calculate
-                    g.RECENTS.append({"num": self.numCustomers, "time": QTime.currentTime()})
-
-                    # Recalculate overflow and server prediction
-                    g.SERVER_LIST.widget().pred.calculate_overflow()
-                    g.SERVER_LIST.widget().pred.calculate_choice()
                 else:
                     self.state = 0
                     self.color = g.COLORS["tbl_ready"]
@@ -357,21 +595,7 @@ class POS_Table(QGraphicsItem):
         # If the state is "vacant"
         else:
             if advance:
-                # Stop the time counter and reset to 0:0:0
-                self.activeTimer.stop()
-                self.counter = 18000
-
-                # Table's server exists
-                if self.server is not None:
-                    self.server.headActive -= self.numCustomers
-                    self.server.active -= 1
-                    # Update the server's list item
-                    self.server.predWidget.update()
-
-                    self.numCustomers = 0
-
-                    # Recalculate server prediction
-                    g.SERVER_LIST.widget().pred.calculate_choice()
+                self.clear_seating()
 
             if mouseover:
                 self.color = g.COLORS["tbl_msovacant"]
@@ -379,6 +603,29 @@ class POS_Table(QGraphicsItem):
                 self.color = g.COLORS["tbl_vacant"]
 
 
+# The live seat timer of a sat table, drawn over the table's top part
+# It's a child item so that the timer ticking doesn't throw away the table's cached body
+class SeatTimer(QGraphicsItem):
+    def __init__(self, table: POS_Table):
+        super(SeatTimer, self).__init__(table)
+        self.table = table
+        self.setVisible(False)
+        # Clicks, hovers and menus all belong to the table underneath
+        self.setAcceptedMouseButtons(Qt.NoButton)
+
+    def boundingRect(self):
+        return self.table.timerRect()
+
+    def paint(self, painter, option, widget):
+        # Text would be too small to read
+        if option.levelOfDetailFromTransform(painter.worldTransform()) < POS_Table.LOD_TEXT:
+            return
+
+        painter.setPen(TEXT_PEN)
+        painter.setFont(self.table.layout().timerFont)
+        painter.drawText(self.boundingRect(), Qt.AlignCenter, formatElapsed(self.table.elapsed()))
+
+
 class Server_Menu_Action(QAction):
     def __init__(self, server, table, parent=None):
         super(Server_Menu_Action, self).__init__(server.name, parent)
@@ -390,11 +637,150 @@ class Server_Menu_Action(QAction):
         self.setIcon(QIcon(pix))
 
         def on_clicked():
-            self.table.change_server(self.server.num)
+            self.table.change_server(self.server.num, log=True)
 
         self.triggered.connect(on_clicked)
 
 
+# Index of the tables on a scene, by server, by state and by snapshot slot
+# Kept up to date by POS_Table as tables are added, removed, re-served and cycled, so nothing has to scan the scene
+# (dicts are used as insertion ordered sets)
+# Clean tables ordered by their seats, overall and per server, so the best fit for a party is found by bisection
+# Entries are (seats, slot), the slot tells tables with the same seats apart (and finds them in the registry)
+class CapacityIndex:
+    # Extra seats the predicted server's table may have over the tightest fit and still come first
+    SLACK = 2
+
+    def __init__(self):
+        self.all = []
+        # (key is a server, None for tables without one)
+        self.byServer = {}
+
+    def __len__(self):
+        return len(self.all)
+
+    def add(self, server, seats: int, slot: int):
+        bisect.insort(self.all, (seats, slot))
+        bisect.insort(self.byServer.setdefault(server, []), (seats, slot))
+
+    def remove(self, server, seats: int, slot: int):
+        for entries in (self.all, self.byServer.get(server, [])):
+            idx = bisect.bisect_left(entries, (seats, slot))
+
+            if idx < len(entries) and entries[idx] == (seats, slot):
+                del entries[idx]
+
+    # Up to limit of the smallest entries that seat a party
+    @staticmethod
+    def fitting(entries: list, party: int, limit: int) -> list:
+        idx = bisect.bisect_left(entries, (party, -1))
+
+        return entries[idx:idx + limit]
+
+    # The best fits for a party, tightest first
+    # The predicted server's tightest fit goes first if it has at most SLACK more seats than the tightest overall
+    def best(self, party: int, server=None, limit=3) -> list:
+        fits = self.fitting(self.all, party, limit)
+
+        if server is None or not fits:
+            return fits
+
+        own = self.fitting(self.byServer.get(server, []), party, 1)
+        if own and own[0][0] - fits[0][0] <= self.SLACK:
+            return own + [fit for fit in fits if fit != own[0]][:limit - 1]
+
+        return fits
+
+
+class TableRegistry:
+    def __init__(self):
+        self.all = {}
+        self.byServer = {}
+        self.byState = {0: {}, 1: {}, 2: {}}
+        self.bySlot = {}
+        # The clean tables by seats
+        self.capacity = CapacityIndex()
+
+        # Slots of the tables that changed since the last snapshot (added, removed, re-served, cycled or moved)
+        self.changed = set()
+        self.nextSlot = 0
+
+    def __len__(self):
+        return len(self.all)
+
+    def new_slot(self) -> int:
+        self.nextSlot += 1
+        return self.nextSlot
+
+    def touch(self, slot):
+        if slot is not None:
+            self.changed.add(slot)
+
+    def add(self, tbl: POS_Table):
+        if tbl.slot is None:
+            tbl.slot = self.new_slot()
+
+        self.all[tbl] = None
+        self.byServer.setdefault(tbl.server, {})[tbl] = None
+        self.byState.setdefault(tbl.state, {})[tbl] = None
+        self.bySlot[tbl.slot] = tbl
+        self.changed.add(tbl.slot)
+
+        if tbl.state == 0:
+            self.capacity.add(tbl.server, tbl.seats, tbl.slot)
+
+    def remove(self, tbl: POS_Table):
+        if tbl not in self.all:
+            return
+
+        del self.all[tbl]
+        self.byServer.get(tbl.server, {}).pop(tbl, None)
+        self.byState.get(tbl.state, {}).pop(tbl, None)
+        if self.bySlot.get(tbl.slot) is tbl:
+            del self.bySlot[tbl.slot]
+        self.touch(tbl.slot)
+
+        if tbl.state == 0:
+            self.capacity.remove(tbl.server, tbl.seats, tbl.slot)
+
+    def move_server(self, tbl: POS_Table, old, new):
+        self.byServer.get(old, {}).pop(tbl, None)
+        self.byServer.setdefault(new, {})[tbl] = None
+        self.touch(tbl.slot)
+
+        if tbl.state == 0:
+            self.capacity.remove(old, tbl.seats, tbl.slot)
+            self.capacity.add(new, tbl.seats, tbl.slot)
+
+    def move_state(self, tbl: POS_Table, old: int, new: int):
+        self.byState.get(old, {}).pop(tbl, None)
+        self.byState.setdefault(new, {})[tbl] = None
+        self.touch(tbl.slot)
+
+        if old == 0:
+            self.capacity.remove(tbl.server, tbl.seats, tbl.slot)
+        elif new == 0:
+            self.capacity.add(tbl.server, tbl.seats, tbl.slot)
+
+    def move_seats(self, tbl: POS_Table, old: int, new: int):
+        self.touch(tbl.slot)
+
+        if tbl.state == 0:
+            self.capacity.remove(tbl.server, old, tbl.slot)
+            self.capacity.add(tbl.server, new, tbl.slot)
+
+    # Tables served by a server (None for tables without a server)
+    # Returned as a list so the tables can be re-served while iterating
+    def served_by(self, server) -> list:
+        return list(self.byServer.get(server, ()))
+
+    def in_state(self, state: int) -> list:
+        return list(self.byState.get(state, ()))
+
+    def tables(self) -> list:
+        return list(self.all)
+
+
 class POS_Server:
     def __init__(self, name):
         self.name = name
@@ -404,8 +790,6 @@ class POS_Server:
         self.headTotal = 0
         self.active = 0
         self.total = 0
-        # Refers to this server's listitemwidget on the visual server list
-        self.predWidget = None
 
         # Attempt to set the server's color to what's in the global server colors at their index
         try:
@@ -419,12 +803,16 @@ class POS_Server:
 
         # If there's only 1 server (this one), assign all tables to be served by self
         if len(g.ALL_SERVERS) == 1:
-            for tbl in g.SCENE.items():
-                if type(tbl) is POS_Table:
-                    tbl.change_server(self.num)
+            for tbl in g.SCENE.tables.tables():
+                tbl.change_server(self.num)
+
+            # Including the tables of the sections that aren't being shown
+            for rec in g.SCENE.sections.records():
+                rec.server = self
+                g.SCENE.tables.touch(rec.slot)
 
         # Let the server predictor calculate who should get the next table
-        g.SERVER_LIST.widget().pred.calculate_choice()
+        g.SERVER_LIST.widget().pred.calculate_choice(self)
 
     def deleteServer(self):
         try:
@@ -434,49 +822,40 @@ class POS_Server:
         except IndexError:
             return print("Fatal error!", "IndexError deleting a server")
 
-        # If this is the only server
+        g.EVENTS.log(EventLog.SERVER_REMOVE, server=self)
+
+        # The removed server's tables go to the server that takes its place in the list,
+        # the server before it if it was the last one, or nobody if it was the only one
         if len(g.ALL_SERVERS) == 0:
-            print("only server")
-            # Iterate through all tables and change their server to None
-            for tbl in g.SCENE.items():
-                if type(tbl) is POS_Table:
-                    tbl.change_server(None)
-
-        # If this isn't the last server in the list
-        elif self.num != len(g.ALL_SERVERS):
-            # Iterate through all servers with indexes after the removed one
-            for server in g.ALL_SERVERS[self.num:]:
-                # The server list decremented all indexes, so we need to decrement our index variable
-                # on all of these servers
-                server.num -= 1
-                # Update their color
-                try:
-                    server.color = g.SERVER_COLORS[server.num]
-                except IndexError:
-                    server.color = QColor.fromHsv(random.randint(0, 359),
-                                                  random.randint(128, 255),
-                                                  random.randint(110, 178))
-
-                # Iterate through all tables
-                for tbl in g.SCENE.items():
-                    if type(tbl) is POS_Table:
-                        # If this table is served by the removed server or the iterated server
-                        if tbl.server == server or tbl.server == self:
-                            tbl.change_server(server.num)
-                        elif tbl.server == self:
-                            tbl.change_server(self.num - 1)
-
-        # This is the last server in the list (but still multiple servers)
+            replacement = None
+        elif self.num < len(g.ALL_SERVERS):
+            replacement = self.num
         else:
-            # Iterate tables with this server
-            for tbl in g.SCENE.items():
-                if type(tbl) is POS_Table:
-                    if tbl.server == self:
-                        tbl.change_server(self.num - 1)
-                        # try:
-                        #     print("changed back 1")
-                        # except IndexError:
-                        #     tbl.change_server(None)
+            replacement = self.num - 1
+
+        # The server list decremented all indexes after the removed one, so we need to decrement our index
+        # variable on all of these servers
+        for server in g.ALL_SERVERS[self.num:]:
+            server.num -= 1
+            # Update their color
+            try:
+                server.color = g.SERVER_COLORS[server.num]
+            except IndexError:
+                server.color = QColor.fromHsv(random.randint(0, 359),
+                                              random.randint(128, 255),
+                                              random.randint(110, 178))
+
+            # Only this server's tables need to show the new color
+            for tbl in g.SCENE.tables.served_by(server):
+                tbl.serverColor = server.color
+                tbl.update()
+
+        # Re-serve only the removed server's tables
+        for tbl in g.SCENE.tables.served_by(self):
+            tbl.change_server(replacement)
+
+        # The removed server's tables in the sections that aren't being shown go to the same server
+        g.SCENE.sections.reassign(self, None if replacement is None else g.ALL_SERVERS[replacement])
 
         # self = None
         del self
@@ -0,0 +1,261 @@
+import bisect
+import heapq
+
+from core.database import EVENT_TABLE
+
+
+# Keeps servers ordered by who should be sat next, updated one server at a time
+# The original score was: highest total - server's total - server's active heads (-20 when the server has no
+# active heads, so idle servers come first). The highest total is the same for every server, so the best score
+# belongs to the server with the lowest total + active. Ties go to the server listed first, like max() did.
+class RotationEngine:
+    # Value used in place of active heads for a server with none (raise this number to prioritize less)
+    IDLE_ACTIVE = -20
+
+    def __init__(self):
+        # Heap of (key, sequence, server), entries whose key is no longer the server's current key are stale
+        self.heap = []
+        # Current key for every server in the rotation
+        self.keys = {}
+        # Tie breaker so the heap never has to compare two server objects
+        self.sequence = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def key(cls, server) -> tuple:
+        active = server.headActive if server.headActive != 0 else cls.IDLE_ACTIVE
+
+        return server.headTotal + active, server.num
+
+    # Re-scores a server after its counters changed (adds it if it wasn't in the rotation)
+    def update(self, server):
+        key = self.key(server)
+
+        if self.keys.get(server) == key:
+            return
+
+        self.keys[server] = key
+        self.sequence += 1
+        heapq.heappush(self.heap, (key, self.sequence, server))
+
+        # Too many stale entries, rebuild the heap from the current keys
+        if len(self.heap) > 2 * len(self.keys) + 16:
+            self.compact()
+
+    def remove(self, server):
+        self.keys.pop(server, None)
+
+    # Replaces the whole rotation with these servers
+    def rebuild(self, servers):
+        self.keys = {server: self.key(server) for server in servers}
+        self.compact()
+
+    def compact(self):
+        self.heap = []
+        for server, key in self.keys.items():
+            self.sequence += 1
+            self.heap.append((key, self.sequence, server))
+
+        heapq.heapify(self.heap)
+
+    # The server that should get the next table (None if there are no servers)
+    def best(self):
+        while self.heap:
+            key, _, server = self.heap[0]
+
+            if self.keys.get(server) == key:
+                return server
+
+            # Stale entry, the server was re-scored or removed since this was pushed
+            heapq.heappop(self.heap)
+
+        return None
+
+
+# Running total of the kitchen load from recent seatings
+# Every seating starts at its party size and decays linearly at its rate (heads per second) until it reaches 0,
+# so the total is sum(num) - sum(rate * (now - seat time)), kept as three running sums.
+# Seatings are held in a heap ordered by when they run out, so each update only touches the expired ones.
+class OverflowTracker:
+    def __init__(self, seatings: list, rate: float, model=None):
+        # Heap of (expiry, seat time, num, rate), all times are time.monotonic() seconds
+        self.seatings = seatings
+        self.rate = rate
+        # KitchenModel fitted from past service (None to decay every seating at the flat rate)
+        self.model = model
+        self.sumNum = 0.0
+        self.sumRate = 0.0
+        self.sumRateTime = 0.0
+
+    def __len__(self):
+        return len(self.seatings)
+
+    # Rate a seating of num customers decays at (heads per second)
+    def rate_of(self, num: int) -> float:
+        if self.model is None:
+            return self.rate
+
+        return self.model.rate(num, self.rate)
+
+    # Logs a seating of num customers (rate defaults to the model's rate for its party size)
+    def add(self, num: int, seat_time: float, rate=None):
+        if rate is None:
+            rate = self.rate_of(num)
+
+        heapq.heappush(self.seatings, (seat_time + num / rate, seat_time, num, rate))
+        self.sumNum += num
+        self.sumRate += rate
+        self.sumRateTime += rate * seat_time
+
+    # Changes the decay rate of every seating (the kitchen speed setting changed or the model was refit)
+    def set_rate(self, rate: float, model=None):
+        self.rate = rate
+        self.model = model
+        entries = [(seat_time, num) for _, seat_time, num, _ in self.seatings]
+        self.clear()
+
+        for seat_time, num in entries:
+            self.add(num, seat_time)
+
+    def clear(self):
+        self.seatings.clear()
+        self.sumNum = 0.0
+        self.sumRate = 0.0
+        self.sumRateTime = 0.0
+
+    # Drops the seatings that have fully decayed by now
+    def expire(self, now: float):
+        while self.seatings and self.seatings[0][0] <= now:
+            _, seat_time, num, rate = heapq.heappop(self.seatings)
+            self.sumNum -= num
+            self.sumRate -= rate
+            self.sumRateTime -= rate * seat_time
+
+        # Nothing left, reset the sums so rounding errors can't build up
+        if not self.seatings:
+            self.sumNum = self.sumRate = self.sumRateTime = 0.0
+
+    def score(self, now: float) -> float:
+        self.expire(now)
+
+        return max(0.0, self.sumNum - now * self.sumRate + self.sumRateTime)
+
+
+# How long a seating loads the kitchen, fitted per party size band from the turns of past service
+# The share of a band's tables that are still sat t seconds after being sat falls from 1 to 0, a straight line
+# 1 - slope * t is fitted to it by least squares. A seating then decays linearly at num * slope heads per second, which
+# is what OverflowTracker already does with the flat kitchen speed, so the score is still kept as running sums.
+class KitchenModel:
+    # Largest party of each band, the last band takes every party above it too
+    BANDS = (2, 4, 6, 8)
+    # A band needs this many turns before its fit is trusted, below that it uses the kitchen speed
+    MIN_TURNS = 20
+    # Days of service that are fitted
+    DAYS = 28
+    # Turns longer than this are tables nobody cleared at the end of the night (seconds)
+    MAX_TURN = 4 * 3600
+
+    def __init__(self, slopes=None, turns=None, fitted=0.0):
+        # Per band, the fitted slope (1 / seconds) and how many turns it was fitted from
+        self.slopes = slopes if slopes is not None else [0.0] * len(self.BANDS)
+        self.turns = turns if turns is not None else [0] * len(self.BANDS)
+        # Wall clock time of the fit
+        self.fitted = fitted
+
+    @classmethod
+    def band(cls, num: int) -> int:
+        return min(bisect.bisect_left(cls.BANDS, num), len(cls.BANDS) - 1)
+
+    # Rate a seating of num customers decays at (heads per second), default is the kitchen speed
+    def rate(self, num: int, default: float) -> float:
+        band = self.band(num)
+
+        if self.turns[band] < self.MIN_TURNS or self.slopes[band] <= 0:
+            return default
+
+        return max(num, 1) * self.slopes[band]
+
+    # Minutes a band's seatings load the kitchen for (None when it falls back to the kitchen speed)
+    def minutes(self, band: int):
+        if self.turns[band] < self.MIN_TURNS or self.slopes[band] <= 0:
+            return None
+
+        return 1 / self.slopes[band] / 60
+
+    # Least squares slope of the share of durations that are over by each duration
+    # After sorting, the i-th duration x has i / n of the turns over, the line through (0, 0) fitting those points
+    # has a slope of sum(x * y) / sum(x * x)
+    @staticmethod
+    def fit_band(durations: list) -> float:
+        count = len(durations)
+        sum_xy = 0.0
+        sum_xx = 0.0
+
+        for i, x in enumerate(sorted(durations), 1):
+            sum_xy += x * i / count
+            sum_xx += x * x
+
+        return sum_xy / sum_xx if sum_xx > 0 else 0.0
+
+    # Fits a model to (party size, seconds) turns
+    @classmethod
+    def fit(cls, turns, fitted=0.0):
+        durations = [[] for _ in cls.BANDS]
+        for num, seconds in turns:
+            if 0 < seconds <= cls.MAX_TURN:
+                durations[cls.band(num)].append(seconds)
+
+        return cls([cls.fit_band(d) if d else 0.0 for d in durations], [len(d) for d in durations], fitted)
+
+    # (party size, seconds) of every seating that was cleared between two wall clock times
+    # A turn is a table's seat event followed by its clear event (tables are told apart by database.EVENT_TABLE, titles
+    # can be shared)
+    @staticmethod
+    def read_turns(db, start: float, end: float) -> list:
+        rows = db.fetchall_tuples("SELECT kind, " + EVENT_TABLE + " AS place, wall, COALESCE(party, 0) FROM events "
+                                  "WHERE wall >= ? AND wall < ? AND kind IN ('seat', 'clear') "
+                                  "ORDER BY place, wall", (start, end))
+
+        turns = []
+        last = None
+        for row in rows:
+            if row[0] == "clear" and last is not None and last[0] == "seat" and last[1] == row[1]:
+                turns.append((last[3], row[2] - last[2]))
+            last = row
+
+        return turns
+
+    # Fits the last DAYS of service before now (runs on the database worker)
+    @classmethod
+    def refit(cls, db, now: float):
+        return cls.fit(cls.read_turns(db, now - cls.DAYS * 86400, now), now)
+
+    # Kept in the settings as a dict, so the model is there straight away the next time Hosty starts
+    def to_setting(self) -> dict:
+        return {"slopes": list(self.slopes), "turns": list(self.turns), "fitted": self.fitted}
+
+    @classmethod
+    def from_setting(cls, value):
+        if not value or len(value.get("slopes", [])) != len(cls.BANDS):
+            return None
+
+        return cls([float(s) for s in value["slopes"]], [int(t) for t in value["turns"]], float(value["fitted"]))
+
+
+# The overflow rules sorted by threshold, so the rule for a score can be found by bisection
+class OverflowThresholds:
+    def __init__(self, rules: dict):
+        ordered = sorted(rules, key=lambda name: rules[name]["num"])
+        self.names = ordered
+        self.nums = [rules[name]["num"] for name in ordered]
+
+    # Name of the rule with the highest threshold the score is above ("default" if it's above none)
+    def match(self, score: float) -> str:
+        idx = bisect.bisect_left(self.nums, score) - 1
+
+        if idx < 0:
+            return "default"
+
+        return self.names[idx]
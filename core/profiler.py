@@ -0,0 +1,192 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Timings kept per hot path (older ones are dropped), enough for stable p99s
+SAMPLES = 2048
+# Spans kept for the Chrome trace export
+TRACE_EVENTS = 100000
+
+
+# Records how long the hot paths take and how many database queries they run
+# Off until enabled (the performance overlay turns it on), instrumented code only checks the enabled flag while off
+# The GUI thread and the database worker both record into it, so everything shared is guarded by the lock. A hot path
+# is only charged for the queries run on its own thread (the worker's queries aren't the GUI's).
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        # perf_counter() when profiling was enabled, the trace's timestamps start from here
+        self.origin = time.perf_counter()
+        # Database queries run since profiling was enabled (both connections)
+        self.queries = 0
+        # Queries run on each thread (the count attribute, only ever touched by its own thread)
+        self.local = threading.local()
+
+        # (key is the hot path's name, value is a deque of durations in milliseconds)
+        self.samples = {}
+        # (key is the hot path's name, value is a deque of queries run during each call)
+        self.query_counts = {}
+        # (key is the hot path's name, value is how many calls were recorded in total)
+        self.calls = {}
+        # Chrome trace spans as (name, start, end, thread id)
+        self.events = deque(maxlen=TRACE_EVENTS)
+
+    def enable(self):
+        if not self.enabled:
+            self.clear()
+            self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self.lock:
+            self.origin = time.perf_counter()
+            self.queries = 0
+            self.samples.clear()
+            self.query_counts.clear()
+            self.calls.clear()
+            self.events.clear()
+
+    # Counts a database query run on the calling thread
+    def count_query(self):
+        self.local.count = getattr(self.local, "count", 0) + 1
+
+        with self.lock:
+            self.queries += 1
+
+    # How many queries the calling thread has run (only differences between two calls mean anything)
+    def thread_queries(self) -> int:
+        return getattr(self.local, "count", 0)
+
+    def record(self, name: str, start: float, end: float, queries: int):
+        with self.lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=SAMPLES)
+                self.query_counts[name] = deque(maxlen=SAMPLES)
+                self.calls[name] = 0
+
+            self.samples[name].append((end - start) * 1000)
+            self.query_counts[name].append(queries)
+            self.calls[name] += 1
+            self.events.append((name, start, end, threading.get_ident()))
+
+    # Latency percentiles and queries per call of every hot path (times in milliseconds)
+    def summary(self) -> dict:
+        # Copied while locked, sorted after so the other thread isn't held up
+        with self.lock:
+            paths = [(name, list(samples), list(self.query_counts[name]), self.calls[name])
+                     for name, samples in self.samples.items()]
+
+        out = {}
+
+        for name, samples, counts, calls in paths:
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+
+            out[name] = {
+                "calls":   calls,
+                "p50":     percentile(ordered, 50),
+                "p90":     percentile(ordered, 90),
+                "p99":     percentile(ordered, 99),
+                "max":     ordered[-1],
+                "queries": sum(counts) / len(counts),
+            }
+
+        return out
+
+    def export_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"captured": time.perf_counter() - self.origin,
+                       "queries":  self.queries,
+                       "paths":    self.summary()}, f, indent=2)
+
+    # Writes the recorded spans in the Chrome trace event format (load it in chrome://tracing or Perfetto)
+    def export_chrome_trace(self, path: str):
+        threads = {}
+        events = []
+
+        with self.lock:
+            spans = list(self.events)
+
+        for name, start, end, thread in spans:
+            events.append({
+                "name": name,
+                "cat":  name.split(".")[0],
+                "ph":   "X",
+                "ts":   (start - self.origin) * 1e6,
+                "dur":  (end - start) * 1e6,
+                "pid":  1,
+                "tid":  threads.setdefault(thread, len(threads) + 1),
+            })
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# Nearest-rank percentile of an already sorted list
+def percentile(ordered: list, pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+PROFILER = Profiler()
+
+
+# Times every call of the decorated function under name while profiling is on
+def profiled(name: str):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+
+            queries = PROFILER.thread_queries()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                PROFILER.record(name, start, time.perf_counter(), PROFILER.thread_queries() - queries)
+
+        return wrapper
+
+    return decorate
+
+
+# Same as profiled, for a database call (it's also counted as a query of whatever hot path is running on its thread)
+def profiled_query(name: str):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+
+            PROFILER.count_query()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                PROFILER.record(name, start, time.perf_counter(), 1)
+
+        return wrapper
+
+    return decorate
+
+
+# Times the code in a with block under name while profiling is on
+@contextmanager
+def section(name: str):
+    if not PROFILER.enabled:
+        yield
+        return
+
+    queries = PROFILER.thread_queries()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PROFILER.record(name, start, time.perf_counter(), PROFILER.thread_queries() - queries)
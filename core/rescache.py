@@ -0,0 +1,164 @@
+import core.globals as g
+from core.cache import LRUCache
+
+
+# Reservations read a month at a time, so moving between days of that month doesn't query the database
+# Each day is a list of rows (lists of the ResModel fields) in time order. The rows are shared with the
+# reservation list's model, so edits made through the model are already reflected here.
+# Months are read on the database worker, load() hands back the DBFuture of the read.
+class ReservationCache:
+    COLUMNS = "res_id, time, size, name, phone, note, state"
+
+    def __init__(self, months=6):
+        # (key is "yyyy-mm", value is a dict of "yyyy-mm-dd" -> rows)
+        self.months = LRUCache(months)
+        # Months being read right now (key is "yyyy-mm", value is the DBFuture of the read)
+        self.loading = {}
+
+    # Returns the rows for an ISO date ("yyyy-mm-dd"), or None if its month has to be loaded first
+    def day(self, date: str):
+        month = self.months.get(date[:7])
+
+        if month is None:
+            return None
+
+        return month.setdefault(date, [])
+
+    # Starts reading a month ("yyyy-mm"), its rows are cached before the future's finished is emitted
+    def load(self, month: str):
+        future = self.loading.get(month)
+
+        if future is None:
+            def on_loaded(days):
+                del self.loading[month]
+                self.months.put(month, days)
+
+            def on_failed(error):
+                del self.loading[month]
+                print("couldn't read reservations: " + error)
+
+            future = g.WORKER.submit(self.read_month, month)
+            future.finished.connect(on_loaded)
+            future.failed.connect(on_failed)
+            self.loading[month] = future
+
+        return future
+
+    # Reads every reservation in a month with one range query (dates are stored as ISO text)
+    # Runs on the database worker
+    @classmethod
+    def read_month(cls, db, month: str) -> dict:
+        days = {}
+
+        for row in db.fetchall("SELECT date, " + cls.COLUMNS + " FROM reservations "
+                               "WHERE date BETWEEN ? AND ? ORDER BY date, time, res_id",
+                               (month + "-01", month + "-31")):
+            days.setdefault(row[0], []).append(list(row)[1:])
+
+        return days
+
+    # A reservation on this date was added, moved or re-timed, read its month again next time
+    def invalidate(self, date: str):
+        if date:
+            self.months.invalidate(date[:7])
+            self.drop_load(date[:7])
+
+    def clear(self):
+        self.months.clear()
+        for month in list(self.loading):
+            self.drop_load(month)
+
+    # A read that's in progress may be missing the latest changes, so it's never cached
+    def drop_load(self, month: str):
+        future = self.loading.pop(month, None)
+
+        if future is not None:
+            future.cancel()
+
+
+# How many reservations and covers (party sizes added up) each day has, canceled reservations aren't counted
+# Read with one GROUP BY date query per month on the database worker, then kept up to date as reservations change
+class CoverCounts:
+    def __init__(self, months=24):
+        # (key is "yyyy-mm", value is a dict of "yyyy-mm-dd" -> [reservations, covers])
+        self.months = LRUCache(months)
+        # Months being read right now (key is "yyyy-mm", value is a list of changes made since the read started)
+        self.loading = {}
+
+    # Makes sure a month's counts are loaded, returns the DBFuture of the read if one was needed
+    def load(self, month: str):
+        if month in self.months or month in self.loading:
+            return None
+
+        changes = self.loading[month] = []
+
+        def on_loaded(days):
+            # The month was cleared while it was being read
+            if self.loading.get(month) is not changes:
+                return
+
+            del self.loading[month]
+            self.months.put(month, days)
+
+            # Changes made after the read was queued aren't in the database's answer yet
+            for date, count, covers in changes:
+                self.adjust(date, count, covers)
+
+        def on_failed(error):
+            self.loading.pop(month, None)
+            print("couldn't read reservation counts: " + error)
+
+        future = g.WORKER.submit(self.read_month, month)
+        future.finished.connect(on_loaded)
+        future.failed.connect(on_failed)
+
+        return future
+
+    # Runs on the database worker
+    @staticmethod
+    def read_month(db, month: str) -> dict:
+        days = {}
+        for date, count, covers in db.fetchall("SELECT date, COUNT(*), SUM(size) FROM reservations "
+                                               "WHERE date BETWEEN ? AND ? AND state != 2 GROUP BY date",
+                                               (month + "-01", month + "-31")):
+            days[date] = [count, covers]
+
+        return days
+
+    # Returns (reservations, covers) for an ISO date, (0, 0) if its month isn't loaded
+    def get(self, date: str) -> tuple:
+        month = self.months.get(date[:7])
+
+        if month is None or date not in month:
+            return 0, 0
+
+        count, covers = month[date]
+        return count, covers
+
+    # The most covers on any loaded day of a month (for scaling the heat colors)
+    def busiest(self, month: str) -> int:
+        days = self.months.get(month)
+
+        if not days:
+            return 0
+
+        return max(covers for _, covers in days.values())
+
+    # Applies a change to a day's counts, months that aren't loaded will read the change from the database
+    def adjust(self, date: str, count: int, covers: int):
+        if date[:7] in self.loading:
+            self.loading[date[:7]].append((date, count, covers))
+            return
+
+        month = self.months.get(date[:7])
+
+        if month is None:
+            return
+
+        day = month.setdefault(date, [0, 0])
+        day[0] += count
+        day[1] += covers
+
+    def clear(self):
+        self.months.clear()
+        self.loading.clear()
@@ -0,0 +1,56 @@
+import re
+
+# Searches shorter than this match too many reservations to be worth showing
+MIN_LENGTH = 2
+
+# Something typed that's only a phone number (digits, with or without dashes, spaces or brackets)
+PHONE = re.compile(r"[\d\s()\-.]+")
+WORD = re.compile(r"\w+")
+
+# The next page of reservations matching a search, newest first (after is the res_id the last page ended on)
+# FTS5 walks its index by rowid, so paging by res_id never has to find or sort every match
+PAGE_QUERY = "SELECT r.res_id, r.date, r.time, r.size, r.name, r.phone, r.note, r.state " \
+             "FROM reservations_search JOIN reservations AS r ON r.res_id = reservations_search.rowid " \
+             "WHERE reservations_search MATCH ? AND reservations_search.rowid < ? " \
+             "ORDER BY reservations_search.rowid DESC LIMIT ?"
+
+
+# Whether the database has the search index (SQLite builds without FTS5 don't)
+def available(db) -> bool:
+    return db.fetchone("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservations_search'") is not None
+
+
+# The FTS5 query for what was typed into the search box, None if there's nothing to search for
+# Every word has to start a word of the name, phone number or note. Phone numbers are stored as digits only, so a
+# typed phone number is searched as one run of digits, matching the numbers it starts or the ones it ends (the last few
+# digits are often all a guest gives, see index_phone_digits)
+def match_query(text: str):
+    text = text.strip()
+    phone = PHONE.fullmatch(text)
+
+    if phone:
+        words = ["".join(ch for ch in text if ch.isdigit())]
+    else:
+        words = WORD.findall(text)
+
+    words = [word for word in words if word]
+    if not words or sum(len(word) for word in words) < MIN_LENGTH:
+        return None
+
+    # Quoted, so words like AND / OR / NOT are searched for as they are
+    quoted = ['"' + word.replace('"', '""') + '"' for word in words]
+    query = "{name phone note} : (" + " ".join(word + "*" for word in quoted) + ")"
+
+    # The same digits backwards start the reversed numbers they end
+    if phone:
+        query += ' OR phone_reversed : "' + words[0][::-1] + '"*'
+
+    return query
+
+
+# One page of the reservations matching an FTS5 query, as lists of the PAGE_QUERY fields (runs on the database worker)
+def search_page(db, query: str, after, limit: int) -> list:
+    if after is None:
+        after = 1 << 62
+
+    return [list(row) for row in db.fetchall_tuples(PAGE_QUERY, (query, after, limit))]
@@ -0,0 +1,178 @@
+import bisect
+import heapq
+
+from core.predict import KitchenModel
+
+# Minutes a party holds its table for, per KitchenModel band, until the kitchen model has enough service to go by
+DEFAULT_TURNS = (75, 90, 105, 120)
+# With a kitchen model, a party is expected to be gone once this share of its band's past turns were over
+TURN_SHARE = 0.8
+# Minutes a table takes to be bussed and reset between parties
+RESET = 10
+
+
+# Minutes a party of size is expected to hold its table for (model is the fitted KitchenModel, or None)
+def expected_turn(size: int, model=None) -> float:
+    band = KitchenModel.band(size)
+
+    if model is not None:
+        # The minutes by which every one of the band's turns was over (the fitted line reaching 0)
+        minutes = model.minutes(band)
+        if minutes is not None:
+            return minutes * TURN_SHARE
+
+    return DEFAULT_TURNS[band]
+
+
+# Minutes since midnight of a "hh:mm[:ss]" time, times before opening are after midnight (opens is in minutes)
+def night_minutes(time: str, opens=0) -> int:
+    minutes = int(time[:2]) * 60 + int(time[3:5])
+
+    if minutes < opens:
+        minutes += 24 * 60
+
+    return minutes
+
+
+# One reservation to be given a table, it holds the table from start until end (minutes, see night_minutes)
+class Booking:
+    __slots__ = ("res_id", "start", "size", "end")
+
+    def __init__(self, res_id: int, start: float, size: int, end: float):
+        self.res_id = res_id
+        self.start = start
+        self.size = size
+        self.end = end
+
+    # Bookings are planned in this order: by arrival, bigger parties first, then the order they were made in
+    def key(self) -> tuple:
+        return self.start, -self.size, self.res_id
+
+
+# Bookings of (res_id, time, size) reservations, each holds its table for its expected turn and the reset after it
+# The turn of each party size is only worked out once
+def make_bookings(reservations, model=None, opens=0) -> list:
+    turns = {}
+    bookings = []
+
+    for res_id, time, size in reservations:
+        turn = turns.get(size)
+        if turn is None:
+            turn = turns[size] = expected_turn(size, model) + RESET
+
+        start = night_minutes(time, opens)
+        bookings.append(Booking(res_id, start, size, start + turn))
+
+    return bookings
+
+
+# Assigns a night's bookings to tables so that no table has two bookings at once
+# This is interval scheduling with a bin packing twist: bookings are taken in order of arrival, and each goes to a
+# table of the fewest seats that fits it and is free by then (the free tables of each size are a heap ordered by when
+# they free up). A booking with no such table is left without one (tables are never pushed together).
+# A booking's table only depends on the bookings planned before it, so when bookings change the plan is kept up to
+# the first one that changed and only the rest are planned again.
+class TableScheduler:
+    def __init__(self):
+        self.date = None
+        # Seats of each table (key is the table's slot)
+        self.tables = {}
+        # Sorted seat counts of the tables
+        self.capacities = []
+        # Booking keys in planning order
+        self.keys = []
+        # (key is the res_id, value is the Booking)
+        self.bookings = {}
+        # (key is the res_id, value is the table's slot, None if no table was free)
+        self.assigned = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    # The slot of the table a booking got (None if it got none or isn't planned)
+    def table_of(self, res_id):
+        return self.assigned.get(res_id)
+
+    # The res_ids of the bookings no table was free for
+    def unassigned(self) -> list:
+        return [key[2] for key in self.keys if self.assigned[key[2]] is None]
+
+    # Plans a night from scratch, tables is a dict of slot -> seats
+    def plan(self, date: str, bookings: list, tables: dict) -> int:
+        self.date = date
+        self.tables = dict(tables)
+        self.capacities = sorted(set(self.tables.values()))
+        self.bookings = {booking.res_id: booking for booking in bookings}
+        self.keys = sorted(booking.key() for booking in bookings)
+        self.assigned = {}
+
+        return self.replan(0)
+
+    # Brings the plan up to date with the night's bookings, returns how many bookings were planned again
+    # Another date or a changed floor is planned from scratch, otherwise only from the first booking that changed
+    def sync(self, date: str, bookings: list, tables: dict) -> int:
+        if date != self.date or tables != self.tables:
+            return self.plan(date, bookings, tables)
+
+        first = None
+        current = {booking.res_id: booking for booking in bookings}
+
+        for res_id, old in list(self.bookings.items()):
+            new = current.get(res_id)
+
+            if new is None or (new.start, new.size, new.end) != (old.start, old.size, old.end):
+                first = min(first, old.key()) if first is not None else old.key()
+                self.drop(old)
+
+        for res_id, new in current.items():
+            if res_id not in self.bookings:
+                first = min(first, new.key()) if first is not None else new.key()
+                self.insert(new)
+
+        if first is None:
+            return 0
+
+        return self.replan(bisect.bisect_left(self.keys, first))
+
+    def insert(self, booking: Booking):
+        bisect.insort(self.keys, booking.key())
+        self.bookings[booking.res_id] = booking
+
+    def drop(self, booking: Booking):
+        idx = bisect.bisect_left(self.keys, booking.key())
+        del self.keys[idx]
+        del self.bookings[booking.res_id]
+        self.assigned.pop(booking.res_id, None)
+
+    # Plans every booking from position first on, the ones before it keep their tables
+    def replan(self, first: int) -> int:
+        # When each table frees up after the bookings that keep their tables
+        free = {}
+        for key in self.keys[:first]:
+            slot = self.assigned[key[2]]
+            if slot is not None:
+                free[slot] = self.bookings[key[2]].end
+
+        heaps = {seats: [] for seats in self.capacities}
+        for slot, seats in self.tables.items():
+            heaps[seats].append((free.get(slot, float("-inf")), slot))
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        for key in self.keys[first:]:
+            self.assigned[key[2]] = self.place(self.bookings[key[2]], heaps)
+
+        return len(self.keys) - first
+
+    # The table a booking gets, the fewest seats first (None if every table that seats it is still taken)
+    def place(self, booking: Booking, heaps: dict):
+        for idx in range(bisect.bisect_left(self.capacities, booking.size), len(self.capacities)):
+            heap = heaps[self.capacities[idx]]
+
+            if heap and heap[0][0] <= booking.start:
+                slot = heap[0][1]
+                heapq.heapreplace(heap, (booking.end, slot))
+
+                return slot
+
+        return None
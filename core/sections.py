@@ -0,0 +1,296 @@
+from qtpy.QtCore import QRectF
+
+import core.globals as g
+from core.objects import CapacityIndex, POS_Table
+
+
+# A table of a section that isn't being shown, kept as its plan row and whatever is happening at it
+# The table's server is kept as the server object, so server indexes can shift while the section is put away
+class TableRecord:
+    __slots__ = ("row", "server", "state", "numCustomers", "seatTime", "slot")
+
+    def __init__(self, row: tuple, server=None, state=0, numCustomers=0, seatTime=None, slot=None):
+        # table_id followed by the plan_tables COLUMNS (the server in here is ignored, see server)
+        self.row = tuple(row)
+        self.server = server
+        self.state = state
+        self.numCustomers = numCustomers
+        self.seatTime = seatTime
+        # The table's slot in the live floor snapshots (see POS_Table.slot)
+        self.slot = slot
+
+    # A record of a plan_tables row that was just read (table_id followed by the COLUMNS)
+    @staticmethod
+    def from_row(row):
+        server = row[5]
+
+        if 0 <= server < len(g.ALL_SERVERS):
+            return TableRecord(row, g.ALL_SERVERS[server])
+
+        return TableRecord(row)
+
+    # A record of a table that's about to be taken off the scene
+    @staticmethod
+    def from_table(tbl: POS_Table):
+        return TableRecord((tbl.table_id,) + tbl.to_row(), tbl.server, tbl.state, tbl.numCustomers, tbl.seatTime,
+                           tbl.slot)
+
+    # Same as POS_Table.to_row(), with the server's current index
+    def to_row(self) -> tuple:
+        x, y, w, h, _, title, circ, rotation, seats = self.row[1:]
+
+        try:
+            server_num = self.server.num
+        except AttributeError:
+            server_num = -1
+
+        return x, y, w, h, server_num, title, circ, rotation, seats
+
+    @property
+    def seats(self) -> int:
+        return self.row[9]
+
+    # Makes the table again, as it was when it was put away
+    def build(self) -> POS_Table:
+        table_id, x, y, w, h, _, title, circ, rotation, seats = self.row
+
+        tbl = POS_Table(QRectF(x, y, w, h), -1, title, bool(circ), rotation, seats)
+        tbl.table_id = table_id
+        tbl.slot = self.slot
+
+        if self.server is not None:
+            tbl.server = self.server
+            tbl.serverColor = self.server.color
+
+        return tbl
+
+
+# One named part of the venue (the dining room, the patio, the bar...)
+class Section:
+    def __init__(self, name: str, records=None):
+        self.name = name
+        # The section's tables while it isn't the active one (its tables are on the scene while it is)
+        self.records = records if records is not None else []
+        # The clean tables among the records by seats, made the first time a party is looked for here
+        # (None until then, and again whenever the records change)
+        self.index = None
+
+    def count(self, state: int) -> int:
+        return sum(1 for rec in self.records if rec.state == state)
+
+    def capacity(self) -> CapacityIndex:
+        if self.index is None:
+            self.index = CapacityIndex()
+
+            for rec in self.records:
+                if rec.state == 0:
+                    self.index.add(rec.server, rec.seats, rec.slot)
+
+        return self.index
+
+
+# The sections of the plan on a scene, only the active section's tables are built and put on the scene
+# The others are kept as TableRecords. Servers keep counting the parties sat in every section (their counters are
+# never touched by a switch), so the server list and the predictor always cover the whole venue.
+class SectionList:
+    def __init__(self, scene):
+        self.scene = scene
+        self.sections = [Section("Main")]
+        self.active = 0
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __getitem__(self, index: int) -> Section:
+        return self.sections[index]
+
+    def names(self) -> list:
+        return [section.name for section in self.sections]
+
+    # Replaces the scene's tables with a plan's sections, given as (name, table rows) in order
+    # The first section is built onto the scene, the rest are only kept as records
+    def load(self, groups: list):
+        self.restore([Section(name, [TableRecord.from_row(row) for row in rows]) for name, rows in groups])
+
+    # Replaces the scene's tables with these sections (their records are given new snapshot slots if they have none)
+    # and builds the active one
+    def restore(self, sections: list, active=0):
+        self.stash()
+
+        self.sections = sections or [Section("Main")]
+        self.active = active if 0 <= active < len(self.sections) else 0
+
+        registry = self.scene.tables
+        for section in self.sections:
+            for rec in section.records:
+                if rec.slot is None:
+                    rec.slot = registry.new_slot()
+                else:
+                    registry.nextSlot = max(registry.nextSlot, rec.slot)
+
+                registry.touch(rec.slot)
+
+        self.build(self.sections[self.active])
+
+    # Puts the active section's tables away and builds another section's
+    def switch(self, index: int):
+        if index == self.active or not 0 <= index < len(self.sections):
+            return
+
+        # Only which tables are built changes, none of them need snapshotting again
+        changed = set(self.scene.tables.changed)
+
+        self.sections[self.active].records = self.stash()
+        self.sections[self.active].index = None
+        self.active = index
+        self.build(self.sections[index])
+
+        self.scene.tables.changed = changed
+
+    # Takes every table off the scene, returning their records
+    def stash(self) -> list:
+        records = []
+
+        # Every clean table is about to leave, no need to take them out of the index one at a time
+        self.scene.tables.capacity = CapacityIndex()
+
+        for tbl in self.scene.tables.tables():
+            records.append(TableRecord.from_table(tbl))
+
+            self.scene.stop_seat_timer(tbl)
+            self.scene.removeItem(tbl)
+
+        return records
+
+    # Puts a section's tables on the scene, with their parties and timers as they were left
+    def build(self, section: Section):
+        for rec in section.records:
+            tbl = rec.build()
+
+            # The state is set before the table joins the scene, so the registry files it under its state straight away
+            if rec.state != 0:
+                tbl.state = rec.state
+                tbl.numCustomers = rec.numCustomers
+                tbl.seatTime = rec.seatTime
+                tbl.cycleState(False, False)
+
+            self.scene.addItem(tbl)
+
+            if rec.state == 1:
+                self.scene.start_seat_timer(tbl)
+
+        section.records = []
+        section.index = None
+
+    # Section index and record of every table put away, by snapshot slot
+    def records_by_slot(self) -> dict:
+        return {rec.slot: (index, rec) for index, section in enumerate(self.sections) if index != self.active
+                for rec in section.records}
+
+    # Records of the tables in every section but the active one
+    def records(self) -> list:
+        return [rec for index, section in enumerate(self.sections) if index != self.active
+                for rec in section.records]
+
+    # Seats and title of every table in every section, by snapshot slot
+    def seating(self) -> dict:
+        seating = {tbl.slot: (tbl.seats, tbl.title) for tbl in self.scene.tables.tables()}
+        seating.update((rec.slot, (rec.seats, rec.row[6])) for rec in self.records())
+
+        return seating
+
+    # Hands the put away tables of a server over to another (None for no server), sat parties go along with them
+    def reassign(self, old, new):
+        for section in self.sections:
+            section.index = None
+
+        for rec in self.records():
+            if rec.server is not old:
+                continue
+
+            if rec.state == 1 and old is not None and new is not None:
+                old.headActive -= rec.numCustomers
+                old.headTotal -= rec.numCustomers
+                old.total -= 1
+                old.active -= 1
+
+                new.headActive += rec.numCustomers
+                new.headTotal += rec.numCustomers
+                new.total += 1
+                new.active += 1
+
+            rec.server = new
+            self.scene.tables.touch(rec.slot)
+
+    # The best clean tables for a party, as the section they're in and their (seats, slot) entries
+    # The active section is looked at first, the others only when none of its tables seat the party
+    def find(self, party: int, server=None, limit=3):
+        best = self.scene.tables.capacity.best(party, server, limit)
+        if best:
+            return self.active, best
+
+        found = None
+        for index, section in enumerate(self.sections):
+            if index == self.active:
+                continue
+
+            fits = section.capacity().best(party, server, limit)
+            # The section with the tightest fit
+            if fits and (found is None or fits[0][0] < found[1][0][0]):
+                found = (index, fits)
+
+        return found if found is not None else (self.active, [])
+
+    # Each section's name and table rows (POS_Table.to_row() tuples), for saving the plan
+    def plan_rows(self) -> list:
+        groups = []
+
+        for index, section in enumerate(self.sections):
+            if index == self.active:
+                rows = [tbl.to_row() for tbl in self.scene.tables.tables()]
+            else:
+                rows = [rec.to_row() for rec in section.records]
+
+            groups.append((section.name, rows))
+
+        return groups
+
+    def add(self, name: str):
+        self.sections.append(Section(name))
+
+    def rename(self, index: int, name: str):
+        self.sections[index].name = name
+
+    # Only a section without tables can be removed, and never the last one
+    def remove(self, index: int) -> bool:
+        if len(self.sections) <= 1:
+            return False
+
+        if index == self.active:
+            if len(self.scene.tables) > 0:
+                return False
+
+            self.switch(index - 1 if index > 0 else 1)
+        elif self.sections[index].records:
+            return False
+
+        del self.sections[index]
+
+        if self.active > index:
+            self.active -= 1
+
+        return True
+
+    # Tab text for a section, the ones put away show how busy they are
+    def label(self, index: int) -> str:
+        section = self.sections[index]
+
+        if index == self.active:
+            return section.name
+
+        sat = section.count(1)
+        dirty = section.count(2)
+        if sat == 0 and dirty == 0:
+            return section.name
+
+        return "{} ({} sat, {} dirty)".format(section.name, sat, dirty)
@@ -0,0 +1,237 @@
+import json
+import time
+
+from qtpy.QtCore import QDateTime, QObject, QTimer
+from qtpy.QtGui import QIcon
+from qtpy.QtWidgets import QMessageBox
+
+import core.globals as g
+from core.globals import get_path
+from core.objects import POS_Server
+from core.sections import Section, TableRecord
+
+
+# Keeps a copy of the live floor (table states, seat times, party sizes, server counters, recent seatings) in the
+# database, so a crash or a reboot in the middle of service loses at most a few seconds
+# Only the tables the scene's registry marked as changed are written, the servers, recent seatings and the rest are
+# small and only written when they differ from what was written last. The writes run on the database worker.
+class FloorSnapshot(QObject):
+    # How often the floor is snapshotted (milliseconds)
+    INTERVAL = 5000
+
+    TABLE_COLUMNS = "slot, section, table_id, x, y, w, h, server, title, circ, rotation, seats, state, party, seat_wall"
+
+    def __init__(self, scene, parent=None):
+        super(FloorSnapshot, self).__init__(parent)
+        self.scene = scene
+
+        # What was last written of the servers, recent seatings and meta (None until something was written)
+        self.servers = None
+        self.recents = None
+        self.meta = None
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.INTERVAL)
+        self.timer.timeout.connect(self.take)
+
+    def start(self):
+        self.timer.start()
+
+    # Seconds to add to a time.monotonic() time to get the wall clock time
+    @staticmethod
+    def offset() -> float:
+        return time.time() - time.monotonic()
+
+    # Writes whatever changed since the last snapshot, returns the DBFuture of the write (None if nothing changed)
+    def take(self):
+        # A preview has swapped the servers out, the main scene's floor is put back once it's closed
+        if g.VIEW.scene() is not self.scene:
+            return None
+
+        registry = self.scene.tables
+        sections = self.scene.sections
+        offset = self.offset()
+
+        tables = []
+        deleted = []
+        records = None
+
+        for slot in registry.changed:
+            tbl = registry.bySlot.get(slot)
+
+            if tbl is not None:
+                tables.append(self.table_row(slot, sections.active, tbl.table_id, tbl.to_row(), tbl.state,
+                                             tbl.numCustomers, tbl.seatTime, offset))
+                continue
+
+            # The table isn't on the scene, it may have been put away with its section
+            if records is None:
+                records = sections.records_by_slot()
+
+            if slot in records:
+                index, rec = records[slot]
+                tables.append(self.table_row(slot, index, rec.row[0], rec.to_row(), rec.state, rec.numCustomers,
+                                             rec.seatTime, offset))
+            else:
+                deleted.append((slot,))
+
+        registry.changed = set()
+
+        servers = [(s.num, s.name, s.headActive, s.headTotal, s.active, s.total) for s in g.ALL_SERVERS]
+        servers = None if servers == self.servers else servers
+        recents = None if g.RECENTS == self.recents else list(g.RECENTS)
+        meta = {"count_mode": g.COUNT_MODE, "sections": json.dumps(sections.names()), "active": sections.active}
+        meta = None if meta == self.meta else meta
+
+        if not tables and not deleted and servers is None and recents is None and meta is None:
+            return None
+
+        if servers is not None:
+            self.servers = servers
+        if recents is not None:
+            self.recents = recents
+            # Heap entries are (expiry, seat time, num, rate), only the seat time needs to be stored
+            recents = [(seat_time + offset, num, rate) for _, seat_time, num, rate in recents]
+        if meta is not None:
+            self.meta = meta
+
+        future = g.WORKER.submit(self.write, tables, deleted, servers, recents, dict(meta or {}, saved=time.time()))
+        future.failed.connect(lambda error: print("couldn't snapshot the floor: " + error))
+
+        return future
+
+    @staticmethod
+    def table_row(slot, section, table_id, row, state, party, seat_time, offset) -> tuple:
+        return (slot, section, table_id) + tuple(row) + (state, party,
+                                                         None if seat_time is None else seat_time + offset)
+
+    # Runs on the database worker
+    @classmethod
+    def write(cls, db, tables: list, deleted: list, servers, recents, meta: dict):
+        with db.transaction():
+            if deleted:
+                db.executemany("DELETE FROM snapshot_tables WHERE slot = ?", deleted)
+            if tables:
+                db.executemany("INSERT OR REPLACE INTO snapshot_tables (" + cls.TABLE_COLUMNS + ") "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tables)
+
+            if servers is not None:
+                db.execute("DELETE FROM snapshot_servers")
+                db.executemany("INSERT INTO snapshot_servers (num, name, head_active, head_total, active, total) "
+                               "VALUES (?, ?, ?, ?, ?, ?)", servers)
+            if recents is not None:
+                db.execute("DELETE FROM snapshot_recents")
+                db.executemany("INSERT INTO snapshot_recents (seat_wall, num, rate) VALUES (?, ?, ?)", recents)
+
+            db.executemany("INSERT OR REPLACE INTO snapshot_meta (key, value) VALUES (?, ?)", list(meta.items()))
+
+    # Reads the last snapshot, None if there isn't one
+    @classmethod
+    def read(cls, db):
+        meta = {key: value for key, value in db.fetchall("SELECT key, value FROM snapshot_meta")}
+
+        if "saved" not in meta:
+            return None
+
+        return {
+            "meta":    meta,
+            "servers": db.fetchall("SELECT num, name, head_active, head_total, active, total FROM snapshot_servers "
+                                   "ORDER BY num"),
+            "tables":  db.fetchall("SELECT " + cls.TABLE_COLUMNS + " FROM snapshot_tables ORDER BY section, slot"),
+            "recents": db.fetchall("SELECT seat_wall, num, rate FROM snapshot_recents"),
+        }
+
+    # Whether a snapshot has any service in it (a table that isn't clean, or something counted for a server)
+    @staticmethod
+    def has_service(snap) -> bool:
+        if snap is None:
+            return False
+
+        return (any(row["state"] != 0 for row in snap["tables"]) or
+                any(row["head_total"] or row["total"] for row in snap["servers"]) or
+                len(snap["recents"]) > 0)
+
+    # Forgets the last snapshot, the floor is snapshotted from scratch
+    def discard(self, db):
+        with db.transaction():
+            for table in ("snapshot_tables", "snapshot_servers", "snapshot_recents", "snapshot_meta"):
+                db.execute("DELETE FROM " + table)
+
+        self.servers = self.recents = self.meta = None
+
+    # Puts the floor back the way the snapshot had it
+    # Only the active section's tables are built, so this takes about as long as loading that section
+    def restore(self, snap):
+        offset = self.offset()
+        meta = snap["meta"]
+        pred = g.SERVER_LIST.widget().pred
+
+        g.COUNT_MODE = meta.get("count_mode", "heads")
+        if g.COUNT_MODE == "tables":
+            g.WINDOW.toolbar.act_swapMode.setIcon(QIcon(get_path("shape_square.png")))
+
+        g.ALL_SERVERS.clear()
+        for row in snap["servers"]:
+            server = POS_Server(row["name"])
+            server.headActive = row["head_active"]
+            server.headTotal = row["head_total"]
+            server.active = row["active"]
+            server.total = row["total"]
+
+        sections = [Section(name) for name in json.loads(meta.get("sections", "[]"))]
+        for row in snap["tables"]:
+            while row["section"] >= len(sections):
+                sections.append(Section("Main" if not sections else "Section " + str(len(sections) + 1)))
+
+            server = row["server"]
+            seat_wall = row["seat_wall"]
+            sections[row["section"]].records.append(
+                TableRecord(tuple(row)[2:12], g.ALL_SERVERS[server] if 0 <= server < len(g.ALL_SERVERS) else None,
+                            row["state"], row["party"], None if seat_wall is None else seat_wall - offset,
+                            row["slot"]))
+
+        self.scene.sections.restore(sections, int(meta.get("active", 0)))
+
+        # The database already holds all of this
+        self.scene.tables.changed = set()
+
+        # Recent seatings go back in with their seat times on this boot's monotonic clock
+        pred.overflow.clear()
+        for row in snap["recents"]:
+            pred.overflow.add(row["num"], row["seat_wall"] - offset, row["rate"])
+
+        self.servers = [(s.num, s.name, s.headActive, s.headTotal, s.active, s.total) for s in g.ALL_SERVERS]
+        self.recents = list(g.RECENTS)
+        self.meta = {"count_mode": g.COUNT_MODE, "sections": json.dumps(self.scene.sections.names()),
+                     "active": self.scene.sections.active}
+
+        g.SERVER_LIST.widget().servList.populate_servers()
+        pred.calculate_choice()
+        pred.calculate_overflow()
+        g.RES_LIST.widget().resList.replan()
+
+        g.VIEW.update_scene_rect()
+        g.VIEW.sectionBar.refresh()
+        self.scene.recenter()
+
+    # Asks whether to carry on with the service the last snapshot has, restoring it if so
+    # A snapshot without any service in it (or one that's turned down) is discarded
+    def offer_restore(self):
+        snap = self.read(g.DB)
+
+        if self.has_service(snap):
+            saved = QDateTime.fromMSecsSinceEpoch(int(float(snap["meta"]["saved"]) * 1000))
+            ok = QMessageBox.question(g.WINDOW, "Restore Service",
+                                      "The floor was still in service when Hosty closed (last saved " +
+                                      saved.toString("ddd h:mm AP") + ").\n"
+                                      "Do you wish to restore the tables, servers and recent seatings?",
+                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+
+            if ok == QMessageBox.Yes:
+                self.restore(snap)
+                return True
+
+        if snap is not None:
+            self.discard(g.DB)
+
+        return False
@@ -0,0 +1,72 @@
+from qtpy.QtCore import QObject, QTimer, Signal
+
+import core.globals as g
+
+
+# Buffers inline reservation edits and writes them in one transaction once editing goes quiet
+# Several edits to the same reservation are combined into a single UPDATE, later values replacing earlier ones
+class ReservationWriter(QObject):
+    # Emitted with the res_id and the error when a reservation's edits couldn't be written
+    failed = Signal(object, str)
+
+    # How long to wait after the last edit before writing (milliseconds)
+    DELAY = 750
+
+    # SQL assignment for each column that can be edited
+    ASSIGNMENTS = {
+        "time":  "time = time(?)",
+        "size":  "size = ?",
+        "name":  "name = ?",
+        "phone": "phone = ?",
+        "note":  "note = ?",
+        "state": "state = ?",
+    }
+
+    def __init__(self, parent=None):
+        super(ReservationWriter, self).__init__(parent)
+        # (key is the res_id, value is a dict of column -> new value)
+        self.pending = {}
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DELAY)
+        self.timer.timeout.connect(self.flush)
+
+    def __len__(self):
+        return len(self.pending)
+
+    # Queues a new value for one of a reservation's columns and restarts the wait
+    def queue(self, res_id, column: str, value):
+        self.pending.setdefault(res_id, {})[column] = value
+        self.timer.start()
+
+    # Hands every queued edit to the database worker now, to be written as one transaction
+    # Anything read through the worker after this sees the edits
+    def flush(self):
+        self.timer.stop()
+
+        if not self.pending:
+            return None
+
+        batch = self.pending
+        self.pending = {}
+
+        # The transaction was rolled back, none of the batch was written
+        def on_failed(error):
+            for res_id in batch:
+                self.failed.emit(res_id, error)
+
+        future = g.WORKER.submit(self.write, batch)
+        future.failed.connect(on_failed)
+
+        return future
+
+    # Runs on the database worker
+    @classmethod
+    def write(cls, db, batch: dict):
+        with db.transaction():
+            for res_id, changes in batch.items():
+                columns = sorted(changes)
+                db.execute("UPDATE reservations SET " + ", ".join(cls.ASSIGNMENTS[c] for c in columns) +
+                           " WHERE res_id = ?",
+                           [changes[c] for c in columns] + [res_id])
@@ -0,0 +1,171 @@
+from qtpy.QtCore import QDate, QDateTime, QTime, Qt
+from qtpy.QtGui import QIcon, QStandardItem, QStandardItemModel
+from qtpy.QtWidgets import *
+
+import core.analytics as analytics
+import core.globals as g
+from core.globals import get_path
+
+
+class Analytics_Dock(QDockWidget):
+    def __init__(self, parent=None):
+        super(Analytics_Dock, self).__init__("Analytics", parent)
+
+        self.setWidget(AnalyticsWidget(self))
+        self.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea)
+        self.setFeatures(QDockWidget.DockWidgetMovable | QDockWidget.DockWidgetFloatable)
+
+
+class AnalyticsWidget(QWidget):
+    def __init__(self, parent=None):
+        super(AnalyticsWidget, self).__init__(parent)
+        self.setSizePolicy(QSizePolicy(QSizePolicy.Minimum, QSizePolicy.Preferred))
+
+        # DBFuture of the analysis that's running (only the latest requested one is shown)
+        self.pending = None
+
+        layout = QGridLayout(self)
+
+        layout.setSpacing(g.DOCK_SPACING)
+        layout.setContentsMargins(g.DOCK_MARGIN)
+
+        self.fromDateEdit = QDateEdit(self)
+        self.fromDateEdit.setCalendarPopup(True)
+        self.fromDateEdit.setDisplayFormat("MMM / dd / yyyy")
+        self.fromDateEdit.setAlignment(Qt.AlignCenter)
+        self.fromDateEdit.setDate(QDate.currentDate().addDays(-30))
+        self.fromDateEdit.setToolTip("Sets the first day to analyze")
+        self.fromDateEdit.setStatusTip("Sets the first day to analyze")
+
+        self.toDateEdit = QDateEdit(self)
+        self.toDateEdit.setCalendarPopup(True)
+        self.toDateEdit.setDisplayFormat("MMM / dd / yyyy")
+        self.toDateEdit.setAlignment(Qt.AlignCenter)
+        self.toDateEdit.setDate(QDate.currentDate())
+        self.toDateEdit.setToolTip("Sets the last day to analyze")
+        self.toDateEdit.setStatusTip("Sets the last day to analyze")
+
+        self.refreshButton = QToolButton(self)
+        self.refreshButton.setIcon(QIcon(get_path("arrow_refresh.png")))
+        self.refreshButton.clicked.connect(self.refresh)
+        self.refreshButton.setToolTip("Analyzes the service between the two days")
+        self.refreshButton.setStatusTip("Analyzes the service between the two days")
+
+        layout.addWidget(self.fromDateEdit, 0, 0)
+        layout.addWidget(self.toDateEdit, 0, 1)
+        layout.addWidget(self.refreshButton, 0, 2)
+
+        self.partyTable = StatsTable(["Party", "Turns", "Mean", "Median"], self)
+        self.tableTable = StatsTable(["Table", "Turns", "Mean", "Median", "Used"], self)
+        self.coversTable = StatsTable(["Time", "Covers"], self)
+        self.serverTable = StatsTable(["Server", "Covers", "Tables"], self)
+
+        tabs = QTabWidget(self)
+        tabs.addTab(self.partyTable, "Parties")
+        tabs.addTab(self.tableTable, "Tables")
+        tabs.addTab(self.coversTable, "Covers")
+        tabs.addTab(self.serverTable, "Servers")
+        layout.addWidget(tabs, 1, 0, 1, 3)
+
+        self.statusLabel = QLabel(self)
+        layout.addWidget(self.statusLabel, 2, 0, 1, 3)
+
+        if not analytics.available():
+            self.refreshButton.setEnabled(False)
+            self.statusLabel.setText("Install numpy to see analytics")
+
+        self.setLayout(layout)
+
+    # Analyzes the events between the two dates on the database worker, the tabs are filled in once it's done
+    def refresh(self):
+        if not analytics.available():
+            return None
+
+        if self.pending is not None:
+            self.pending.cancel()
+
+        first = self.fromDateEdit.date()
+        last = self.toDateEdit.date()
+        if last < first:
+            first, last = last, first
+
+        start = QDateTime(first, QTime(0, 0)).toSecsSinceEpoch()
+        end = QDateTime(last.addDays(1), QTime(0, 0)).toSecsSinceEpoch()
+
+        # Events still in the buffer are written before the analysis reads them (the worker runs jobs in order)
+        g.EVENTS.flush()
+
+        def on_analyzed(stats):
+            self.pending = None
+            self.show_stats(stats)
+
+        def on_failed(error):
+            self.pending = None
+            self.statusLabel.setText("Couldn't analyze the service")
+            print("couldn't analyze the service: " + error)
+
+        self.statusLabel.setText("Analyzing...")
+        self.pending = g.WORKER.submit(analytics.analyze, start, end)
+        self.pending.finished.connect(on_analyzed)
+        self.pending.failed.connect(on_failed)
+
+        return self.pending
+
+    def show_stats(self, stats: dict):
+        self.partyTable.fill([(str(party), int(stats["party_turns"][party]), minutes(stats["party_mean"][party]),
+                               minutes(stats["party_median"][party]))
+                              for party in range(len(stats["party_turns"])) if stats["party_turns"][party]])
+
+        self.tableTable.fill(sorted((title, int(stats["table_turns"][i]), minutes(stats["table_mean"][i]),
+                                     minutes(stats["table_median"][i]),
+                                     "{:.0%}".format(stats["utilization"][i]))
+                                    for i, title in enumerate(stats["tables"]) if stats["table_turns"][i]))
+
+        # Only the parts of the day anyone was sat in
+        self.coversTable.fill([(QTime(0, 0).addSecs(bucket * analytics.BUCKET).toString("h:mm AP"),
+                                int(stats["covers"][bucket]))
+                               for bucket in range(analytics.BUCKETS) if stats["covers"][bucket]])
+
+        self.serverTable.fill([(name, int(stats["server_covers"][i]), int(stats["server_tables"][i]))
+                               for i, name in enumerate(stats["servers"]) if name != ""])
+
+        self.statusLabel.setText("{} events over {} days ({:.0f} ms to load, {:.0f} ms to analyze)".format(
+            stats["events"], stats["days"], stats["load_time"] * 1000, stats["aggregate_time"] * 1000))
+
+
+# Turn time in seconds as minutes
+def minutes(seconds) -> str:
+    return "{:.1f} m".format(seconds / 60)
+
+
+class StatsTable(QTableView):
+    def __init__(self, labels: list, parent=None):
+        super(StatsTable, self).__init__(parent)
+
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+
+        model = QStandardItemModel(0, len(labels))
+        model.setHorizontalHeaderLabels(labels)
+        self.setModel(model)
+
+        hHead = QHeaderView(Qt.Horizontal)
+        hHead.setSectionResizeMode(QHeaderView.Stretch)
+        self.setHorizontalHeader(hHead)
+        vHead = QHeaderView(Qt.Vertical)
+        vHead.setVisible(False)
+        vHead.setDefaultSectionSize(20)
+        self.setVerticalHeader(vHead)
+
+    # Replaces the rows, each row is a tuple of values for the columns
+    def fill(self, rows: list):
+        model = self.model()
+        model.setRowCount(0)
+
+        for row in rows:
+            items = []
+            for value in row:
+                item = QStandardItem(str(value))
+                item.setTextAlignment(Qt.AlignCenter)
+                items.append(item)
+            model.appendRow(items)
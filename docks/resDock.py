@@ -1,14 +1,17 @@
-import sqlite3 as sql
-import time
-
-from qtpy.QtCore import QSize, Qt, QDate, QTime, QModelIndex, QAbstractItemModel
-from qtpy.QtGui import QBrush, QCursor, QIcon, QStandardItemModel, QStandardItem
+from qtpy.QtCore import QSize, Qt, QDate, QTime, QTimer, QModelIndex, QAbstractItemModel, QAbstractTableModel
+from qtpy.QtGui import QBrush, QColor, QCursor, QFont, QIcon
 from qtpy.QtWidgets import *
 
 import core.globals as g
+import core.ressearch as ressearch
 # import core.objects
 from core.dialogs import ReservationDialog
-from core.globals import get_path, create_connection
+from core.events import EventLog
+from core.globals import get_path
+from core.profiler import profiled
+from core.rescache import ReservationCache, CoverCounts
+from core.scheduler import TableScheduler, make_bookings
+from core.writer import ReservationWriter
 
 
 class ResList_Dock(QDockWidget):
@@ -21,18 +24,21 @@ class ResList_Dock(QDockWidget):
 
 
 class ResWidget(QWidget):
+    # How long typing has to pause before searching (milliseconds)
+    SEARCH_DELAY = 150
+
     def __init__(self, parent=None):
         super(ResWidget, self).__init__(parent)
         self.setSizePolicy(QSizePolicy(QSizePolicy.Minimum, QSizePolicy.Preferred))
 
         toolbar = self.create_toolbar()
 
+        # Inline edits to reservations are queued here and written together
+        self.writer = ReservationWriter(self)
+
         self.resList = ResList(self)
 
-        self.calendar = QCalendarWidget(self)
-        self.calendar.setHorizontalHeaderFormat(QCalendarWidget.SingleLetterDayNames)
-        self.calendar.setVerticalHeaderFormat(QCalendarWidget.NoVerticalHeader)
-        self.calendar.setGridVisible(True)
+        self.calendar = ResCalendar(self.writer, self)
 
         def on_changed_date(date):
             self.resList.populate_reservations(date)
@@ -61,13 +67,44 @@ class ResWidget(QWidget):
         dateLayout.addWidget(self.resDateEdit)
         dateLayout.addWidget(self.showTodayButton)
 
+        # Matches of every date are listed in place of the date's reservations while there's a search
+        self.searchList = SearchList(self)
+        self.searchList.activated.connect(self.show_result)
+        self.searchList.setVisible(False)
+
+        # The search runs once typing pauses, a search that's typed over is canceled
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(self.SEARCH_DELAY)
+        self.searchTimer.timeout.connect(self.search)
+
+        def on_changed_search(text):
+            # Clearing the box goes straight back to the date's reservations
+            if text.strip() == "":
+                self.search()
+            else:
+                self.searchTimer.start()
+
+        self.searchBox = QLineEdit(self)
+        self.searchBox.setClearButtonEnabled(True)
+        self.searchBox.setPlaceholderText("Search names, phone numbers and notes")
+        self.searchBox.textChanged.connect(on_changed_search)
+        self.searchBox.setToolTip("Finds reservations on any date")
+        self.searchBox.setStatusTip("Finds reservations on any date")
+
+        if not ressearch.available(g.DB):
+            self.searchBox.setEnabled(False)
+            self.searchBox.setPlaceholderText("Searching needs SQLite with FTS5")
+
         layout = QGridLayout(self)
         layout.setSpacing(g.DOCK_SPACING)
         layout.setContentsMargins(g.DOCK_MARGIN)
 
         layout.addWidget(toolbar, 0, 0)
-        layout.addLayout(dateLayout, 1, 0)
-        layout.addWidget(self.resList, 2, 0)
+        layout.addWidget(self.searchBox, 1, 0)
+        layout.addLayout(dateLayout, 2, 0)
+        layout.addWidget(self.resList, 3, 0)
+        layout.addWidget(self.searchList, 3, 0)
 
     def create_toolbar(self):
         def toolbar_clickArriveRes():
@@ -127,6 +164,98 @@ class ResWidget(QWidget):
         self.resDateEdit.setDate(date)
         self.resList.populate_reservations(date)
 
+    # Lists the reservations matching the search box, or the date's reservations again once it's empty
+    def search(self):
+        self.searchTimer.stop()
+        text = self.searchBox.text()
+
+        if text.strip() == "":
+            self.searchList.model().set_query(None)
+            self.searchList.setVisible(False)
+            self.resList.setVisible(True)
+            return
+
+        # Queued edits have to be in the database before it's searched
+        self.writer.flush()
+
+        self.searchList.model().set_query(ressearch.match_query(text))
+        self.resList.setVisible(False)
+        self.searchList.setVisible(True)
+
+    # A search result was picked, show its date's reservations
+    def show_result(self, model_index):
+        date = QDate.fromString(self.searchList.model().rows[model_index.row()][SearchModel.DATE], Qt.ISODate)
+
+        self.searchBox.clear()
+        self.update_date(date)
+
+
+# Calendar that colors each day by how many covers are booked on it (a heat map of busy nights)
+class ResCalendar(QCalendarWidget):
+    # Color of the busiest day, quieter days are drawn more transparent
+    HEAT_COLOR = QColor(255, 90, 0)
+
+    def __init__(self, writer, parent=None):
+        super(ResCalendar, self).__init__(parent)
+        self.writer = writer
+        self.setHorizontalHeaderFormat(QCalendarWidget.SingleLetterDayNames)
+        self.setVerticalHeaderFormat(QCalendarWidget.NoVerticalHeader)
+        self.setGridVisible(True)
+
+        self.counts = CoverCounts()
+        self.countFont = QFont(g.FONT)
+        self.countFont.setPointSize(7)
+
+        self.currentPageChanged.connect(self.load_page)
+        self.load_page(self.yearShown(), self.monthShown())
+
+    # Loads the counts for a page of the calendar (which also shows the end and start of its neighbouring months)
+    # The months are read on the database worker, the cells are painted again as each one arrives
+    def load_page(self, year, month):
+        shown = QDate(year, month, 1)
+        months = [shown.addMonths(offset).toString("yyyy-MM") for offset in (-1, 0, 1)]
+
+        # Queued edits have to be in the database before it's read
+        if any(m not in self.counts.months for m in months):
+            self.writer.flush()
+
+        for m in months:
+            future = self.counts.load(m)
+            if future is not None:
+                future.finished.connect(self.updateCells)
+
+        self.updateCells()
+
+    # A reservation was added, edited or canceled (count and covers are the change to the day's totals)
+    def adjust(self, date: str, count: int, covers: int):
+        self.counts.adjust(date, count, covers)
+        self.updateCells()
+
+    # The reservations were changed outside of the app's own dialogs, re-read them
+    def reload(self):
+        self.counts.clear()
+        self.load_page(self.yearShown(), self.monthShown())
+
+    def paintCell(self, painter, rect, date):
+        super(ResCalendar, self).paintCell(painter, rect, date)
+
+        count, covers = self.counts.get(date.toString(Qt.ISODate))
+        if count == 0:
+            return
+
+        # Scale the color by the busiest day of the month being shown
+        busiest = max(self.counts.busiest(QDate(self.yearShown(), self.monthShown(), 1).toString("yyyy-MM")), 1)
+        heat = QColor(self.HEAT_COLOR)
+        heat.setAlpha(int(40 + 140 * min(covers / busiest, 1.0)))
+
+        painter.save()
+        painter.fillRect(rect.adjusted(1, 1, -1, -1), heat)
+
+        # Covers / reservations in the cell's corner
+        painter.setFont(self.countFont)
+        painter.drawText(rect.adjusted(1, 0, -2, 0), Qt.AlignRight | Qt.AlignBottom, "{}/{}".format(covers, count))
+        painter.restore()
+
 
 # Formats a string a numbers into a phone number with dashes
 def formatPhone(ph):
@@ -152,6 +281,152 @@ def formatTime(t):
         return t.toString(formatString)
 
 
+# The reservations of one date, all read from the month cache at once
+# Rows are kept as the raw database values and only formatted for display when the view asks for them
+# The last column shows the table each reservation is planned to get (see ResList.replan)
+class ResModel(QAbstractTableModel):
+    HEADERS = ["Time", "Size", "Name", "Phone", "Notes", "Table"]
+    # Column of the planned table, it's worked out and can't be edited
+    TABLE_COLUMN = 5
+    # Position of each field in a row
+    RES_ID, TIME, SIZE, NAME, PHONE, NOTE, STATE = range(7)
+    # Which row field each column shows and edits
+    COLUMN_FIELDS = [TIME, SIZE, NAME, PHONE, NOTE]
+
+    def __init__(self, parent=None):
+        super(ResModel, self).__init__(parent)
+        self.date = None
+        # The rows shown (deleted rows are taken out of these, not out of the source)
+        self.rows = []
+        # Every row of the date, in time order, as the month cache holds them
+        self.source = []
+        # Which table each of the date's reservations gets
+        self.schedule = TableScheduler()
+        # Title of each table the schedule can hand out (key is the table's slot)
+        self.titles = {}
+
+    # Shows the reservations of another date
+    def set_date(self, date: QDate, rows: list):
+        self.beginResetModel()
+        self.date = date.toString(Qt.ISODate)
+        self.rows = list(rows)
+        self.source = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+
+        return None
+
+    def flags(self, index):
+        if index.column() == self.TABLE_COLUMN:
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        res = self.rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            if column == 0:
+                # Convert the time string -> QTime -> string in desired format
+                return formatTime(QTime.fromString(res[self.TIME], Qt.ISODate))
+            elif column == 1:
+                return str(res[self.SIZE])
+            elif column == 3:
+                return formatPhone(res[self.PHONE])
+            elif column == self.TABLE_COLUMN:
+                return self.table_title(res)
+
+            return res[self.COLUMN_FIELDS[column]]
+
+        # The 1st column's UserRole is the database's res_id, the 2nd column's is the reservation's state
+        elif role == Qt.UserRole:
+            if column == 0:
+                return res[self.RES_ID]
+            elif column == 1:
+                return res[self.STATE]
+
+        elif role == Qt.ToolTipRole and column == self.TABLE_COLUMN:
+            if res[self.STATE] != 2 and self.schedule.table_of(res[self.RES_ID]) is None:
+                return "Every table that seats the party is still taken by then"
+
+        # Arrived and canceled reservations are colored
+        elif role == Qt.BackgroundRole:
+            if res[self.STATE] == 1:
+                return QBrush(g.COLORS["reservation_arrive"], Qt.SolidPattern)
+            elif res[self.STATE] == 2:
+                return QBrush(g.COLORS["reservation_cancel"], Qt.SolidPattern)
+
+        return None
+
+    # Stores a new raw value for a cell (a QTime for the time, digits only for the phone number),
+    # or a new state through the 2nd column's UserRole
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid():
+            return False
+
+        res = self.rows[index.row()]
+
+        if role == Qt.UserRole and index.column() == 1:
+            res[self.STATE] = value
+            # The state changes the background of the whole row
+            self.dataChanged.emit(self.index(index.row(), 0), self.index(index.row(), self.columnCount() - 1))
+
+            return True
+
+        if role != Qt.EditRole:
+            return False
+
+        if index.column() == 0 and type(value) is QTime:
+            value = value.toString(Qt.ISODate)
+
+        res[self.COLUMN_FIELDS[index.column()]] = value
+        self.dataChanged.emit(index, index)
+
+        return True
+
+    # Title of the table a reservation is planned to get ("-" if none is free, nothing for canceled ones)
+    def table_title(self, res) -> str:
+        if res[self.STATE] == 2:
+            return ""
+
+        slot = self.schedule.table_of(res[self.RES_ID])
+        if slot is None:
+            return "-"
+
+        return self.titles.get(slot, "")
+
+    # The schedule was planned again, show the tables it picked
+    def planned(self):
+        if self.rows:
+            self.dataChanged.emit(self.index(0, self.TABLE_COLUMN), self.index(len(self.rows) - 1, self.TABLE_COLUMN))
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self.rows[row:row + count]
+        self.endRemoveRows()
+
+        return True
+
+
 class ResList(QTableView):
     def __init__(self, parent=None):
         super(ResList, self).__init__(parent)
@@ -164,10 +439,27 @@ class ResList(QTableView):
         self.setAlternatingRowColors(True)
 
         # Create item model
-        model = QStandardItemModel(0, 5)
-        # Set the column headers
-        model.setHorizontalHeaderLabels(["Time", "Size", "Name", "Phone", "Notes"])
-        self.setModel(model)
+        self.setModel(ResModel(self))
+
+        # Reservations of recently viewed months
+        self.cache = ReservationCache()
+        # Whether the model holds every reservation of its date (it's empty while the month is being read)
+        self.loaded = False
+        # The rows the schedule was last planned from (edits made through the model plan it again straight away)
+        self.plannedRows = None
+
+        # Times, sizes and states decide the tables, so changing one plans the date's tables again
+        def on_changed_data(topLeft, bottomRight):
+            if topLeft.column() <= 1:
+                self.replan()
+
+        self.model().dataChanged.connect(on_changed_data)
+
+        # Edits are shown straight away, if writing them fails the list is re-read to show what was saved
+        def on_failed_write(res_id, error):
+            self.reload("Couldn't save changes to a reservation: " + error)
+
+        self.parent().writer.failed.connect(on_failed_write)
 
         # Setup header attributes (remove vertical header)
         hHead = QHeaderView(Qt.Horizontal)
@@ -185,69 +477,76 @@ class ResList(QTableView):
 
         self.pressed.connect(self.on_clicked_cell)
 
+    # A write failed, show why and read everything again so the list and calendar match the database
+    def reload(self, message: str):
+        g.WINDOW.statusBar().showMessage(message, 10000)
+        self.cache.clear()
+        self.parent().calendar.reload()
+        self.populate_reservations(self.parent().resDateEdit.date())
+
     # Populate the reservation list with reservations for a date
+    @profiled("dock.reservations")
     def populate_reservations(self, date=QDate.currentDate()):
-        # Remove the current rows
-        if self.model().rowCount() > 0:
-            self.model().removeRows(0, self.model().rowCount())
-
-        # Query reservations table for the reservations on this date
-        con = create_connection()
-        con.row_factory = sql.Row
-        cur = con.cursor()
-        resData = cur.execute("SELECT * FROM reservations WHERE date = date('" + date.toString(Qt.ISODate) + "')") \
-            .fetchall()
-        con.close()
-
-        # Sort the table by time
-        def sort_by_time(d):
-            # Parse the time string into a time object for sorting
-            return time.strptime(d["time"], "%H:%M:%S")
-
-        resData.sort(key=sort_by_time)
-
-        # Iterate through the sorted table
-        for res in resData:
-            # Assemble the row and append it to the model
-            self.model().appendRow(self.new_reservation(res))
-
-            # If the reservation is arrived or canceled
-            if res["state"] == 1:
-                col = QBrush(g.COLORS["reservation_arrive"], Qt.SolidPattern)
-            elif res["state"] == 2:
-                col = QBrush(g.COLORS["reservation_cancel"], Qt.SolidPattern)
-            else:
-                # No need to color this row so move on
-                continue
+        iso = date.toString(Qt.ISODate)
+
+        # The date's reservations come from the month cache, which reads the whole month the first time
+        rows = self.cache.day(iso)
+
+        # The month is read on the database worker, the list is empty until it arrives
+        if rows is None:
+            # Queued edits have to be in the database before it's read
+            self.parent().writer.flush()
+
+            def on_loaded(days):
+                # Only fill the list if this date is still the one being shown
+                if self.model().date == iso:
+                    self.populate_reservations(date)
+
+            self.cache.load(iso[:7]).finished.connect(on_loaded)
+            rows = []
+            self.loaded = False
+        else:
+            self.loaded = True
+
+        self.model().set_date(date, rows)
 
-            # Iterate through columns
-            for column in range(self.model().columnCount()):
-                # Set background to the arrival or cancel color
-                self.model().setData(self.model().index(self.model().rowCount() - 1, column), col, Qt.BackgroundRole)
+        # Adding or editing a reservation in the dialog reads its month again and ends up here, the schedule only
+        # plans the tables again from the first reservation that changed
+        if self.loaded and rows is not self.plannedRows:
+            self.replan()
 
-        # All data is populated, now we can resize columns
+        # The list is populated, now we can resize columns
         self.resizeColumnToContents(0)
         self.resizeColumnToContents(1)
         self.resizeColumnToContents(2)
         self.resizeColumnToContents(3)
 
-    # Create a list of standard items to be inserted into the model (for each row)
-    @staticmethod
-    def new_reservation(res: sql.Row) -> list:
-        # Convert the time string -> QTime -> string in desired format
-        c1 = QStandardItem(formatTime(QTime.fromString(res["time"], Qt.ISODate)))
-        # Set the 1st column's UserRole to the database's res_id
-        c1.setData(res["res_id"], Qt.UserRole)
+    # Plans which table each of the shown date's reservations gets, canceled reservations don't get one
+    # Parties are expected to stay as long as the kitchen model says (see scheduler.expected_turn), and a date's
+    # reservations before opening time are after midnight when the restaurant closes after it
+    @profiled("dock.schedule")
+    def replan(self):
+        # The date's reservations are still being read
+        if not self.loaded:
+            return
+
+        model = self.model()
 
-        c2 = QStandardItem(str(res["size"]))
-        # Set the 2nd column's UserRole to the reservation's state
-        c2.setData(res["state"], Qt.UserRole)
+        opens = 0
+        minTime = g.SETTINGS.value("settings/minResTime")
+        if minTime > g.SETTINGS.value("settings/maxResTime"):
+            opens = minTime.hour() * 60 + minTime.minute()
 
-        return [c1,
-                c2,
-                QStandardItem(res["name"]),
-                QStandardItem(formatPhone(res["phone"])),
-                QStandardItem(res["note"])]
+        bookings = make_bookings(((res[ResModel.RES_ID], res[ResModel.TIME], int(res[ResModel.SIZE]))
+                                  for res in model.source if res[ResModel.STATE] != 2),
+                                 g.SERVER_LIST.widget().pred.kitchen_model(), opens)
+
+        seating = g.SCENE.sections.seating()
+        model.titles = {slot: title for slot, (seats, title) in seating.items()}
+
+        model.schedule.sync(model.date, bookings, {slot: seats for slot, (seats, title) in seating.items()})
+        self.plannedRows = model.source
+        model.planned()
 
     def on_clicked_cell(self, model_index):
         # Make sure right mouse button was pressed
@@ -285,30 +584,26 @@ class ResList(QTableView):
     # model_index is the QModelIndex that represents a cell in the model
     # state is the state the reservation should be set to
     def set_reservation_state(self, model_index, state):
-        # Get the reservation's database ID
+        # Get the reservation's database ID, previous state and size
         res_id = self.model().index(model_index.row(), 0).data(Qt.UserRole)
+        prev_state = self.model().index(model_index.row(), 1).data(Qt.UserRole)
+        size = self.model().rows[model_index.row()][ResModel.SIZE]
 
-        # Update the database with the new state (not arrived)
-        con = create_connection()
-        cur = con.cursor()
-        cur.execute("UPDATE reservations SET state = ? WHERE res_id = ?",
-                    (state, res_id))
-        con.commit()
-        con.close()
+        # Queue the new state to be written to the database
+        self.parent().writer.queue(res_id, "state", state)
 
-        # Update the row's state data
+        # Update the row's state data (the model colors the row's background by its state)
         self.model().setData(self.model().index(model_index.row(), 1), state, Qt.UserRole)
 
-        # Depending on the state, choose a color for the background of the row
-        col = QBrush()
-        if state == 1:
-            col = QBrush(g.COLORS["reservation_arrive"], Qt.SolidPattern)
-        elif state == 2:
-            col = QBrush(g.COLORS["reservation_cancel"], Qt.SolidPattern)
+        # The party showed up
+        if prev_state != 1 and state == 1:
+            g.EVENTS.log(EventLog.ARRIVE, party=size, detail=str(res_id))
 
-        # Set the background role of the model
-        for column in range(self.model().columnCount()):
-            self.model().setData(self.model().index(model_index.row(), column), col, Qt.BackgroundRole)
+        # Canceled reservations don't count towards the calendar's covers
+        if prev_state != 2 and state == 2:
+            self.parent().calendar.adjust(self.model().date, -1, -size)
+        elif prev_state == 2 and state != 2:
+            self.parent().calendar.adjust(self.model().date, 1, size)
 
     def arrive_reservation(self, model_index):
         # Get the reservation's state
@@ -341,6 +636,143 @@ class ResList(QTableView):
         self.clearSelection()
 
 
+# Reservations of every date that match a search, newest first, read a page at a time on the database worker
+# Each page is a job of its own, so a search that's typed over is canceled between pages (see core.ressearch)
+class SearchModel(QAbstractTableModel):
+    HEADERS = ["Date", "Time", "Size", "Name", "Phone", "Notes"]
+    # Position of each field in a row (see ressearch.PAGE_QUERY)
+    RES_ID, DATE, TIME, SIZE, NAME, PHONE, NOTE, STATE = range(8)
+    # Which row field each column shows
+    COLUMN_FIELDS = [DATE, TIME, SIZE, NAME, PHONE, NOTE]
+    PAGE_SIZE = 64
+
+    def __init__(self, parent=None):
+        super(SearchModel, self).__init__(parent)
+        # FTS5 query of the search (None when there's nothing to search for)
+        self.query = None
+        self.rows = []
+        # Set once a page comes back short (every match has been read)
+        self.exhausted = True
+        # DBFuture of the page being read
+        self.pending = None
+
+    # Starts listing the matches of another search, the page of the last one is dropped if it's still being read
+    def set_query(self, query):
+        if self.pending is not None:
+            self.pending.cancel()
+            self.pending = None
+
+        self.beginResetModel()
+        self.query = query
+        self.rows = []
+        self.exhausted = query is None
+        self.endResetModel()
+
+        self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+
+        return None
+
+    # Only one page is read at a time, the view asks again once it arrives if it still has room
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and self.pending is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+
+        after = self.rows[-1][self.RES_ID] if self.rows else None
+
+        def on_read(page):
+            self.pending = None
+
+            if len(page) < self.PAGE_SIZE:
+                self.exhausted = True
+
+            if page:
+                self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+                self.rows.extend(page)
+                self.endInsertRows()
+
+        def on_failed(error):
+            self.pending = None
+            self.exhausted = True
+            print("couldn't search reservations: " + error)
+
+        self.pending = g.WORKER.submit(ressearch.search_page, self.query, after, self.PAGE_SIZE)
+        self.pending.finished.connect(on_read)
+        self.pending.failed.connect(on_failed)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        res = self.rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return QDate.fromString(res[self.DATE], Qt.ISODate).toString("MMM / dd / yyyy")
+            elif column == 1:
+                return formatTime(QTime.fromString(res[self.TIME], Qt.ISODate))
+            elif column == 2:
+                return str(res[self.SIZE])
+            elif column == 4:
+                return formatPhone(res[self.PHONE])
+
+            return res[self.COLUMN_FIELDS[column]]
+
+        # The 1st column's UserRole is the database's res_id
+        elif role == Qt.UserRole and column == 0:
+            return res[self.RES_ID]
+
+        # Arrived and canceled reservations are colored
+        elif role == Qt.BackgroundRole:
+            if res[self.STATE] == 1:
+                return QBrush(g.COLORS["reservation_arrive"], Qt.SolidPattern)
+            elif res[self.STATE] == 2:
+                return QBrush(g.COLORS["reservation_cancel"], Qt.SolidPattern)
+
+        return None
+
+
+class SearchList(QTableView):
+    def __init__(self, parent=None):
+        super(SearchList, self).__init__(parent)
+
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setAlternatingRowColors(True)
+        self.setToolTip("Double click a reservation to show its date")
+
+        self.setModel(SearchModel(self))
+
+        hHead = QHeaderView(Qt.Horizontal)
+        hHead.setSectionResizeMode(QHeaderView.ResizeToContents)
+        hHead.setStretchLastSection(True)
+        self.setHorizontalHeader(hHead)
+        vHead = QHeaderView(Qt.Vertical)
+        vHead.setVisible(False)
+        vHead.setDefaultSectionSize(20)
+        self.setVerticalHeader(vHead)
+
+
 class ResDelegate(QStyledItemDelegate):
     def __init__(self, parent=None):
         super(ResDelegate, self).__init__(parent)
@@ -401,43 +833,35 @@ class ResDelegate(QStyledItemDelegate):
             return box
 
     # Behavior for when editing a cell is finished
+    # The cell is updated straight away, the database write is queued with the reservation's other edits
     def setModelData(self, editor: QWidget, model: QAbstractItemModel, index: QModelIndex):
         # Get the data that this row represents
         res_id = model.index(index.row(), 0).data(Qt.UserRole)
-        # print(fetchRes)
+        writer = self.parent().parent().writer
 
         # Time
         if index.column() == 0:
-            # Execute an update command on the database
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("UPDATE reservations SET time = time(?) WHERE res_id = ?",
-                        (editor.time().toString("hh:mm"), res_id))
-            con.commit()
-            con.close()
-            # Set the display data on the visual cell to the new time
-            model.setData(index, formatTime(editor.time()))
+            writer.queue(res_id, "time", editor.time().toString("hh:mm"))
+            # Set the data on the visual cell to the new time
+            model.setData(index, editor.time())
+            # The day's cached order is by time, so it needs reading again
+            self.parent().cache.invalidate(model.date)
         # self.parent().sortByColumn(0, Qt.AscendingOrder)
 
         # Size
         elif index.column() == 1:
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("UPDATE reservations SET size = ? WHERE res_id = ?",
-                        (editor.value(), res_id))
-            con.commit()
-            con.close()
+            writer.queue(res_id, "size", editor.value())
+
+            # Move the calendar's covers by the change in size (canceled reservations aren't counted)
+            res = model.rows[index.row()]
+            if res[ResModel.STATE] != 2:
+                self.parent().parent().calendar.adjust(model.date, 0, editor.value() - res[ResModel.SIZE])
 
             model.setData(index, editor.value())
 
         # Name
         elif index.column() == 2:
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("UPDATE reservations SET name = ? WHERE res_id = ?",
-                        (editor.text(), res_id))
-            con.commit()
-            con.close()
+            writer.queue(res_id, "name", editor.text())
 
             model.setData(index, editor.text())
 
@@ -446,21 +870,12 @@ class ResDelegate(QStyledItemDelegate):
             # Box text contains dashes from formatting, so we need to unformat it by removing the dashes
             u_str = editor.text().replace("-", "")
 
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("UPDATE reservations SET phone = ? WHERE res_id = ?",
-                        (u_str, res_id))
-            con.commit()
-            con.close()
+            writer.queue(res_id, "phone", u_str)
 
-            # model.setData(index, newStr, Qt.EditRole)
-            model.setData(index, editor.text(), Qt.DisplayRole)
+            model.setData(index, u_str)
 
         # Notes
         else:
-            con = create_connection()
-            cur = con.cursor()
-            cur.execute("UPDATE reservations SET note = ? WHERE res_id = ?",
-                        (editor.text(), res_id))
-            con.commit()
-            con.close()
+            writer.queue(res_id, "note", editor.text())
+
+            model.setData(index, editor.text())
@@ -1,10 +1,15 @@
+import time
+
 from qtpy.QtCore import *
 from qtpy.QtGui import *
 from qtpy.QtWidgets import *
 
 import core.globals as g
 import core.objects as o
+from core.events import EventLog
 from core.globals import get_path
+from core.predict import RotationEngine, OverflowTracker, OverflowThresholds, KitchenModel
+from core.profiler import profiled
 
 
 class ServList_Dock(QDockWidget):
@@ -48,19 +53,50 @@ class ServerWidget(QWidget):
         self.pred = ServerPredictor(self)
 
         layout.addWidget(self.pred, 0, 0)
-        layout.addWidget(toolbar, 1, 0)
+
+        # Finds the best clean tables for a party
+        self.partySpinBox = QSpinBox(self)
+        self.partySpinBox.setRange(1, 100)
+        self.partySpinBox.setValue(2)
+        self.partySpinBox.setPrefix("Party of ")
+        self.partySpinBox.setToolTip("Size of the party to find a table for")
+        self.partySpinBox.setStatusTip("Size of the party to find a table for")
+        self.partySpinBox.lineEdit().returnPressed.connect(self.find_tables)
+
+        findButton = QToolButton(self)
+        findButton.setIcon(QIcon(get_path("user.png")))
+        findButton.setText("Find")
+        findButton.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        findButton.clicked.connect(self.find_tables)
+        findButton.setToolTip("Highlights the clean tables that best fit the party")
+        findButton.setStatusTip("Highlights the clean tables that best fit the party")
+
+        findLayout = QHBoxLayout()
+        findLayout.addWidget(self.partySpinBox)
+        findLayout.addWidget(findButton)
+        layout.addLayout(findLayout, 1, 0)
+
+        layout.addWidget(toolbar, 2, 0)
 
         self.serverLineEdit = QLineEdit(self)
-        layout.addWidget(self.serverLineEdit, 2, 0)
+        layout.addWidget(self.serverLineEdit, 3, 0)
 
         self.servList = ServerList(self)
-        layout.addWidget(self.servList, 3, 0)
+        layout.addWidget(self.servList, 4, 0)
 
         self.setLayout(layout)
 
     def sizeHint(self):
         return QSize(160, 100)
 
+    # Highlights the best tables for the party, the tables of the server that should be sat next come first
+    def find_tables(self):
+        choice = self.pred.choice if self.pred.choice != "" else None
+        tables = g.VIEW.scene().find_tables(self.partySpinBox.value(), choice)
+
+        if not tables:
+            g.WINDOW.statusBar().showMessage("No clean table seats a party of " + str(self.partySpinBox.value()), 3000)
+
     def toolbar_clickRenameServer(self):
         select = self.servList.selected
 
@@ -75,8 +111,11 @@ class ServerWidget(QWidget):
             if server.name == txt:
                 return print("duplicate name")
 
-        g.ALL_SERVERS[select.data(Qt.UserRole)].name = txt
-        self.servList.populate_servers()
+        server = g.ALL_SERVERS[select.data(Qt.UserRole)]
+        server.name = txt
+        self.servList.update_server(server)
+        # The predictor shows the next server's name
+        self.pred.update()
 
     def toolbar_clickRemoveServer(self):
         select = self.servList.selected
@@ -85,11 +124,12 @@ class ServerWidget(QWidget):
             return print("no selection")
 
         # Store which row this server was on
-        prev_idx = self.servList.row(select)
+        prev_idx = select.row()
         # Delete the server
         g.ALL_SERVERS[select.data(Qt.UserRole)].deleteServer()
         # Set the selected item to the row we just deleted (if possible)
-        self.servList.selected = self.servList.item(prev_idx)
+        idx = self.servList.model().index(prev_idx)
+        self.servList.selected = idx if idx.isValid() else None
 
     def toolbar_clickAddServer(self):
         txt = self.serverLineEdit.text()
@@ -101,18 +141,36 @@ class ServerWidget(QWidget):
             if server.name == txt:
                 return print("duplicate name")
 
-        o.POS_Server(txt)
+        g.EVENTS.log(EventLog.SERVER_ADD, server=o.POS_Server(txt))
         self.servList.populate_servers()
 
 
 class ServerPredictor(QWidget):
+    # Emitted with the new choice whenever the server that should be sat next changes
+    choiceChanged = Signal(object)
+    # Emitted with the new KitchenModel once a refit is done
+    modelChanged = Signal(object)
+
+    # A kitchen model older than this is refit when Hosty starts (seconds), it's normally refit when Hosty closes at the
+    # end of the night but a crash or a power cut skips that
+    REFIT_AGE = 12 * 3600
+
     def __init__(self, parent=None):
         super(ServerPredictor, self).__init__(parent)
         self.setSizePolicy(QSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed))
         self.choice = ""
+        self.rotation = RotationEngine()
+        self.choiceChanged.connect(self.update)
         self.overflow_color = g.SETTINGS.value("data/overflowRules")["default"]["color"]
         self.overflow_score = 0
         self.overflow_name = ""
+        # Kitchen load fitted from past service (None until the first fit)
+        self.model = KitchenModel.from_setting(g.SETTINGS.value("data/kitchenModel"))
+        # DBFuture of the refit that's running
+        self.pendingFit = None
+        # Recent seatings live in g.RECENTS, the tracker keeps it as a heap of when each seating runs out
+        self.overflow = OverflowTracker(g.RECENTS, self.kitchen_rate(), self.kitchen_model())
+        self.thresholds = OverflowThresholds(g.overflowRules)
 
         # Initialize rects for the server guesser and overflow boxes
         self.predict_rect = self.rect().adjusted(0, 0, 0, 0)
@@ -134,93 +192,136 @@ class ServerPredictor(QWidget):
         self.predict_text_rect = self.predict_rect.marginsRemoved(QMargins(27, 0, -20, 0))
         self.overflow_text_rect = self.overflow_rect.marginsRemoved(QMargins(2, 1, 2, 1))
 
-    def calculate_choice(self):
+    # Works out who should get the next table
+    # Pass the servers whose counters changed, or nothing when the server list itself changed
+    @profiled("predictor.choice")
+    def calculate_choice(self, *servers):
         if self.ticker is None:
             self.ticker = self.startTimer(1000)
 
-        # Server Score Calculation
-        highestTotal = 0
+        if servers:
+            # Only re-score the servers that changed
+            for server in servers:
+                if server is not None:
+                    self.rotation.update(server)
+        else:
+            # Servers were added, removed or renumbered, re-score all of them
+            self.rotation.rebuild(g.ALL_SERVERS)
+            # Colors and names may have changed even if the choice didn't
+            self.update()
+
+        choice = self.rotation.best()
+        if choice is None:
+            choice = ""
+
+        # Only signal (and repaint) when the choice actually changed
+        if choice is not self.choice:
+            self.choice = choice
+            self.choiceChanged.emit(choice)
+
+    # Kitchen speed setting converted from heads per minute to heads per second
+    @staticmethod
+    def kitchen_rate():
+        return float(g.SETTINGS.value("settings/overflowMultiplier")) / 60
+
+    # The fitted kitchen model, if overflow is set to use it
+    def kitchen_model(self):
+        if not int(g.SETTINGS.value("settings/fitOverflow", 1)):
+            return None
+
+        return self.model
+
+    # Re-reads the kitchen speed and overflow rules (after the settings menu was closed)
+    def load_overflow_settings(self):
+        rate = self.kitchen_rate()
+        model = self.kitchen_model()
+        if rate != self.overflow.rate or model is not self.overflow.model:
+            self.overflow.set_rate(rate, model)
+
+        self.thresholds = OverflowThresholds(g.overflowRules)
+        self.calculate_overflow()
+        self.update()
+
+    # Fits the kitchen model to the last few weeks of service on the database worker, the new model is used once it's
+    # done (seatings already counted are decayed with it too)
+    def refit(self):
+        if self.pendingFit is not None:
+            return self.pendingFit
 
-        for server in g.ALL_SERVERS:
-            if server.headTotal > highestTotal:
-                highestTotal = server.headTotal
+        # Events still in the buffer are written before the refit reads them
+        g.EVENTS.flush()
 
-        scores = {}
+        def on_fitted(model):
+            self.pendingFit = None
+            self.model = model
+            g.SETTINGS.setValue("data/kitchenModel", model.to_setting())
 
-        for server in g.ALL_SERVERS:
-            active = server.headActive
+            self.load_overflow_settings()
+            self.modelChanged.emit(model)
 
-            # Prioritize servers with no active heads
-            if server.headActive == 0:
-                active = -20 # raise this number to prioritize less
+        def on_failed(error):
+            self.pendingFit = None
+            print("couldn't fit the kitchen model: " + error)
 
-            scores[server] = highestTotal - server.headTotal - active
+        self.pendingFit = g.WORKER.submit(KitchenModel.refit, time.time())
+        self.pendingFit.finished.connect(on_fitted)
+        self.pendingFit.failed.connect(on_failed)
 
-        # print("Prediction Scores:")
-        # for k in scores:
-        # 	print(k.name, scores[k])
+        return self.pendingFit
 
-        # Set the server prediction to the server with the highest score
-        if len(scores) < 1:
-            self.choice = ""
-        else:
-            self.choice = max(scores, key=lambda i: scores[i])
+    # Refits the kitchen model with the night's service once Hosty closes, so the next service starts with it
+    # Called after the last events were handed to the worker (it runs jobs in order, so the fit reads them). Nothing is
+    # left running to use the model, so it's only kept in the settings.
+    def refit_at_close(self):
+        future = g.WORKER.submit(KitchenModel.refit, time.time())
+        model = future.wait()
 
-        self.update()
+        if future.error is not None:
+            return print("couldn't fit the kitchen model: " + future.error)
 
+        self.model = model
+        g.SETTINGS.setValue("data/kitchenModel", model.to_setting())
+        g.SETTINGS.sync()
+
+    # Refits the kitchen model if the last fit is from before the last service (called when Hosty starts)
+    def refit_if_stale(self):
+        if self.model is None or time.time() - self.model.fitted > self.REFIT_AGE:
+            return self.refit()
+
+        return None
+
+    # Logs a table of num customers that was just sat
+    def add_seating(self, num):
+        self.overflow.add(num, time.monotonic())
+
+    @profiled("predictor.overflow")
     def calculate_overflow(self):
-        prev = self.overflow_score
-        self.overflow_score = 0
+        # customers - (elapsed * kitchen speed), summed over the recent seatings that haven't run out yet
+        # (the kitchen speed of a seating comes from the kitchen model when there is one)
+        # (monotonic time, so seatings from before midnight keep decaying after it)
+        score = self.overflow.score(time.monotonic())
+        rule = self.thresholds.match(score)
+
+        if rule == "default":
+            name = ""
+        else:
+            name = " ({})".format(rule)
 
-        # Must copy the table because we'll be removing recents from the original as we iterate
-        # Iterating the original would result in skipping a recent table every time one gets removed
-        # because the indexes past the removal all get decremented
-        tempRec = g.RECENTS.copy()
-
-        # Overflow Score Calculation
-        for seat in tempRec:
-            # Get the seconds elapsed since the table was sat and convert to ticks
-            elapsed_ticks = seat["time"].secsTo(QTime.currentTime()) / 60
-            # 5 seconds = 0.083 tick
-            # 60 seconds = 1 tick
-
-            # customers - (elapsed * multiplier)
-            sc = round(seat["num"] - (elapsed_ticks * float(g.SETTINGS.value("settings/overflowMultiplier"))), 4)
-
-            # If this table's score is less than 0, remove it from the recents (deemed unecessary)
-            if sc <= 0:
-                g.RECENTS.remove(seat)
-            else:
-                self.overflow_score += sc
-
-        # Sort overflow rules by threshold (descending) so that we can stop iterating them when it finds the correct threshold 
-        tempTbl = []
-        for rule in g.overflowRules:
-            tempTbl.append(rule)
-
-        def sort_by_threshold(d):
-            return g.overflowRules[d]["num"]
-
-        tempTbl.sort(key=sort_by_threshold, reverse=True)
-
-        # Iterate the sorted thresholds
-        for rule in tempTbl:
-            # If the score is above this threshold, set overflow color and note and stop iterating
-            if self.overflow_score > g.overflowRules[rule]["num"]:
-                self.overflow_color = g.overflowRules[rule]["color"]
-
-                if rule == "default":
-                    self.overflow_name = ""
-                else:
-                    self.overflow_name = " ({})".format(rule)
-                
-                break
+        # Only repaint when the displayed text or color changes
+        changed = round(score, 1) != round(self.overflow_score, 1) or name != self.overflow_name
 
-        self.update()
+        self.overflow_score = score
+        # The rules may be mid-edit in the settings menu, fall back to the default rule if this one is gone
+        self.overflow_color = g.overflowRules.get(rule, g.overflowRules["default"])["color"]
+        self.overflow_name = name
+
+        if changed:
+            self.update()
 
     def timerEvent(self, e):
         if self.choice == "":
             self.killTimer(self.ticker)
+            self.ticker = None
 
             return
 
@@ -264,13 +365,106 @@ class ServerPredictor(QWidget):
         return QSize(155, 50)
 
 
-class ServerList(QListWidget):
+# Item data role that holds the POS_Server object of a row
+ServerRole = Qt.UserRole + 1
+
+
+# Exposes g.ALL_SERVERS to the server list, one row per server
+# Rows aren't rebuilt when a server's counters change, only that row is signalled as changed
+class ServerListModel(QAbstractListModel):
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(g.ALL_SERVERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(g.ALL_SERVERS):
+            return None
+
+        server = g.ALL_SERVERS[index.row()]
+
+        if role == Qt.DisplayRole:
+            return server.name
+        elif role == Qt.UserRole:
+            return server.num
+        elif role == ServerRole:
+            return server
+        elif role == Qt.SizeHintRole:
+            return QSize(0, 40)
+
+        return None
+
+    # The list of servers was replaced, added to or removed from
+    def reset(self):
+        self.beginResetModel()
+        self.endResetModel()
+
+    # Only this server's row needs repainting
+    def server_changed(self, server):
+        if 0 <= server.num < len(g.ALL_SERVERS):
+            idx = self.index(server.num)
+            self.dataChanged.emit(idx, idx)
+
+    # Every row needs repainting (e.g. the counting mode changed)
+    def all_changed(self):
+        if len(g.ALL_SERVERS) > 0:
+            self.dataChanged.emit(self.index(0), self.index(len(g.ALL_SERVERS) - 1))
+
+
+# Paints a server's row: their color, name and active/total counts
+class ServerDelegate(QStyledItemDelegate):
+    def __init__(self, parent=None):
+        super(ServerDelegate, self).__init__(parent)
+        # Fonts are made once here instead of resizing the shared server list font on every paint
+        self.nameFont = QFont(g.FONT_SERVERLIST)
+        self.nameFont.setPointSize(15)
+        self.countFont = QFont(g.FONT_SERVERLIST)
+        self.countFont.setPointSize(13)
+        self.pen = QPen(Qt.black, 1, Qt.SolidLine)
+
+    def sizeHint(self, option, index):
+        return QSize(0, 40)
+
+    def paint(self, p, option, index):
+        server = index.data(ServerRole)
+        if server is None:
+            return
+
+        # QMargins(left, top, right, bottom)
+        rect = option.rect.adjusted(0, 0, -2, 0)
+        indicatorRect = QRect(rect.left() + 2, rect.top() + 2, 18, 18)
+        nameRect = rect.marginsRemoved(QMargins(24, -2, 0, 17))
+        textRect = rect.marginsRemoved(QMargins(2, 22, 2, -1))
+
+        p.save()
+        p.setPen(self.pen)
+        p.setBrush(QBrush(server.color, Qt.SolidPattern))
+        p.drawRoundedRect(indicatorRect, 2, 2)
+
+        p.setFont(self.nameFont)
+        p.drawText(nameRect, (Qt.AlignLeft | Qt.AlignTop), server.name)
+
+        p.setFont(self.countFont)
+        if g.COUNT_MODE == "heads":
+            p.drawText(textRect, (Qt.AlignLeft | Qt.AlignBottom), "Active:" + str(server.headActive))
+            p.drawText(textRect, (Qt.AlignRight | Qt.AlignBottom), "Total:" + str(server.headTotal))
+        else:
+            p.drawText(textRect, (Qt.AlignLeft | Qt.AlignBottom), "Active:" + str(server.active))
+            p.drawText(textRect, (Qt.AlignRight | Qt.AlignBottom), "Total:" + str(server.total))
+        p.restore()
+
+
+class ServerList(QListView):
     def __init__(self, parent=None):
         super(ServerList, self).__init__(parent)
         self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setUniformItemSizes(True)
+        self.setModel(ServerListModel(self))
+        self.setItemDelegate(ServerDelegate(self))
 
-        def on_item_clicked(i: QListWidgetItem, prev: QListWidgetItem):
-            if i is None:
+        def on_item_clicked(i: QModelIndex, prev: QModelIndex):
+            if not i.isValid():
                 return
 
             self.parent().serverLineEdit.setText(g.ALL_SERVERS[i.data(Qt.UserRole)].name)
@@ -278,96 +472,46 @@ class ServerList(QListWidget):
             self.parent().serverLineEdit.setFocus(Qt.MouseFocusReason)
             self.selected = i
 
-        # self.itemPressed.connect(on_item_clicked)
-        self.currentItemChanged.connect(on_item_clicked)
+        # The selected row doesn't survive the server list being replaced
+        def on_reset():
+            self.selected = None
+
+        self.selectionModel().currentChanged.connect(on_item_clicked)
+        self.model().modelReset.connect(on_reset)
         self.selected = None
 
+    # The list of servers changed, rebuild the rows
+    @profiled("dock.servers")
     def populate_servers(self):
-        self.clear()
-
-        for server in g.ALL_SERVERS:
-            item = ServerListItem(server, self)
-            item.setData(Qt.UserRole, server.num)
+        self.model().reset()
 
         g.SERVER_LIST.widget().update()
 
+    # One server's name or counters changed, repaint just its row
+    def update_server(self, server):
+        if server is not None:
+            self.model().server_changed(server)
 
-class ServerListItem(QListWidgetItem):
-    def __init__(self, server, parent=None):
-        super(ServerListItem, self).__init__("", parent)
-        self.server = server
-        self.setSizeHint(QSize(0, 40))
-
-        self.listWidget().setItemWidget(self, ServerListWidget(self.server, self))
+    def update_all(self):
+        self.model().all_changed()
 
+    def wheelEvent(self, e):
+        idx = self.indexAt(e.pos())
 
-class ServerListWidget(QWidget):
-    def __init__(self, server, listItem, parent=None):
-        super(ServerListWidget, self).__init__(parent)
-        self.item = listItem
-
-        # Initialize rects for each server's name, color and active/total text
-        self.rect = QRect(0, 0, listItem.listWidget().size().width() - 2, listItem.sizeHint().height())
-        # self.tallyRect = self.rect.marginsRemoved(QMargins(40, 10, 10, 10))
-        self.indicatorRect = QRect(2, 2, 18, 18)
-        self.nameRect = self.rect.marginsRemoved(QMargins(24, -2, 0, 17))
-        self.textRect = self.rect.marginsRemoved(QMargins(2, 22, 2, -1))
-
-        self.updateRects()
-
-        self.server = server
-        self.server.predWidget = self
-
-    def resizeEvent(self, e):
-        self.rect.setSize(e.size())
-        self.rect.adjust(0, 0, -2, 0)
-        self.updateRects()
-
-    def updateRects(self):
-        # QMargins(left, top, right, bottom)
-        # self.tallyRect = self.rect.marginsRemoved(QMargins(40, 10, 10, 10))
-        self.indicatorRect = QRect(2, 2, 18, 18)
-        self.nameRect = self.rect.marginsRemoved(QMargins(24, -2, 0, 17))
-        self.textRect = self.rect.marginsRemoved(QMargins(2, 22, 2, -1))
+        if g.EDIT_MODE and idx.isValid():
+            server = idx.data(ServerRole)
 
-    def wheelEvent(self, e):
-        if g.EDIT_MODE:
             if e.angleDelta().y() > 0:
-                self.server.headTotal += 1
-                self.update()
+                server.headTotal += 1
             elif e.angleDelta().y() < 0:
-                self.server.headTotal -= 1
-                self.update()
+                server.headTotal -= 1
 
-            g.SERVER_LIST.widget().pred.calculate_choice()
+            self.update_server(server)
+            g.SERVER_LIST.widget().pred.calculate_choice(server)
         else:
-            e.ignore()
-
-    def paintEvent(self, e):
-        p = QPainter(self)
-        p.setPen(QPen(Qt.black, 1, Qt.SolidLine))
-        p.setBrush(QBrush(self.server.color, Qt.SolidPattern))
-        p.drawRoundedRect(self.indicatorRect, 2, 2)
-
-        g.FONT_SERVERLIST.setPointSize(15)
-        p.setFont(g.FONT_SERVERLIST)
-        p.drawText(self.nameRect, (Qt.AlignLeft | Qt.AlignTop), self.server.name)
-
-        g.FONT_SERVERLIST.setPointSize(13)
-        p.setFont(g.FONT_SERVERLIST)
-        if g.COUNT_MODE == "heads":
-            p.drawText(self.textRect, (Qt.AlignLeft | Qt.AlignBottom), "Active:" + str(self.server.headActive))
-            p.drawText(self.textRect, (Qt.AlignRight | Qt.AlignBottom), "Total:" + str(self.server.headTotal))
-        else:
-            p.drawText(self.textRect, (Qt.AlignLeft | Qt.AlignBottom), "Active:" + str(self.server.active))
-            p.drawText(self.textRect, (Qt.AlignRight | Qt.AlignBottom), "Total:" + str(self.server.total))
-
-    def editServer(self):
-        curr = g.ALL_SERVERS[self.item.data(Qt.UserRole)]
-
-        if not curr:
-            return print("invalid selection")
+            super(ServerList, self).wheelEvent(e)
 
+    def editServer(self, curr):
         txt, ok = QInputDialog().getText(self, "Rename Server", "Name:", QLineEdit.Normal, curr.name)
 
         if not ok or txt == "":
@@ -377,15 +521,12 @@ class ServerListWidget(QWidget):
             if server.name == txt:
                 return print("duplicate")
 
-        g.ALL_SERVERS[curr.num].name = txt
-        g.SERVER_LIST.widget().servList.populate_servers()
-
-    def editServerTotal(self):
-        curr = g.ALL_SERVERS[self.item.data(Qt.UserRole)]
-
-        if not curr:
-            return print("invalid selection")
+        curr.name = txt
+        self.update_server(curr)
+        # The predictor shows the next server's name
+        g.SERVER_LIST.widget().pred.update()
 
+    def editServerTotal(self, curr):
         inNum, ok = QInputDialog().getInt(self, "Edit Server's Total", "Total:", curr.total)
 
         if not ok:
@@ -395,35 +536,35 @@ class ServerListWidget(QWidget):
         # 	if server.name == txt : return print("duplicate")
 
         if g.COUNT_MODE == "heads":
-            g.ALL_SERVERS[curr.num].headTotal = inNum
+            curr.headTotal = inNum
         else:
-            g.ALL_SERVERS[curr.num].total = inNum
+            curr.total = inNum
 
-        g.SERVER_LIST.widget().servList.populate_servers()
-        g.SERVER_LIST.widget().pred.calculate_choice()
+        self.update_server(curr)
+        g.SERVER_LIST.widget().pred.calculate_choice(curr)
 
-    def removeServer(self):
-        curr = g.ALL_SERVERS[self.item.data(Qt.UserRole)]
+    def removeServer(self, curr):
+        curr.deleteServer()
 
-        if not curr:
-            return print("invalid selection")
+    def contextMenuEvent(self, event):
+        idx = self.indexAt(event.pos())
 
-        g.ALL_SERVERS[curr.num].deleteServer()
-        g.SERVER_LIST.widget().servList.populate_servers()
+        if not idx.isValid():
+            return print("invalid selection")
 
-    def contextMenuEvent(self, event):
+        curr = idx.data(ServerRole)
         menu = QMenu(g.WINDOW)
 
         editAct = menu.addAction("Rename")
-        editAct.triggered.connect(self.editServer)
+        editAct.triggered.connect(lambda: self.editServer(curr))
         editAct.setStatusTip("Rename the server")
 
         editTotalAct = menu.addAction("Edit Total")
-        editTotalAct.triggered.connect(self.editServerTotal)
+        editTotalAct.triggered.connect(lambda: self.editServerTotal(curr))
         editTotalAct.setStatusTip("Edit this server's seat total")
 
         deleteAct = menu.addAction("Delete")
-        deleteAct.triggered.connect(self.removeServer)
+        deleteAct.triggered.connect(lambda: self.removeServer(curr))
         deleteAct.setStatusTip("Deletes the server")
 
         menu.exec_(QCursor.pos(), editAct)
@@ -1,5 +1,7 @@
 import sqlite3 as sql
 import sys
+import time
+from collections import deque
 
 from qtpy.QtCore import *
 from qtpy.QtGui import *
@@ -7,8 +9,16 @@ from qtpy.QtWidgets import *
 
 import core.globals as g
 from core.dialogs import SettingsDialog, TableDialog, FloorplanDialog
-from core.globals import get_path, create_connection
-from core.objects import POS_Server, POS_Table
+from core.cache import LRUCache
+from core.database import Database
+from core.dbworker import DatabaseWorker
+from core.events import EventLog
+from core.globals import get_path
+from core.objects import POS_Server, POS_Table, TableRegistry
+from core.profiler import PROFILER, profiled
+from core.sections import SectionList
+from core.snapshot import FloorSnapshot
+from docks.analyticsDock import Analytics_Dock
 from docks.resDock import ResList_Dock
 from docks.servDock import ServList_Dock
 
@@ -78,6 +88,18 @@ class MainWindow(QMainWindow):
         self.addToolBar(Qt.RightToolBarArea, self.toolbar)
         self.statusBar().show()
 
+        # Profiling is only reachable by shortcut, it's for diagnosing slowdowns rather than everyday use
+        self.act_overlay = QAction("Performance Overlay", self)
+        self.act_overlay.setCheckable(True)
+        self.act_overlay.setShortcut(QKeySequence(Qt.Key_F12))
+        self.act_overlay.toggled.connect(lambda s: g.VIEW.set_overlay(s))
+        self.addAction(self.act_overlay)
+
+        self.act_exportProfile = QAction("Export Profile", self)
+        self.act_exportProfile.setShortcut(QKeySequence(Qt.SHIFT + Qt.Key_F12))
+        self.act_exportProfile.triggered.connect(self.export_profile)
+        self.addAction(self.act_exportProfile)
+
     # Create and link the toolbar buttons with their cooresponding functions and return it
     def create_toolbar(self) -> QToolBar:
         toolbar = MainToolBar(self)
@@ -96,6 +118,21 @@ class MainWindow(QMainWindow):
 
         return toolbar
 
+    # Saves what the profiler has captured, as a Chrome trace or as a summary of each hot path
+    def export_profile(self):
+        traceFilter = "Chrome trace (*.json)"
+        path, selected = QFileDialog.getSaveFileName(self, "Export Profile", "hosty-profile.json",
+                                                     traceFilter + ";;Latency summary (*.json)")
+        if not path:
+            return
+
+        if selected == traceFilter:
+            PROFILER.export_chrome_trace(path)
+        else:
+            PROFILER.export_json(path)
+
+        self.statusBar().showMessage("Profile exported to " + path, 5000)
+
     # Create the layout menu at the cursor position
     def create_planmenu(self):
         # Alias the recents menu and clear it
@@ -104,18 +141,13 @@ class MainWindow(QMainWindow):
 
         # If we have recents to iterate through
         if len(g.recentFloorplans) > 0:
-            con = create_connection()
-            cur = con.cursor()
-
             # Select query is ordering plans in alphabetical, we need to sort them by the recents list
             for idx in g.recentFloorplans:
-                plan = cur.execute("SELECT plan_id, name FROM floorplans WHERE plan_id = ?", str(idx)).fetchone()
+                plan = g.DB.fetchone("SELECT plan_id, name FROM floorplans WHERE plan_id = ?", (idx,))
                 # Add each recent floorplan to the menu
                 new = FloorplanAction(int(plan[0]), plan[1], m)
                 m.addAction(new)
 
-            con.close()
-
         # No recents, display so
         else:
             new = QAction("No Recent Plans", m)
@@ -141,6 +173,8 @@ class MainWindow(QMainWindow):
             g.SCENE.editLabel.setVisible(True)
             self.toolbar.act_addRectTbl.setVisible(True)
             self.toolbar.act_addCircTbl.setVisible(True)
+            # Sections can be added in edit mode, so the section tabs are always shown
+            g.VIEW.sectionBar.refresh()
 
         # Toggle is off
         else:
@@ -148,6 +182,7 @@ class MainWindow(QMainWindow):
             g.SCENE.editLabel.setVisible(False)
             self.toolbar.act_addRectTbl.setVisible(False)
             self.toolbar.act_addCircTbl.setVisible(False)
+            g.VIEW.sectionBar.refresh()
 
     # Swap seating counts between heads / tables
     def swap_seatmode(self):
@@ -177,15 +212,15 @@ class MainWindow(QMainWindow):
 
             # If we reset while a table was sat, add that table to its server's active count
             # (depending on head or table count)
-            for tbl in g.SCENE.items():
-                if type(tbl) is POS_Table and tbl.state == 1:
-                    if g.COUNT_MODE == "heads":
-                        tbl.server.active += tbl.numCustomers
-                    else:
-                        tbl.server.active += 1
-
-            g.RECENTS.clear()
-            g.SERVER_LIST.widget().servList.update()
+            # (the sections that aren't being shown included)
+            for tbl in g.SCENE.tables.in_state(1) + [rec for rec in g.SCENE.sections.records() if rec.state == 1]:
+                if g.COUNT_MODE == "heads":
+                    tbl.server.active += tbl.numCustomers
+                else:
+                    tbl.server.active += 1
+
+            g.SERVER_LIST.widget().pred.overflow.clear()
+            g.SERVER_LIST.widget().servList.update_all()
             g.SERVER_LIST.widget().pred.calculate_choice()
 
     # We created or canceled creating a table, set the buttons unchecked/pressed
@@ -209,9 +244,9 @@ class MainWindow(QMainWindow):
             elif self.toolbar.act_addCircTbl.isChecked():
                 TableDialog(self.rubberBandRect, True, g.WINDOW)
 
-        # We're still dragging a box
+        # We're still dragging a box (kept in scene coordinates, the view may be zoomed)
         else:
-            self.rubberBandRect = viewportRect
+            self.rubberBandRect = g.VIEW.mapToScene(viewportRect).boundingRect().toRect()
 
     # Allow dragging boxes in the GraphicsView and connect the update function
     def rubberband_createobject(self):
@@ -226,11 +261,21 @@ class MainWindow(QMainWindow):
 
 
 class GraphicsScene(QGraphicsScene):
+    # Size of the pixmap cache the tables' rendered bodies are kept in (in kilobytes)
+    PIXMAP_CACHE_KB = 128 * 1024
+
     def __init__(self, parent=None):
         super(GraphicsScene, self).__init__(parent)
         # self.setSceneRect(QRectF(0,0,1,1))
-        # We don't utilize the item indexing from GraphicsScene
-        self.setItemIndexMethod(QGraphicsScene.NoIndex)
+        # The scene's default BSP index is kept for hit-testing, tables are also tracked by server and state here
+        self.tables = TableRegistry()
+        # The plan's sections, only the active section's tables are on the scene
+        self.sections = SectionList(self)
+
+        # Each table keeps its rendered body in Qt's pixmap cache, a large floor doesn't fit in the default 10 MB
+        # (tables pushed out of the cache would be rendered again on every frame)
+        if QPixmapCache.cacheLimit() < self.PIXMAP_CACHE_KB:
+            QPixmapCache.setCacheLimit(self.PIXMAP_CACHE_KB)
 
         # Create a label on the scene to indicate edit mode (invisible)
         self.editLabel = self.addSimpleText("Editing Mode", g.FONT_SCENE)
@@ -239,33 +284,334 @@ class GraphicsScene(QGraphicsScene):
         self.editLabel.setPos(20, 20)
         self.editLabel.setZValue(1)
 
+        # Tables that are currently sat, one clock advances all of their seat timers at once
+        self.seatedTables = set()
+        self.seatClock = QTimer(self)
+        self.seatClock.setInterval(1000)
+        self.seatClock.timeout.connect(self.tick_seat_clock)
+
+        # Tables the best table finder picked, and the party size they were picked for
+        # (the size is offered when one of them is sat)
+        self.highlighted = []
+        self.finderParty = 2
+
+    # Highlights the best clean tables for a party, server is the predicted server (their tables are preferred)
+    # If none of the shown section's tables seat the party, the section with the best fit is shown instead
+    @profiled("scene.find_tables")
+    def find_tables(self, party: int, server=None) -> list:
+        self.clear_highlight()
+
+        index, fits = self.sections.find(party, server)
+        if index != self.sections.active:
+            g.VIEW.show_section(index)
+
+        self.highlighted = [self.tables.bySlot[slot] for _, slot in fits]
+        self.finderParty = party
+
+        for tbl in self.highlighted:
+            tbl.set_highlighted(True)
+
+        return self.highlighted
+
+    def clear_highlight(self):
+        for tbl in self.highlighted:
+            tbl.set_highlighted(False)
+
+        self.highlighted = []
+
+    # Adds a sat table to the seat clock (and starts the clock if it isn't running)
+    def start_seat_timer(self, tbl: POS_Table):
+        self.seatedTables.add(tbl)
+
+        if not self.seatClock.isActive():
+            self.seatClock.start()
+
+    # Removes a table from the seat clock (and stops the clock once no tables are sat)
+    def stop_seat_timer(self, tbl: POS_Table):
+        self.seatedTables.discard(tbl)
+
+        if not self.seatedTables:
+            self.seatClock.stop()
+
+    # Repaints the timer text of every sat table
+    # Only the SeatTimer items are marked dirty, the scene then works out in C++ which views show them and repaints
+    # their areas in one pass (no mapping or region building per table here)
+    def tick_seat_clock(self):
+        # Zoomed too far out for the timers to be drawn in any view
+        if all(getattr(view, "zoom", 1.0) < POS_Table.LOD_TEXT for view in self.views()):
+            return
+
+        for tbl in list(self.seatedTables):
+            # Forget tables that were removed from the scene while sat
+            if tbl.scene() is not self:
+                self.stop_seat_timer(tbl)
+            else:
+                tbl.timer.update()
+
     def recenter(self):
         rect = self.itemsBoundingRect()
         g.VIEW.ensureVisible(rect)
 
 
+# Tabs for switching between the sections of the plan the view is showing
+# In edit mode its menu adds, renames and removes sections
+class SectionBar(QTabBar):
+    def __init__(self, view, parent=None):
+        super(SectionBar, self).__init__(parent)
+        self.view = view
+        self.setExpanding(False)
+        self.setDrawBase(False)
+        self.setVisible(False)
+        # Set while the tabs are being rebuilt, so that doesn't switch sections
+        self.refreshing = False
+
+        self.currentChanged.connect(self.on_changed)
+
+    # Rebuilds the tabs from the sections of the view's scene
+    def refresh(self):
+        sections = self.view.scene().sections
+
+        self.refreshing = True
+        while self.count() > 0:
+            self.removeTab(0)
+
+        for i in range(len(sections)):
+            self.addTab(sections.label(i))
+
+        self.setCurrentIndex(sections.active)
+        self.refreshing = False
+
+        # A plan with a single section doesn't need the tabs, unless sections are being added
+        self.setVisible(len(sections) > 1 or g.EDIT_MODE)
+
+    def on_changed(self, index: int):
+        if not self.refreshing and index >= 0:
+            self.view.show_section(index)
+
+    def contextMenuEvent(self, e):
+        if not g.EDIT_MODE:
+            return
+
+        sections = self.view.scene().sections
+        index = self.tabAt(e.pos())
+
+        menu = QMenu(self)
+        act_add = menu.addAction("Add Section")
+        act_rename = menu.addAction("Rename Section")
+        act_remove = menu.addAction("Remove Section")
+        act_rename.setEnabled(index >= 0)
+        act_remove.setEnabled(index >= 0 and len(sections) > 1)
+
+        act = menu.exec_(e.globalPos())
+
+        if act is act_add:
+            name, ok = QInputDialog.getText(g.WINDOW, "Add Section", "Name:")
+            if ok and name:
+                sections.add(name)
+                self.refresh()
+                self.view.show_section(len(sections) - 1)
+        elif act is act_rename:
+            name, ok = QInputDialog.getText(g.WINDOW, "Rename Section", "Name:", text=sections[index].name)
+            if ok and name:
+                sections.rename(index, name)
+                self.refresh()
+        elif act is act_remove:
+            if not sections.remove(index):
+                g.WINDOW.statusBar().showMessage("Only a section without tables can be removed", 5000)
+                return print("section isn't empty")
+
+            self.view.show_section(sections.active)
+
+
 class GraphicsView(QGraphicsView):
+    MIN_ZOOM = 0.1
+    MAX_ZOOM = 4.0
+    # Zoom change for each notch of the mouse wheel
+    ZOOM_STEP = 1.15
+
     def __init__(self, scene, parent=None):
         super(GraphicsView, self).__init__(scene, parent)
         self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
         self.setBackgroundBrush(QBrush(g.COLORS["background"], Qt.SolidPattern))
         self.setSceneRect(QRectF(0, 0, 1, 1))
 
+        # Scale of the view, at 1 the floor sits fixed in the top left corner like it always has
+        # Zoomed in or out, the scene rect grows to cover the floor so it can be scrolled around
+        self.zoom = 1.0
+        self.viewport().grabGesture(Qt.PinchGesture)
+
+        # Tabs for the sections of the plan, placed above the view by the main window
+        self.sectionBar = SectionBar(self, parent)
+
         self.storServ = {
             "servers": [],
-            "tables":  {}
+            "tables":  {},
+            "records": {}
         }
 
-    # Populate the server list and fill scene with tables
+        # Recently loaded plans, so switching back to one doesn't query the database again
+        # (key is the plan_id, value is the server count and the plan's table rows)
+        self.planCache = LRUCache(64)
+        # Recently previewed plans, already built into scenes
+        # (key is the plan_id, value is the preview scene and the servers its tables use)
+        self.previewCache = LRUCache(8)
+        # DBFuture of the plan being read on the database worker (only the latest requested plan is shown)
+        self.pendingLoad = None
+
+        # Performance overlay, the lines are rebuilt from the profiler twice a second
+        self.showOverlay = False
+        self.overlayLines = []
+        self.overlayRect = QRect()
+        self.overlayFont = QFont("Consolas", 9)
+        self.overlayFont.setStyleHint(QFont.Monospace)
+        # perf_counter() of each frame painted in the last second
+        self.frames = deque()
+        self.overlayTimer = QTimer(self)
+        self.overlayTimer.setInterval(500)
+        self.overlayTimer.timeout.connect(self.refresh_overlay)
+
+    # Zooms to a scale, keeping the scene point under pos (in viewport coordinates) where it is
+    def set_zoom(self, zoom: float, pos=None):
+        zoom = min(max(zoom, self.MIN_ZOOM), self.MAX_ZOOM)
+
+        # Close enough to the normal size, snap back to it
+        if abs(zoom - 1.0) < 0.05:
+            zoom = 1.0
+
+        if zoom == self.zoom:
+            return
+
+        if pos is None:
+            pos = self.viewport().rect().center()
+        anchor = self.mapToScene(pos)
+
+        self.zoom = zoom
+        self.setTransform(QTransform.fromScale(zoom, zoom))
+        self.update_scene_rect()
+
+        # Scroll the anchor back under the cursor
+        if zoom != 1.0:
+            delta = self.mapFromScene(anchor) - pos
+            self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() + delta.x())
+            self.verticalScrollBar().setValue(self.verticalScrollBar().value() + delta.y())
+
+    # While zoomed the scene rect covers every table (and the origin), so the whole floor can be scrolled to
+    def update_scene_rect(self):
+        if self.zoom == 1.0:
+            self.setSceneRect(QRectF(0, 0, 1, 1))
+        else:
+            self.setSceneRect(self.scene().itemsBoundingRect().united(QRectF(0, 0, 1, 1)).adjusted(-50, -50, 50, 50))
+
+    def setScene(self, scene):
+        super(GraphicsView, self).setScene(scene)
+        self.update_scene_rect()
+        self.sectionBar.refresh()
+
+    # Puts another section of the plan on the scene being shown
+    def show_section(self, index: int):
+        self.scene().sections.switch(index)
+        self.sectionBar.refresh()
+
+        # A zoomed view's scrollable area has to cover the section's tables
+        self.update_scene_rect()
+        self.scene().recenter()
+
+    def wheelEvent(self, e):
+        # In edit mode the wheel changes the server of the table under the cursor, unless ctrl is held
+        if g.EDIT_MODE and not e.modifiers() & Qt.ControlModifier:
+            return super(GraphicsView, self).wheelEvent(e)
+
+        steps = e.angleDelta().y() / 120
+        if steps:
+            self.set_zoom(self.zoom * self.ZOOM_STEP ** steps, e.pos())
+
+    def keyPressEvent(self, e):
+        # Ctrl+0 goes back to the normal size
+        if e.key() == Qt.Key_0 and e.modifiers() & Qt.ControlModifier:
+            self.set_zoom(1.0)
+        else:
+            super(GraphicsView, self).keyPressEvent(e)
+
+    # Pinching on a touch screen or trackpad zooms around the pinch's center
+    def viewportEvent(self, e):
+        if e.type() == QEvent.Gesture:
+            pinch = e.gesture(Qt.PinchGesture)
+
+            if pinch is not None:
+                if pinch.changeFlags() & QPinchGesture.ScaleFactorChanged:
+                    self.set_zoom(self.zoom * pinch.scaleFactor(),
+                                  self.viewport().mapFromGlobal(pinch.centerPoint().toPoint()))
+                e.accept(pinch)
+                return True
+
+        return super(GraphicsView, self).viewportEvent(e)
+
+    # Turns the profiler and its overlay on or off
+    def set_overlay(self, s: bool):
+        self.showOverlay = s
+
+        if s:
+            PROFILER.enable()
+            self.frames.clear()
+            self.overlayTimer.start()
+            self.refresh_overlay()
+        else:
+            PROFILER.disable()
+            self.overlayTimer.stop()
+            self.viewport().update(self.overlayRect)
+
+    def refresh_overlay(self):
+        now = time.perf_counter()
+        while self.frames and self.frames[0] < now - 1.0:
+            self.frames.popleft()
+
+        self.overlayLines = ["{} fps   {} queries".format(len(self.frames), PROFILER.queries),
+                             "{:20} {:>8} {:>8} {:>6}".format("", "p50 ms", "p99 ms", "q/call")]
+        for name, stats in sorted(PROFILER.summary().items()):
+            self.overlayLines.append("{:20} {:8.2f} {:8.2f} {:6.1f}".format(name[:20], stats["p50"], stats["p99"],
+                                                                             stats["queries"]))
+
+        # Repaint where the overlay was and where it will be
+        metrics = QFontMetrics(self.overlayFont)
+        rect = QRect(8, 8, max(metrics.horizontalAdvance(line) for line in self.overlayLines) + 12,
+                     metrics.lineSpacing() * len(self.overlayLines) + 8)
+        self.viewport().update(self.overlayRect.united(rect))
+        self.overlayRect = rect
+
+    @profiled("view.frame")
+    def paintEvent(self, e):
+        if self.showOverlay:
+            self.frames.append(time.perf_counter())
+
+        super(GraphicsView, self).paintEvent(e)
+
+    def drawForeground(self, painter, rect):
+        if not self.showOverlay:
+            return
+
+        # Drawn in viewport coordinates, so it stays in the corner however the scene is scrolled
+        painter.save()
+        painter.resetTransform()
+        painter.fillRect(self.overlayRect, QColor(0, 0, 0, 180))
+        painter.setPen(QColor(230, 230, 230))
+        painter.setFont(self.overlayFont)
+
+        metrics = QFontMetrics(self.overlayFont)
+        y = self.overlayRect.top() + 4 + metrics.ascent()
+        for line in self.overlayLines:
+            painter.drawText(self.overlayRect.left() + 6, y, line)
+            y += metrics.lineSpacing()
+
+        painter.restore()
+
+    # Populate the server list and fill scene with the tables of the plan's first section
     @staticmethod
-    def add_layout_items(scene: QGraphicsScene, tbl_list: list, servers: int):
+    def add_layout_items(scene: QGraphicsScene, sections: list, servers: int):
         for i in range(servers):
             POS_Server("Server " + str(i + 1))
 
-        # Populate tables
-        for table in tbl_list:
-            # Use POS_Table's parsing method to convert the database's string to an object
-            scene.addItem(POS_Table.parse(table[0]))
+        # Only the first section's tables are made, the others are kept as records until they're switched to
+        scene.sections.load(sections)
 
     # Resets and stores current server data (and the tables' servers)
     def store_plan(self):
@@ -277,15 +623,21 @@ class GraphicsView(QGraphicsView):
 
         # Store the current floorplan's tables' servers (the actual tables are still on the main scene)
         # (key is the POS_Table object, value is the server number)
-        for item in g.SCENE.items():
-            if type(item) is POS_Table:
-                if item.server is not None:
-                    self.storServ["tables"][item] = item.server.num
-                else:
-                    self.storServ["tables"][item] = None
+        for item in g.SCENE.tables.tables():
+            if item.server is not None:
+                self.storServ["tables"][item] = item.server.num
+            else:
+                self.storServ["tables"][item] = None
+
+        # The servers of the tables in the sections that aren't being shown (key is the TableRecord, value is the
+        # server object)
+        self.storServ["records"] = {rec: rec.server for rec in g.SCENE.sections.records()}
 
     # Restores the server list from the stored list and restores tables from the stored tables
     def restore_plan(self):
+        # A preview that's still being read shouldn't replace the restored plan
+        self.cancel_load()
+
         # Restore the server list from the stored list
         g.ALL_SERVERS = self.storServ["servers"].copy()
 
@@ -293,6 +645,10 @@ class GraphicsView(QGraphicsView):
         for tbl in self.storServ["tables"]:
             tbl.change_server(self.storServ["tables"][tbl])
 
+        for rec in self.storServ["records"]:
+            rec.server = self.storServ["records"][rec]
+            g.SCENE.tables.touch(rec.slot)
+
         # Update the visual server list widget
         g.SERVER_LIST.widget().servList.populate_servers()
 
@@ -302,19 +658,72 @@ class GraphicsView(QGraphicsView):
         # Set the current scene to the main scene
         self.setScene(g.SCENE)
 
+    # Reads a plan's server count and its sections as (name, table rows) in order, None if the plan doesn't exist
+    # (runs on the database worker)
+    @staticmethod
+    def read_plan(db, plan_id: int):
+        row = db.fetchone("SELECT server_count FROM floorplans WHERE plan_id = ?", (plan_id,))
+
+        if row is None:
+            return None
+
+        sections = [(name, []) for name, in db.fetchall("SELECT name FROM plan_sections WHERE plan_id = ? "
+                                                         "ORDER BY position", (plan_id,))]
+
+        for table in db.fetchall("SELECT section, table_id, " + POS_Table.COLUMNS + " FROM plan_tables "
+                                 "WHERE plan_id = ? ORDER BY section, table_id", (plan_id,)):
+            # Tables of a section that was never named (plans saved without any sections are all in section 0)
+            while table[0] >= len(sections):
+                sections.append(("Main" if not sections else "Section " + str(len(sections) + 1), []))
+
+            sections[table[0]][1].append(tuple(table)[1:])
+
+        return row[0], sections
+
+    # A plan that's still being read won't be shown when it arrives
+    def cancel_load(self):
+        if self.pendingLoad is not None:
+            self.pendingLoad.cancel()
+            self.pendingLoad = None
+
+    # Forget anything cached for a plan (it was renamed, deleted or added)
+    def invalidate_plan(self, plan_id: int):
+        self.planCache.invalidate(plan_id)
+        self.previewCache.invalidate(plan_id)
+
     # Loads a floorplan onto the GraphicsView
+    # A plan that isn't cached is read on the database worker and shown once it arrives, its DBFuture is returned
     def load_floorplan(self, plan_id: int, temp=False):
-        # Query for requested plan tables
-        con = create_connection()
-        # con.row_factory = sql.Row
-        cur = con.cursor()
-        server_count = cur.execute("SELECT server_count FROM floorplans WHERE plan_id = ?", str(plan_id)).fetchone()[0]
-        plan_tables = cur.execute("SELECT data FROM plan_tables WHERE plan_id = ?", str(plan_id)).fetchall()
-        con.close()
-
-        # If the floorplan doesn't exist, halt
-        if cur.rowcount == 0:
-            return
+        self.cancel_load()
+
+        plan = self.planCache.get(plan_id)
+        if plan is not None:
+            self.show_floorplan(plan_id, plan, temp)
+            return None
+
+        def on_loaded(plan):
+            self.pendingLoad = None
+
+            # If the floorplan doesn't exist, halt
+            if plan is None:
+                return
+
+            self.planCache.put(plan_id, plan)
+            self.show_floorplan(plan_id, plan, temp)
+
+        def on_failed(error):
+            self.pendingLoad = None
+            print("couldn't read floorplan: " + error)
+
+        self.pendingLoad = g.WORKER.submit(self.read_plan, plan_id)
+        self.pendingLoad.finished.connect(on_loaded)
+        self.pendingLoad.failed.connect(on_failed)
+
+        return self.pendingLoad
+
+    # Puts a plan's tables and servers on the view (the main scene, or a preview scene if temp)
+    def show_floorplan(self, plan_id: int, plan: tuple, temp=False):
+        server_count, sections = plan
 
         # Free up all server objects
         # for i in g.ALL_SERVERS:
@@ -326,27 +735,34 @@ class GraphicsView(QGraphicsView):
 
         # If in preview mode
         if temp:
-            # Create a new scene
-            tempScene = GraphicsScene()
+            cached = self.previewCache.get(plan_id)
 
-            # Create a label indicating this is a preview floorplan
-            tempScene.previewLabel = tempScene.addSimpleText("Preview Mode", g.FONT_SCENE)
-            tempScene.previewLabel.setBrush(QBrush(QColor(230, 230, 230, 230), Qt.SolidPattern))
-            tempScene.previewLabel.setPos(20, 20)
-            tempScene.previewLabel.setZValue(1)
+            # This plan was previewed recently, reuse its scene and servers
+            if cached is not None:
+                tempScene, servers = cached
+                g.ALL_SERVERS.extend(servers)
+            else:
+                # Create a new scene
+                tempScene = GraphicsScene()
+
+                # Create a label indicating this is a preview floorplan
+                tempScene.previewLabel = tempScene.addSimpleText("Preview Mode", g.FONT_SCENE)
+                tempScene.previewLabel.setBrush(QBrush(QColor(230, 230, 230, 230), Qt.SolidPattern))
+                tempScene.previewLabel.setPos(20, 20)
+                tempScene.previewLabel.setZValue(1)
+
+                # Populate the preview scene with tables and servers
+                self.add_layout_items(tempScene, sections, server_count)
 
-            # Populate the preview scene with tables and servers
-            self.add_layout_items(tempScene, plan_tables, server_count)
+                self.previewCache.put(plan_id, (tempScene, g.ALL_SERVERS.copy()))
 
             # Set it to be viewed
             self.setScene(tempScene)
 
         # Fully loading a floorplan onto the main scene
         else:
-            # Clear tables
-            for item in g.SCENE.items():
-                if type(item) is POS_Table:
-                    g.SCENE.removeItem(item)
+            # Clear tables (every section's), before the new servers are made so none of them pick up the old parties
+            g.SCENE.sections.restore([])
 
             # Plan is already in recents
             if plan_id in g.recentFloorplans:
@@ -367,11 +783,21 @@ class GraphicsView(QGraphicsView):
             g.SETTINGS.sync()
 
             # Populate the main scene with tables and servers
-            self.add_layout_items(g.SCENE, plan_tables, server_count)
+            self.add_layout_items(g.SCENE, sections, server_count)
+
+            # The reservations get the new floor's tables
+            g.RES_LIST.widget().resList.replan()
 
         # Update the visual server list widget
         g.SERVER_LIST.widget().servList.populate_servers()
 
+        # The server list was replaced, so the predictor has to re-score everyone
+        g.SERVER_LIST.widget().pred.calculate_choice()
+
+        # A zoomed view's scrollable area has to cover the new tables
+        self.update_scene_rect()
+        self.sectionBar.refresh()
+
         # Make sure the scene is in its static position
         g.SCENE.recenter()
 
@@ -385,32 +811,13 @@ if __name__ == "__main__":
     QCoreApplication.setOrganizationName("Navimode")
     QCoreApplication.setApplicationName("Hosty")
 
-    # Create database tables if not already made
-    con = create_connection()
-    cur = con.cursor()
-    cur.execute(""" CREATE TABLE IF NOT EXISTS floorplans (
-                        plan_id INTEGER PRIMARY KEY,
-                        name TEXT NOT NULL,
-                        server_count INTEGER NOT NULL
-                    )""")
-    cur.execute(""" CREATE TABLE IF NOT EXISTS plan_tables (
-                        table_id INTEGER PRIMARY KEY,
-                        data BLOB NOT NULL,
-                        plan_id INTEGER NOT NULL,
-                        FOREIGN KEY(plan_id) REFERENCES floorplans(plan_id)
-                    )""")
-    cur.execute(""" CREATE TABLE IF NOT EXISTS reservations (
-                        res_id INTEGER PRIMARY KEY,
-                        date NUMERIC NOT NULL,
-                        time NUMERIC NOT NULL,
-                        name TEXT NOT NULL,
-                        size INTEGER NOT NULL,
-                        phone TEXT,
-                        note TEXT,
-                        state INTEGER DEFAULT 0
-                    )""")
-    con.commit()
-    con.close()
+    # Open the shared database connection and create database tables if not already made
+    g.DB = Database()
+    g.DB.create_tables()
+
+    # Start the thread that runs the GUI's database work in the background
+    g.WORKER = DatabaseWorker()
+    g.WORKER.start()
 
     # Setup default settings
     g.SETTINGS = QSettings()
@@ -428,6 +835,8 @@ if __name__ == "__main__":
         g.SETTINGS.setValue("settings/maxResTime", QTime(23, 59))
     if not g.SETTINGS.value("settings/overflowMultiplier"):
         g.SETTINGS.setValue("settings/overflowMultiplier", 1)
+    if g.SETTINGS.value("settings/fitOverflow") is None:
+        g.SETTINGS.setValue("settings/fitOverflow", 1)
     if not g.SETTINGS.value("settings/maxrecents"):
         g.SETTINGS.setValue("settings/maxrecents", 5)
     if not g.SETTINGS.value("data/overflowRules"):
@@ -446,6 +855,9 @@ if __name__ == "__main__":
     g.APP = QApplication(sys.argv)
     g.APP.setStyle("fusion")
 
+    # Service events are buffered and written by the database worker in batches
+    g.EVENTS = EventLog()
+
     # Setup main window and docks
     g.WINDOW = MainWindow()
 
@@ -455,17 +867,51 @@ if __name__ == "__main__":
     g.WINDOW.addDockWidget(Qt.RightDockWidgetArea, g.RES_LIST)
     g.WINDOW.addDockWidget(Qt.RightDockWidgetArea, g.SERVER_LIST)
 
+    # Service analytics share a tab with the servers
+    g.ANALYTICS = Analytics_Dock(g.WINDOW)
+    g.WINDOW.tabifyDockWidget(g.SERVER_LIST, g.ANALYTICS)
+    g.SERVER_LIST.raise_()
+
     # Setup the floorplan viewer
     g.SCENE = GraphicsScene()
     g.VIEW = GraphicsView(g.SCENE, g.WINDOW)
     g.VIEW.setCursor(Qt.ArrowCursor)
 
-    g.WINDOW.setCentralWidget(g.VIEW)
+    # The section tabs sit on top of the floorplan viewer
+    central = QWidget(g.WINDOW)
+    layout = QVBoxLayout(central)
+    layout.setContentsMargins(0, 0, 0, 0)
+    layout.setSpacing(0)
+    layout.addWidget(g.VIEW.sectionBar)
+    layout.addWidget(g.VIEW)
+
+    g.WINDOW.setCentralWidget(central)
 
     # Show the application and maximize it
     # g.WINDOW.show()
     # g.WINDOW.showFullScreen()
     g.WINDOW.showMaximized()
 
+    # Offer to carry on with the service that was going when Hosty last closed, then keep the live floor snapshotted
+    g.SNAPSHOT = FloorSnapshot(g.SCENE)
+    g.SNAPSHOT.offer_restore()
+    g.SNAPSHOT.start()
+
+    # The kitchen model is refit from the last few weeks of service at the end of each night (when Hosty closes), and in
+    # the background now if that was missed
+    # Refitting it changes how long parties are expected to stay, so the reservations get their tables again
+    g.SERVER_LIST.widget().pred.modelChanged.connect(lambda model: g.RES_LIST.widget().resList.replan())
+    g.SERVER_LIST.widget().pred.refit_if_stale()
+
+    # Once the event loop is done, queue any reservation edits and service events that are still waiting and a last
+    # snapshot of the floor, refit the kitchen model with the night's service, let the database worker finish
+    # everything it was given, then close the shared database connection
+    g.APP.aboutToQuit.connect(g.RES_LIST.widget().writer.flush)
+    g.APP.aboutToQuit.connect(g.EVENTS.flush)
+    g.APP.aboutToQuit.connect(g.SNAPSHOT.take)
+    g.APP.aboutToQuit.connect(g.SERVER_LIST.widget().pred.refit_at_close)
+    g.APP.aboutToQuit.connect(g.WORKER.stop)
+    g.APP.aboutToQuit.connect(g.DB.close)
+
     # Stops the application as soon as the user closes it
     sys.exit(g.APP.exec_())
@@ -0,0 +1,32 @@
+# Tests run against the same headless main window the benchmarks use, made once per test session
+# Run from the repository root: python -m pytest -q
+import pytest
+
+from benchmarks.harness import settle, setup
+
+
+@pytest.fixture(scope="session")
+def app():
+    return setup()
+
+
+# Saves a plan of (section name, table rows) groups and loads it onto the main scene, returns its plan_id
+@pytest.fixture
+def load_plan(app):
+    import core.globals as g
+    from core.dialogs import FloorplanDialog
+
+    def load(groups: list, servers=1, name="Test plan") -> int:
+        plan_id = g.WORKER.submit(FloorplanDialog.insert_plan, name, servers, groups).wait()
+
+        g.VIEW.load_floorplan(plan_id)
+        settle()
+
+        return plan_id
+
+    return load
+
+
+# Table rows (POS_Table.COLUMNS) of count four-tops in a row, titled prefix + their number
+def table_rows(count: int, prefix="T", server=0, seats=4) -> list:
+    return [(100 * i, 10, 80, 80, server, prefix + str(i + 1), False, 0, seats) for i in range(count)]
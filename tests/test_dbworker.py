@@ -0,0 +1,70 @@
+import time
+
+import pytest
+from qtpy.QtCore import QTimer
+
+import core.globals as g
+from benchmarks.harness import settle
+from core.database import Database
+from core.dbworker import DatabaseWorker
+from core.dialogs import FloorplanDialog
+from tests.conftest import table_rows
+
+# Seconds added to every query on the slow connection
+DELAY = 0.3
+
+
+# A database on a slow disk (or held locked by another program)
+class DelayedDatabase(Database):
+    def execute(self, query: str, params=()):
+        time.sleep(DELAY)
+        return super(DelayedDatabase, self).execute(query, params)
+
+    def fetchall(self, query: str, params=()) -> list:
+        time.sleep(DELAY)
+        return super(DelayedDatabase, self).fetchall(query, params)
+
+    def fetchone(self, query: str, params=()):
+        time.sleep(DELAY)
+        return super(DelayedDatabase, self).fetchone(query, params)
+
+
+# The database worker, with every query on its connection delayed
+@pytest.fixture
+def slow_worker(app, monkeypatch):
+    worker = DatabaseWorker(g.DB.path, DelayedDatabase)
+    worker.start()
+    monkeypatch.setattr(g, "WORKER", worker)
+
+    yield worker
+
+    settle()
+    worker.stop()
+
+
+def test_gui_keeps_running_while_a_query_is_slow(slow_worker):
+    plan_id = FloorplanDialog.insert_plan(g.DB, "Slow plan", 2, [("Main", table_rows(20))])
+    g.VIEW.planCache.clear()
+
+    ticks = []
+    timer = QTimer()
+    timer.timeout.connect(lambda: ticks.append(time.perf_counter()))
+    timer.start(10)
+
+    began = time.perf_counter()
+    pending = g.VIEW.load_floorplan(plan_id)
+
+    # Handed to the worker instead of being read on the GUI thread
+    assert pending is not None and not pending.is_done()
+    assert time.perf_counter() - began < DELAY / 2
+
+    # The event loop keeps processing timers while the worker waits on the database
+    while not pending.is_done():
+        g.APP.processEvents()
+        time.sleep(0.001)
+    settle()
+    timer.stop()
+
+    assert len(ticks) >= DELAY / 0.01 / 2
+    assert max(b - a for a, b in zip([began] + ticks, ticks)) < DELAY / 2
+    assert len(g.SCENE.tables) == 20
@@ -0,0 +1,40 @@
+import core.globals as g
+from benchmarks.harness import settle
+from core.events import EventLog
+from tests.conftest import table_rows
+
+
+def seat(tbl, party: int):
+    tbl.state = 1
+    tbl.seat(party)
+
+
+def server_counters() -> list:
+    return [(server.headActive, server.headTotal, server.active, server.total) for server in g.ALL_SERVERS]
+
+
+def test_loading_a_plan_starts_every_server_at_zero(load_plan):
+    load_plan([("Main", table_rows(4))], servers=2)
+    seat(g.SCENE.tables.tables()[0], 4)
+    assert g.ALL_SERVERS[0].headActive == 4
+
+    load_plan([("Dining", table_rows(3)), ("Patio", table_rows(2, "P"))], servers=2, name="Other plan")
+
+    assert server_counters() == [(0, 0, 0, 0), (0, 0, 0, 0)]
+    assert not g.SCENE.seatedTables
+    assert sorted(tbl.title for tbl in g.SCENE.tables.tables()) == ["T1", "T2", "T3"]
+    assert all(tbl.state == 0 for tbl in g.SCENE.tables.tables())
+
+
+def test_loading_a_plan_logs_no_transfers(load_plan):
+    load_plan([("Main", table_rows(4))])
+    seat(g.SCENE.tables.tables()[0], 4)
+    g.EVENTS.flush()
+    settle()
+    before = g.DB.fetchone("SELECT COUNT(*) FROM events WHERE kind = ?", (EventLog.TRANSFER,))[0]
+
+    load_plan([("Main", table_rows(2))], name="Other plan")
+    g.EVENTS.flush()
+    settle()
+
+    assert g.DB.fetchone("SELECT COUNT(*) FROM events WHERE kind = ?", (EventLog.TRANSFER,))[0] == before
@@ -0,0 +1,25 @@
+import time
+
+import core.globals as g
+from core.predict import KitchenModel
+from tests.conftest import table_rows
+
+
+def test_kitchen_model_is_refit_when_hosty_closes(load_plan):
+    load_plan([("Main", table_rows(2))])
+    pred = g.SERVER_LIST.widget().pred
+    g.SETTINGS.remove("data/kitchenModel")
+
+    tbl = g.SCENE.tables.tables()[0]
+    tbl.state = 1
+    tbl.seat(4)
+    tbl.clear_seating()
+
+    # As it runs on quit: the last events are handed to the worker first
+    g.EVENTS.flush()
+    began = time.time()
+    pred.refit_at_close()
+
+    saved = KitchenModel.from_setting(g.SETTINGS.value("data/kitchenModel"))
+    assert saved is not None and saved.fitted >= began
+    assert pred.model is not None and pred.model.fitted == saved.fitted
@@ -0,0 +1,159 @@
+import random
+
+import pytest
+
+from core.scheduler import RESET, Booking, TableScheduler, expected_turn, make_bookings
+
+# Seats of the tables on a generated floor, a table's slot picks its size
+SEATS = (2, 4, 4, 6, 8)
+# Party sizes, mostly small, now and then one bigger than any table (tables aren't pushed together)
+SIZES = (1, 2, 2, 2, 3, 4, 4, 4, 5, 6, 6, 7, 8, 10)
+
+
+def floor(count: int) -> dict:
+    return {slot: SEATS[slot % len(SEATS)] for slot in range(count)}
+
+
+# A night of reservations every 15 minutes from opening (minutes past midnight) for six hours
+def night(rng, count: int, opens: int) -> dict:
+    times = ["{:02d}:{:02d}".format((m // 60) % 24, m % 60) for m in range(opens, opens + 6 * 60, 15)]
+    reservations = [(res_id, rng.choice(times), rng.choice(SIZES)) for res_id in range(1, count + 1)]
+
+    return {booking.res_id: booking for booking in make_bookings(reservations, None, opens % 1440)}
+
+
+# The same greedy plan the slow way: look at every table for every booking
+def reference(bookings: list, tables: dict) -> dict:
+    free = {slot: float("-inf") for slot in tables}
+    assigned = {}
+
+    for booking in sorted(bookings, key=Booking.key):
+        fits = [(tables[slot], free[slot], slot) for slot in tables
+                if tables[slot] >= booking.size and free[slot] <= booking.start]
+
+        if fits:
+            slot = min(fits)[2]
+            free[slot] = booking.end
+            assigned[booking.res_id] = slot
+        else:
+            assigned[booking.res_id] = None
+
+    return assigned
+
+
+# The bookings each table was given, in order
+def by_table(schedule: TableScheduler, bookings: list) -> dict:
+    tables = {}
+
+    for booking in sorted(bookings, key=Booking.key):
+        slot = schedule.table_of(booking.res_id)
+        if slot is not None:
+            tables.setdefault(slot, []).append(booking)
+
+    return tables
+
+
+def check(schedule: TableScheduler, bookings: list, tables: dict):
+    booked = by_table(schedule, bookings)
+
+    for slot, parties in booked.items():
+        # Every party fits its table
+        assert all(booking.size <= tables[slot] for booking in parties)
+        # No table has two parties at once
+        assert all(earlier.end <= later.start for earlier, later in zip(parties, parties[1:]))
+
+    # A party without a table arrived while every table that seats it was taken by a party planned before it
+    for res_id in schedule.unassigned():
+        booking = schedule.bookings[res_id]
+
+        for slot, seats in tables.items():
+            if seats >= booking.size:
+                assert any(other.key() < booking.key() and other.start <= booking.start < other.end
+                           for other in booked.get(slot, []))
+
+    assert schedule.assigned == reference(bookings, tables)
+
+
+@pytest.mark.parametrize("opens", [17 * 60, 20 * 60], ids=["evening", "past midnight"])
+def test_generated_nights(opens):
+    rng = random.Random(opens)
+    tables = floor(40)
+
+    for _ in range(5):
+        bookings = list(night(rng, 120, opens).values())
+
+        schedule = TableScheduler()
+        schedule.plan("night", bookings, tables)
+
+        check(schedule, bookings, tables)
+        assert len(schedule) == len(bookings)
+
+
+def test_edits_are_planned_like_a_fresh_night():
+    rng = random.Random(24)
+    tables = floor(40)
+    bookings = night(rng, 120, 17 * 60)
+    next_id = len(bookings) + 1
+
+    schedule = TableScheduler()
+    schedule.plan("night", list(bookings.values()), tables)
+
+    # Added, re-timed, resized and canceled reservations
+    for _ in range(100):
+        action = rng.random()
+
+        if action < 0.3:
+            bookings[next_id] = make_bookings([(next_id, "19:00", rng.choice(SIZES))], None, 17 * 60)[0]
+            next_id += 1
+        elif action < 0.8:
+            old = bookings[rng.choice(list(bookings))]
+            size = rng.randint(1, 10) if action < 0.55 else old.size
+            arrives = old.start if action < 0.55 else old.start + rng.choice((-30, -15, 15, 30))
+            bookings[old.res_id] = Booking(old.res_id, arrives, size, arrives + expected_turn(size) + RESET)
+        else:
+            del bookings[rng.choice(list(bookings))]
+
+        schedule.sync("night", list(bookings.values()), tables)
+
+    check(schedule, list(bookings.values()), tables)
+
+    fresh = TableScheduler()
+    fresh.plan("night", list(bookings.values()), tables)
+    assert fresh.assigned == schedule.assigned
+
+    # Nothing changed, nothing is planned again
+    assert schedule.sync("night", list(bookings.values()), tables) == 0
+
+    # A different floor is planned from scratch
+    fewer = {slot: seats for slot, seats in tables.items() if slot % 3}
+    schedule.sync("night", list(bookings.values()), fewer)
+    check(schedule, list(bookings.values()), fewer)
+
+
+# More parties at once than there are tables, and a party bigger than any table
+def test_infeasible_night():
+    tables = {0: 2, 1: 4, 2: 4}
+    bookings = make_bookings([(1, "19:00", 4), (2, "19:00", 4), (3, "19:00", 3), (4, "19:00", 12),
+                              (5, "19:00", 2), (6, "19:00", 2)])
+
+    schedule = TableScheduler()
+    schedule.plan("night", bookings, tables)
+    check(schedule, bookings, tables)
+
+    # The bigger parties are planned first at the same time, the two-top goes to the first couple
+    assert schedule.assigned == {1: 1, 2: 2, 3: None, 4: None, 5: 0, 6: None}
+    assert sorted(schedule.unassigned()) == [3, 4, 6]
+
+
+# A table frees up once its party's turn and the reset after it are over
+def test_table_is_given_again_once_its_turn_is_over():
+    tables = {0: 4}
+    first, = make_bookings([(1, "18:00", 4)])
+    later = Booking(2, first.end, 4, first.end + 60)
+    early = Booking(3, first.end - 1, 2, first.end + 60)
+
+    schedule = TableScheduler()
+    schedule.plan("night", [first, later, early], tables)
+    check(schedule, [first, later, early], tables)
+
+    assert schedule.assigned == {1: 0, 3: None, 2: 0}
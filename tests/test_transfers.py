@@ -0,0 +1,49 @@
+import core.globals as g
+from benchmarks.harness import settle
+from core.events import EventLog
+from core.objects import Server_Menu_Action
+from tests.conftest import table_rows
+
+
+# The transfers written to the events table, oldest first
+def transfers() -> list:
+    g.EVENTS.flush()
+    settle()
+
+    return g.DB.fetchall_tuples("SELECT server, party, detail FROM events WHERE kind = ? ORDER BY event_id",
+                                (EventLog.TRANSFER,))
+
+
+def seated_table():
+    tbl = g.SCENE.tables.tables()[0]
+    tbl.state = 1
+    tbl.seat(4)
+
+    return tbl
+
+
+def test_previewing_a_plan_logs_no_transfers(load_plan):
+    load_plan([("Main", table_rows(3))], servers=2)
+    other = load_plan([("Main", table_rows(2))], name="Preview plan")
+    load_plan([("Main", table_rows(3))], servers=2)
+    seated_table()
+    before = transfers()
+
+    g.VIEW.store_plan()
+    g.VIEW.load_floorplan(other, True)
+    settle()
+    g.VIEW.restore_plan()
+
+    assert transfers() == before
+    assert g.ALL_SERVERS[0].headActive == 4
+
+
+def test_handing_a_table_over_logs_a_transfer(load_plan):
+    load_plan([("Main", table_rows(3))], servers=2)
+    tbl = seated_table()
+    before = transfers()
+
+    Server_Menu_Action(g.ALL_SERVERS[1], tbl).trigger()
+
+    assert transfers() == before + [("Server 2", 4, "Server 1")]
+    assert (g.ALL_SERVERS[0].headActive, g.ALL_SERVERS[1].headActive) == (0, 4)